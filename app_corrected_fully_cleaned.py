@@ -1,175 +1,43 @@
 # app_corrected_fully_cleaned.py
+import json
+import os
+
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
 
-st.set_page_config(page_title="Qrauts AG Erhebungsbogen & Sanierungs-ROI", layout="wide")
+from catalog import load_catalog
+from overlay import apply_overlay, base_table, overlay_cells, overlay_from_table, register_catalog
+from engine import measures_to_arrays, simulate_batch
+from optimizer import pareto_packages
+from montecarlo import run_monte_carlo, triangular_spreads
+from sweep import METRICS as SWEEP_METRICS, break_even, sweep
+from attribution import attribute
+from lifecycle import lifecycle
+from roadmap import plan_roadmap
+from report import comparison_table, energy_figure, energy_table, umlage_table, waterfall_figure, waterfall_table
+from rentroll import read_rent_roll, rent_roll_umlage, steps_from_plan, unit_table
+from hourly import read_profile, sizing_curves, with_hourly_pv
+from heatpump import package_heat_pump, read_temperature, with_hourly_hp
+from metering import baseline_from_meters, store_upload
+from cache import CACHE, cached_call
+from profiling import Profiler, activate, profiled, record_session, sessions_summary, span, stage
+from scenario_store import DEFAULT_PATH as STORE_PATH, ScenarioStore, compare, measures_table
+from model import (
+    BAUPREISINDEX_INST, INDEX_BASE, DEFAULT_EF, DEFAULT_CO2_PRICE_EUR_T,
+    get_index_value, derive_quantities, baseline_kpis, umlage, scenario_kpis,
+)
 
-# ------------------------------
-# Helper: Baupreisindex (Destatis, 2021=100) - Instandhaltung Wohngebäude (ohne Schönheitsreparaturen)
-# Quelle: Destatis, Konjunkturindikator bpr210, Stand 10.07.2025
-# ------------------------------
-BAUPREISINDEX_INST = {
-    "2021": {"I": 95.1, "II": 98.7, "III": 102.0, "IV": 104.3},
-    "2022": {"I": 109.0, "II": 114.4, "III": 118.0, "IV": 121.3},
-    "2023": {"I": 124.8, "II": 126.7, "III": 127.7, "IV": 128.5},
-    "2024": {"I": 130.4, "II": 131.4, "III": 132.4, "IV": 133.1},
-    "2025": {"I": 135.2, "II": 136.4}
-}
-INDEX_BASE = 100.0  # 2021 Jahresdurchschnitt = 100
-
-# ------------------------------
-# Default Emissionsfaktoren (kg CO2/kWh) & CO2-Preis
-# Quellenhinweis im README (UBA/BMWK/BAFA)
-# ------------------------------
-DEFAULT_EF = {
-    "strom": 0.363,    # UBA Strommix 2024 ~ 363 g/kWh
-    "erdgas": 0.20088, # BMWK/BEHG-Richtwert
-    "heizoel": 0.2664, # BMWK/BAFA
-    "fernwaerme": 0.2  # Platzhalter, standortabhängig – bitte anpassen
-}
-DEFAULT_CO2_PRICE_EUR_T = 55.0  # 2025 (BEHG) – kann angepasst werden
-
-# ------------------------------
-# Measures library (editable in-app)
-# capex_unit at index=100 (Jahresdurchschnitt 2021), scaled by selected Destatis-Index
-# savings_% are default expectation; user can override per measure
-# affects: dict of vectors ('heating', 'electricity') with percentage savings (0..1) or special flags
-# ------------------------------
-MEASURES = [
-    {
-        "code": "roof_ins",
-        "name": "Dach-Dämmung",
-        "category": "Hülle",
-        "unit": "m² Dachfläche",
-        "default_qty_from": "area",  # use building area as proxy unless user overrides
-        "capex_unit_2021": 140.0,
-        "lifetime_y": 30,
-        "affects": {"heating_pct": 0.08, "electricity_pct": 0.0}
-    },
-    {
-        "code": "wall_wdvs",
-        "name": "Außenwand-Dämmung (WDVS)",
-        "category": "Hülle",
-        "unit": "m² Fassadenfläche",
-        "default_qty_from": "area",  # proxy; anpassen empfohlen
-        "capex_unit_2021": 220.0,
-        "lifetime_y": 30,
-        "affects": {"heating_pct": 0.15}
-    },
-    {
-        "code": "basement_ins",
-        "name": "Kellerdecken-Dämmung",
-        "category": "Hülle",
-        "unit": "m² Deckenfläche",
-        "default_qty_from": "area",
-        "capex_unit_2021": 80.0,
-        "lifetime_y": 25,
-        "affects": {"heating_pct": 0.05}
-    },
-    {
-        "code": "windows_triple",
-        "name": "Fenstertausch (3-fach)",
-        "category": "Hülle",
-        "unit": "m² Fensterfläche",
-        "default_qty_from": "window_ratio",  # area * window_ratio
-        "capex_unit_2021": 750.0,
-        "lifetime_y": 30,
-        "affects": {"heating_pct": 0.10}
-    },
-    {
-        "code": "hydraulic_balance",
-        "name": "Hydraulischer Abgleich + Heizkurve",
-        "category": "Heizung/Regelung",
-        "unit": "m² Wohn-/Nutzfläche",
-        "default_qty_from": "area",
-        "capex_unit_2021": 15.0,
-        "lifetime_y": 15,
-        "affects": {"heating_pct": 0.08, "electricity_pct": 0.01}
-    },
-    {
-        "code": "pump_vfd",
-        "name": "Hocheffizienz-Heizungs-/Zirkulationspumpen",
-        "category": "Heizung/Regelung",
-        "unit": "m² Wohn-/Nutzfläche",
-        "default_qty_from": "area",
-        "capex_unit_2021": 8.0,
-        "lifetime_y": 12,
-        "affects": {"electricity_pct": 0.02}
-    },
-    {
-        "code": "vent_wrg",
-        "name": "Dezentrale Lüftung mit WRG",
-        "category": "Lüftung",
-        "unit": "Wohneinheiten",
-        "default_qty_from": "units",
-        "capex_unit_2021": 2500.0,
-        "lifetime_y": 20,
-        "affects": {"heating_pct": 0.08, "electricity_extra_kwh_per_unit": 50.0}
-    },
-    {
-        "code": "led_lighting",
-        "name": "LED + Präsenz-/Tageslichtregelung (Allgemeinbereiche)",
-        "category": "Strom",
-        "unit": "m² Allgemeinflächen",
-        "default_qty_from": "common_area",
-        "capex_unit_2021": 15.0,
-        "lifetime_y": 12,
-        "affects": {"electricity_pct_of_share": 0.5, "electricity_share_of_total": 0.15}
-    },
-    {
-        "code": "bms_opt",
-        "name": "Gebäudeautomation / EMS-Optimierung",
-        "category": "Digital",
-        "unit": "m² Wohn-/Nutzfläche",
-        "default_qty_from": "area",
-        "capex_unit_2021": 8.0,
-        "lifetime_y": 10,
-        "affects": {"heating_pct": 0.05, "electricity_pct": 0.05}
-    },
-    {
-        "code": "pv_system",
-        "name": "PV-Anlage (Dach)",
-        "category": "Erzeugung",
-        "unit": "kWp",
-        "default_qty_from": "pv_kwp",
-        "capex_unit_2021": 1200.0,
-        "lifetime_y": 25,
-        "affects": {"pv_specific_yield": 950.0, "self_consumption_share": 0.6, "feed_in_tariff_eur_kwh": 0.08}
-    },
-    {
-        "code": "dhw_circ_opt",
-        "name": "TWW-Zirkulation: Dämmung/Zeiten/Regelung",
-        "category": "Heizung/Regelung",
-        "unit": "Wohneinheiten",
-        "default_qty_from": "units",
-        "capex_unit_2021": 150.0,
-        "lifetime_y": 12,
-        "affects": {"heating_pct": 0.03, "electricity_pct": 0.005}
-    },
-    {
-        "code": "heat_pump_aw",
-        "name": "Heizungstausch: Luft/Wasser-Wärmepumpe",
-        "category": "Heizungssystem",
-        "unit": "kW_th (abgeleitet)",
-        "default_qty_from": "derived_heat_load",
-        "capex_unit_2021": 2000.0,
-        "lifetime_y": 20,
-        "affects": {"fuel_switch_to_hp": True, "scop": 3.0, "coverage_share": 1.0}
-    }
-]
+st.set_page_config(page_title="Qrauts AG Erhebungsbogen & Sanierungs-ROI", layout="wide")
 
-# Utility: get index value
-def get_index_value(year: str, quarter: str) -> float:
-    try:
-        return BAUPREISINDEX_INST[year][quarter]
-    except KeyError:
-        # fallback to closest available
-        y = max(BAUPREISINDEX_INST.keys())
-        q = list(BAUPREISINDEX_INST[y].keys())[-1]
-        return BAUPREISINDEX_INST[y][q]
+# Per-rerun profiling (sidebar checkbox at the end): stages and spans of this rerun go to `profiler`
+PROFILE_HISTORY = 20  # reruns kept for the trace export
+profiler = Profiler("energyaudit") if st.session_state.get("profiling", False) else None
+activate(profiler)
+if profiler is None:
+    st.session_state.pop("profile_runs", None)
+stage("sidebar")
 
 # Sidebar inputs
 st.sidebar.header("Allgemeine Parameter")
@@ -180,8 +48,24 @@ common_area_m2 = st.sidebar.number_input("Allgemeinflächen (Beleuchtung) [m²]"
 window_ratio = st.sidebar.slider("Fensterflächenanteil an Nutzfläche [%]", 0, 80, 25) / 100.0
 st.sidebar.markdown("---")
 st.sidebar.subheader("Energie-Basisdaten (jährlich)")
-e_el_kwh = st.sidebar.number_input("Strombezug [kWh/a]", min_value=0.0, value=120000.0, step=100.0)
-e_heat_kwh = st.sidebar.number_input("Heizenergie (Gas/Öl/FW) [kWh/a]", min_value=0.0, value=450000.0, step=100.0)
+with st.sidebar.expander("Lastgänge (Smart Meter) – optional"):
+    meter_el_file = st.file_uploader("Strom: Export (CSV, 15 min/h)", type=["csv", "txt"], key="meter_el")
+    meter_heat_file = st.file_uploader("Wärme: Export (CSV, 15 min/h)", type=["csv", "txt"], key="meter_heat")
+    meter = {}
+    if meter_el_file is not None or meter_heat_file is not None:
+        try:
+            meter_el_path, meter_heat_path = (store_upload(f.getvalue()) if f is not None else None
+                                              for f in (meter_el_file, meter_heat_file))
+            meter = baseline_from_meters(meter_el_path, meter_heat_path)
+        except (OSError, ValueError) as exc:
+            st.error(f"Lastgang konnte nicht gelesen werden: {exc}")
+        for key, label in (("el_meter", "Strom"), ("heat_meter", "Wärme")):
+            if key in meter:
+                annual = f"{meter[key]['annual_kwh']:,.0f}".replace(",", ".")
+                st.caption(f"{label} {meter[key]['year']}: {annual} kWh, Spitze {meter[key]['peak_kw']:.1f} kW, "
+                           f"gemessen {meter[key]['measured_share']*100:.1f} %")
+e_el_kwh = st.sidebar.number_input("Strombezug [kWh/a]", min_value=0.0, value=float(meter.get("e_el_kwh", 120000.0)), step=100.0)
+e_heat_kwh = st.sidebar.number_input("Heizenergie (Gas/Öl/FW) [kWh/a]", min_value=0.0, value=float(meter.get("e_heat_kwh", 450000.0)), step=100.0)
 carrier = st.sidebar.selectbox("Heizenergieträger", ["Erdgas", "Heizöl", "Fernwärme"])
 st.sidebar.subheader("Energiepreise")
 p_el = st.sidebar.number_input("Strompreis [€/kWh]", min_value=0.0, value=0.32, step=0.01)
@@ -209,6 +93,20 @@ pv_kwp = st.sidebar.number_input("PV-Größe [kWp]", min_value=0.0, value=100.0,
 pv_yield = st.sidebar.number_input("Spez. Ertrag [kWh/kWp·a]", min_value=0.0, value=950.0, step=10.0)
 pv_sc = st.sidebar.slider("Eigenverbrauchsanteil PV [%]", 0, 100, 60) / 100.0
 pv_fit = st.sidebar.number_input("Einspeisevergütung [€/kWh]", min_value=0.0, value=0.08, step=0.01)
+hourly_pv = st.sidebar.checkbox("Stündliche PV-Simulation (8760 h) statt festem EV-Anteil", value=False)
+hourly_settings = {}
+if hourly_pv:
+    colP1, colP2 = st.sidebar.columns(2)
+    battery_kwh = colP1.number_input("Speicher [kWh]", min_value=0.0, value=0.0, step=5.0)
+    battery_kw = colP2.number_input("Speicherleistung [kW]", min_value=0.0, value=battery_kwh * 0.5, step=1.0)
+    battery_eff = st.sidebar.slider("Speicher-Wirkungsgrad (Round-Trip) [%]", 50, 100, 92) / 100.0
+    load_file = st.sidebar.file_uploader("Lastprofil (CSV/Parquet, 8760 h oder 15 min) – optional", type=["csv", "parquet"])
+    pv_file = st.sidebar.file_uploader("PV-Erzeugungsprofil (CSV/Parquet) – optional", type=["csv", "parquet"])
+    hourly_settings = {
+        "battery_kwh": battery_kwh, "battery_kw": battery_kw, "efficiency": battery_eff,
+        "load_profile": read_profile(load_file) if load_file is not None else meter.get("load_profile"),
+        "pv_profile": read_profile(pv_file) if pv_file is not None else None,
+    }
 st.sidebar.markdown("---")
 st.sidebar.subheader("Umlage (vereinfachtes Modell)")
 rentable_area_m2 = st.sidebar.number_input("Wohnfläche (mietrelevant) [m²]", min_value=0.0, value=area_m2*0.9, step=10.0)
@@ -222,54 +120,65 @@ avg_rent_eur_m2 = st.sidebar.number_input("Aktuelle Nettokaltmiete [€/m²]", m
 # ------------------------------
 # Derived quantities
 # ------------------------------
-window_area_m2 = area_m2 * window_ratio
-derived = {
-    "area": area_m2,
-    "units": units,
-    "common_area": common_area_m2,
-    "window_ratio": window_ratio,
-    "window_area_m2": window_area_m2,
-    "pv_kwp": pv_kwp,
-    "pv_specific_yield": pv_yield,
-}
-
-# Derive approximate peak heat load from annual heat energy (full-load hours heuristic)
-flh = st.sidebar.number_input("Vollbenutzungsstunden Heizung [h/a] (Heuristik)", min_value=500, max_value=4000, value=2000, step=50)
-derived_heat_load_kw = e_heat_kwh / max(1, flh)
-derived["derived_heat_load"] = derived_heat_load_kw
+flh = st.sidebar.number_input("Vollbenutzungsstunden Heizung [h/a] (Heuristik)", min_value=500, max_value=4000,
+                              value=int(np.clip(round(meter.get("flh", 2000)), 500, 4000)), step=50,
+                              help="Aus dem Wärme-Lastgang gemessen, falls angegeben")
+hourly_hp = st.sidebar.checkbox("Stündliches Wärmepumpenmodell (Außentemperatur) statt SCOP/VBZ", value=False)
+hourly_hp_settings = {}
+if hourly_hp:
+    colH1, colH2 = st.sidebar.columns(2)
+    supply_design_c = colH1.number_input("Vorlauf bei Normaußentemp. [°C]", min_value=30.0, max_value=80.0, value=55.0, step=1.0)
+    dhw_share = colH2.number_input("Warmwasseranteil [%]", min_value=0.0, max_value=100.0, value=15.0, step=1.0) / 100.0
+    sizing_share = st.sidebar.slider("WP-Leistung [% der Auslegungslast] (<100 % = bivalent)", 20, 150, 100) / 100.0
+    try_file = st.sidebar.file_uploader("Außentemperatur (DWD-TRY .dat oder CSV/Parquet) – optional", type=["dat", "csv", "parquet"])
+    hourly_hp_settings = {
+        "supply_design_c": supply_design_c, "dhw_share": dhw_share, "sizing_share": sizing_share,
+        "temperature": read_temperature(try_file) if try_file is not None else None,
+    }
+derived = derive_quantities(area_m2, units, common_area_m2, window_ratio, pv_kwp, pv_yield, e_heat_kwh, flh)
 
 # ------------------------------
 # Baseline KPIs
 # ------------------------------
+stage("baseline_kpis")
 ef_heat = {"Erdgas": ef_gas, "Heizöl": ef_oil, "Fernwärme": ef_fw}[carrier]
-co2_el_t = e_el_kwh * ef_el / 1000.0
-co2_heat_t = e_heat_kwh * ef_heat / 1000.0
-cost_el = e_el_kwh * p_el
-cost_heat = e_heat_kwh * p_heat
-co2_cost_baseline = 0.0
-if apply_co2_el:
-    co2_cost_baseline += co2_el_t * co2_price
-if apply_co2_heat:
-    co2_cost_baseline += co2_heat_t * co2_price
-
 baseline = {
-    "Energie Strom [kWh/a]": e_el_kwh,
-    "Energie Heizung [kWh/a]": e_heat_kwh,
-    "Kosten Strom [€/a]": cost_el,
-    "Kosten Heizung [€/a]": cost_heat,
-    "Emissionen Strom [tCO2/a]": co2_el_t,
-    "Emissionen Heizung [tCO2/a]": co2_heat_t,
-    "CO2-Kosten [€/a]": co2_cost_baseline,
-    "Gesamtkosten [€/a]": cost_el + cost_heat + co2_cost_baseline
+    key: float(value)
+    for key, value in baseline_kpis(e_el_kwh, e_heat_kwh, p_el, p_heat, ef_el, ef_heat, co2_price, apply_co2_el, apply_co2_heat).items()
+}
+
+# Inputs for the vectorized engine (scalars = one building)
+building_inputs = {
+    "e_el_kwh": e_el_kwh,
+    "e_heat_kwh": e_heat_kwh,
+    "p_el": p_el,
+    "p_heat": p_heat,
+    "ef_el": ef_el,
+    "ef_heat": ef_heat,
+    "co2_price": co2_price,
+    "apply_co2_el": apply_co2_el,
+    "apply_co2_heat": apply_co2_heat,
+    "index_factor": index_factor,
+    "umlage_pct_general": umlage_pct_general,
+    "umlage_pct_heating": umlage_pct_heating,
+    "pv_yield": pv_yield,
+    "rentable_area_m2": rentable_area_m2,
+    "avg_rent_eur_m2": avg_rent_eur_m2,
+    "cap_modernisierung_eur": cap_modernisierung_eur,
+    "cap_low_rent_eur": cap_low_rent_eur,
+    "cap_heating_special_eur": cap_heating_special_eur,
 }
 
 # ------------------------------
 # Measures editor
 # ------------------------------
 st.title("Qrauts AG Erhebungsbogen & Szenario-App – Energetische Sanierung")
-tab1, tab2, tab3 = st.tabs(["1) Erhebungsbogen & Basis", "2) Maßnahmen", "3) Ergebnisse & Szenarien"])
+# Only the selected view runs (st.tabs would execute and render all three on every rerun)
+views = ["1) Erhebungsbogen & Basis", "2) Maßnahmen", "3) Ergebnisse & Szenarien"]
+view = st.radio("Ansicht", views, horizontal=True, label_visibility="collapsed", key="view")
 
-with tab1:
+stage("view 1")
+if view == views[0]:
     st.subheader("Basisdaten & Kennzahlen")
     col1, col2, col3 = st.columns(3)
     col1.metric("Nutzfläche [m²]", f"{area_m2:,.0f}".replace(",", "."))
@@ -280,252 +189,377 @@ with tab1:
     st.dataframe(df_base)
     st.markdown("**Hinweis:** Emissionsfaktoren, CO₂-Preis und Energiepreise sind Eingangsparameter und sollten projektspezifisch belegt werden.")
 
-# Build editable measures dataframe
-def build_measures_df():
-    rows = []
-    for m in MEASURES:
-        qty = 0.0
-        if m["default_qty_from"] == "area":
-            qty = area_m2
-        elif m["default_qty_from"] == "units":
-            qty = units
-        elif m["default_qty_from"] == "common_area":
-            qty = common_area_m2
-        elif m["default_qty_from"] == "window_ratio":
-            qty = window_area_m2
-        elif m["default_qty_from"] == "pv_kwp":
-            qty = pv_kwp
-        elif m["default_qty_from"] == "derived_heat_load":
-            qty = derived_heat_load_kw
-            
-        rows.append({
-            "Aktiv": False,
-            "Code": m["code"],
-            "Maßnahme": m["name"],
-            "Kategorie": m["category"],
-            "Einheit": m["unit"],
-            "Menge": float(qty),
-            "Capex/Einheit @Index100 [€]": float(m["capex_unit_2021"]),
-            "Lebensdauer [a]": int(m["lifetime_y"]),
-            # defaults for savings and specifics
-            "Einsparung Heizung [%]": float(m["affects"].get("heating_pct", 0.0) * 100.0),
-            "Einsparung Strom [%]": float(m["affects"].get("electricity_pct", 0.0) * 100.0),
-            "Stromanteil für LED [% vom Strom]": float(m["affects"].get("electricity_share_of_total", 0.0) * 100.0),
-            "LED-Reduktion [% dieses Anteils]": float(m["affects"].get("electricity_pct_of_share", 0.0) * 100.0),
-            "WRG-Zusatzstrom [kWh/Wohneinheit]": float(m["affects"].get("electricity_extra_kwh_per_unit", 0.0)),
-            "HP SCOP": float(m["affects"].get("scop", 0.0)),
-            "HP Abdeckung Wärme [%]": float(m["affects"].get("coverage_share", 0.0) * 100.0),
-            "PV-spez. Ertrag [kWh/kWp]": float(m["affects"].get("pv_specific_yield", pv_yield)),
-            "PV-EV-Anteil [%]": float(m["affects"].get("self_consumption_share", pv_sc) * 100.0),
-            "PV-Einspeise [€/kWh]": float(m["affects"].get("feed_in_tariff_eur_kwh", pv_fit))
-        })
-    return pd.DataFrame(rows)
-
-if "measures_df" not in st.session_state:
-    st.session_state["measures_df"] = build_measures_df()
+stage("build_measures_df")
+# Shared default table (one per building inputs / catalog, see overlay.py) + this session's edits.
+# The editor in tab 2 starts from the committed edits; they are refreshed outside tab 2 or when
+# the base table changes, so the editor's data stays fixed while editing.
+try:
+    base_key, base_df = base_table(derived, pv_yield, pv_sc, pv_fit, st.session_state.get("catalog_key"))
+except ValueError as exc:
+    # uploaded catalog evicted from the shared cache: back to the default catalog, without its edits
+    st.warning(str(exc))
+    for key in ("catalog_key", "catalog_file_id", "measures_editor"):
+        st.session_state.pop(key, None)
+    st.session_state["measures_overlay"] = {}
+    base_key, base_df = base_table(derived, pv_yield, pv_sc, pv_fit)
+if view != views[1] or st.session_state.get("measures_base_key") != base_key:
+    st.session_state["measures_committed"] = st.session_state.get("measures_overlay", {})
+    st.session_state["measures_base_key"] = base_key
+measures_df = apply_overlay(base_df, st.session_state.get("measures_overlay", {}))
 
-with tab2:
+stage("view 2")
+if view == views[1]:
     st.subheader("Maßnahmenkatalog (bearbeitbar)")
     st.markdown("Aktivieren Sie Maßnahmen, passen Sie Mengen, Einsparannahmen und Capex an. Investitionskosten werden mit dem ausgewählten **Baupreisindex (Instandhaltung)** skaliert.")
-    edited_df = st.data_editor(
-        st.session_state["measures_df"],
-        num_rows="fixed",
-        key="measures_editor",
-        hide_index=True,
-        column_config={
-            "Aktiv": st.column_config.CheckboxColumn(),
-            "Menge": st.column_config.NumberColumn(format="%.2f", min_value=0),
-            "Einsparung Heizung [%]": st.column_config.NumberColumn(format="%.2f", min_value=0, max_value=100),
-            "Einsparung Strom [%]": st.column_config.NumberColumn(format="%.2f", min_value=0, max_value=100),
-            "Stromanteil für LED [% vom Strom]": st.column_config.NumberColumn(format="%.1f", min_value=0, max_value=100),
-            "LED-Reduktion [% dieses Anteils]": st.column_config.NumberColumn(format="%.1f", min_value=0, max_value=100),
-            "WRG-Zusatzstrom [kWh/Wohneinheit]": st.column_config.NumberColumn(format="%.1f", min_value=0),
-            "HP SCOP": st.column_config.NumberColumn(format="%.2f", min_value=0.1, max_value=8.0, help="Saisonale Leistungszahl"),
-            "HP Abdeckung Wärme [%]": st.column_config.NumberColumn(format="%.1f", min_value=0, max_value=100),
-            "PV-spez. Ertrag [kWh/kWp]": st.column_config.NumberColumn(format="%.1f", min_value=0),
-            "PV-EV-Anteil [%]": st.column_config.NumberColumn(format="%.1f", min_value=0, max_value=100),
-            "PV-Einspeise [€/kWh]": st.column_config.NumberColumn(format="%.3f", min_value=0)
-        },
-        use_container_width=True
-    )
-    st.session_state["measures_df"] = edited_df
+    catalog_file = st.file_uploader("Eigener Maßnahmenkatalog (JSON, Format wie measures.json) – optional", type=["json"])
+    if catalog_file is not None and st.session_state.get("catalog_file_id") != catalog_file.file_id:
+        try:
+            catalog_key = register_catalog(load_catalog(catalog_file))
+        except ValueError as exc:
+            st.error(str(exc))
+        else:
+            st.session_state.update(catalog_key=catalog_key, catalog_file_id=catalog_file.file_id, measures_overlay={})
+            st.session_state.pop("measures_editor", None)  # edits of the previous catalog
+            st.rerun()
+    with span("st.data_editor"):
+        edited_df = st.data_editor(
+            apply_overlay(base_df, st.session_state["measures_committed"]),
+            num_rows="fixed",
+            key="measures_editor",
+            hide_index=True,
+            column_config={
+                "Aktiv": st.column_config.CheckboxColumn(),
+                "Typ": st.column_config.TextColumn(disabled=True, help="Wirkungstyp aus dem Katalog"),
+                "Menge": st.column_config.NumberColumn(format="%.2f", min_value=0),
+                "Einsparung Heizung [%]": st.column_config.NumberColumn(format="%.2f", min_value=0, max_value=100),
+                "Einsparung Strom [%]": st.column_config.NumberColumn(format="%.2f", min_value=0, max_value=100),
+                "Stromanteil für LED [% vom Strom]": st.column_config.NumberColumn(format="%.1f", min_value=0, max_value=100),
+                "LED-Reduktion [% dieses Anteils]": st.column_config.NumberColumn(format="%.1f", min_value=0, max_value=100),
+                "WRG-Zusatzstrom [kWh/Wohneinheit]": st.column_config.NumberColumn(format="%.1f", min_value=0),
+                "HP SCOP": st.column_config.NumberColumn(format="%.2f", min_value=0.1, max_value=8.0, help="Saisonale Leistungszahl"),
+                "HP Abdeckung Wärme [%]": st.column_config.NumberColumn(format="%.1f", min_value=0, max_value=100),
+                "PV-spez. Ertrag [kWh/kWp]": st.column_config.NumberColumn(format="%.1f", min_value=0),
+                "PV-EV-Anteil [%]": st.column_config.NumberColumn(format="%.1f", min_value=0, max_value=100),
+                "PV-Einspeise [€/kWh]": st.column_config.NumberColumn(format="%.3f", min_value=0)
+            },
+            use_container_width=True
+        )
+    measures_df = edited_df
+    st.session_state["measures_overlay"] = overlay_from_table(base_df, edited_df)
+    n_edits = overlay_cells(st.session_state["measures_overlay"])
+    colE1, colE2 = st.columns([3, 1])
+    colE1.caption(f"{n_edits} geänderte Zellen gegenüber dem Standardkatalog (nur diese werden je Sitzung gespeichert).")
+    if n_edits and colE2.button("Änderungen verwerfen"):
+        st.session_state.update(measures_overlay={}, measures_committed={})
+        st.session_state.pop("measures_editor", None)
+        st.rerun()
 
 # ------------------------------
 # Simulation engine
 # ------------------------------
+@profiled("scenario_measures")
+def scenario_measures(measures_df: pd.DataFrame) -> dict:
+    # Measures table -> engine arrays; in hourly mode the PV self-consumption share comes from hourly.py
+    measures = measures_to_arrays(measures_df)
+    if hourly_pv:
+        measures = with_hourly_pv(building_inputs, measures, **hourly_settings)
+    if hourly_hp:
+        measures = with_hourly_hp(building_inputs, measures, **hourly_hp_settings)
+    return measures
+
+@profiled("simulate")
 def simulate(measures_df: pd.DataFrame):
-    # Start with baseline
-    el = e_el_kwh
-    heat = e_heat_kwh
-    # cumulative multiplicative reductions
-    heat_factor = 1.0
-    el_factor = 1.0
-    extra_el_kwh = 0.0
-    pv_self_kwh = 0.0
-    pv_feed_kwh = 0.0
-    hp_active = False
-    hp_scop = 3.0
-    hp_coverage = 0.0
-    total_capex = 0.0
-    ann_capex_general = 0.0
-    ann_capex_heating = 0.0
-    
-    for _, row in measures_df.iterrows():
-        if not bool(row.get("Aktiv", False)):
-            continue
-            
-        code = row["Code"]
-        qty = float(row["Menge"] or 0.0)
-        capex_unit_base = float(row["Capex/Einheit @Index100 [€]"] or 0.0)
-        capex = qty * capex_unit_base * (index_factor)
-        total_capex += capex
-        
-        # Umlage-Typ identifizieren (vereinfacht)
-        if code == "heat_pump_aw":
-            ann_capex_heating += capex * umlage_pct_heating
-        else:
-            ann_capex_general += capex * umlage_pct_general
-            
-        # Savings modeling
-        if code == "led_lighting":
-            share = (row["Stromanteil für LED [% vom Strom]"] or 0.0) / 100.0
-            red = (row["LED-Reduktion [% dieses Anteils]"] or 0.0) / 100.0
-            el_factor *= (1.0 - share * red)
-        elif code == "vent_wrg":
-            heat_factor *= (1.0 - (row["Einsparung Heizung [%]"] or 0.0) / 100.0)
-            extra_el_kwh += float(row["WRG-Zusatzstrom [kWh/Wohneinheit]"] or 0.0) * qty
-        elif code == "pv_system":
-            spec = float(row["PV-spez. Ertrag [kWh/kWp]"] or pv_yield)
-            sc = (row["PV-EV-Anteil [%]"] or 0.0) / 100.0
-            pv_prod = spec * qty
-            pv_self_kwh += pv_prod * sc
-            pv_feed_kwh += pv_prod * (1.0 - sc)
-        elif code == "heat_pump_aw":
-            hp_active = True
-            hp_scop = float(row["HP SCOP"] or 3.0)
-            hp_coverage = (row["HP Abdeckung Wärme [%]"] or 0.0) / 100.0
-        else:
-            # generic percentage savings
-            h_pct = (row["Einsparung Heizung [%]"] or 0.0) / 100.0
-            e_pct = (row["Einsparung Strom [%]"] or 0.0) / 100.0
-            heat_factor *= (1.0 - h_pct)
-            el_factor *= (1.0 - e_pct)
-    
-    # Apply multiplicative reductions
-    heat_after = heat * heat_factor
-    el_after = el * el_factor
-    
-    # Apply heat pump fuel switch after envelope/optimization effects
-    hp_el_kwh = 0.0
-    if hp_active and hp_coverage > 0.0 and hp_scop > 0.1:
-        covered_heat = heat_after * hp_coverage
-        hp_el_kwh = covered_heat / hp_scop
-        heat_after = heat_after * (1.0 - hp_coverage)  # Rest ggf. mit altem Carrier
-        el_after += hp_el_kwh
-    
-    # Apply PV self-consumption to reduce purchased electricity
-    el_after = max(0.0, el_after - pv_self_kwh)
-    # Add extra electricity consumption (e.g. WRG)
-    el_after += extra_el_kwh
-    
-    # Costs & emissions after
-    pv_feed_in_rate = float(measures_df.loc[measures_df["Code"]=="pv_system", "PV-Einspeise [€/kWh]"].values[0] if "pv_system" in measures_df["Code"].values else 0.0)
-    cost_el_after = el_after * p_el - pv_feed_kwh * pv_feed_in_rate
-    cost_heat_after = heat_after * p_heat
-    co2_el_after_t = el_after * ef_el / 1000.0
-    co2_heat_after_t = heat_after * ef_heat / 1000.0
-    co2_cost_after = 0.0
-    if apply_co2_el:
-        co2_cost_after += co2_el_after_t * co2_price
-    if apply_co2_heat:
-        co2_cost_after += co2_heat_after_t * co2_price
-        
-    totals = {
-        "capex_total": total_capex,
-        "ann_capex_general": ann_capex_general,
-        "ann_capex_heating": ann_capex_heating,
-        "el_after": el_after,
-        "heat_after": heat_after,
-        "hp_el_kwh": hp_el_kwh,
-        "pv_self_kwh": pv_self_kwh,
-        "pv_feed_kwh": pv_feed_kwh,
-        "cost_el_after": cost_el_after,
-        "cost_heat_after": cost_heat_after,
-        "co2_el_after_t": co2_el_after_t,
-        "co2_heat_after_t": co2_heat_after_t,
-        "co2_cost_after": co2_cost_after
-    }
-    return totals
+    # Row-free evaluation via the vectorized engine (see engine.py)
+    totals = cached_call(simulate_batch, building_inputs, scenario_measures(measures_df))
+    return {key: float(value) for key, value in totals.items()}
 
-with tab3:
+
+stage("view 3")
+if view == views[2]:
     st.subheader("Ergebnisse & Szenarien")
-    results = simulate(st.session_state["measures_df"])
-    
-    # Summaries
-    cost_after_total = results["cost_el_after"] + results["cost_heat_after"] + results["co2_cost_after"]
-    savings_eur_pa = baseline["Gesamtkosten [€/a]"] - cost_after_total
-    co2_savings_t = (baseline["Emissionen Strom [tCO2/a]"] + baseline["Emissionen Heizung [tCO2/a]"]) - (results["co2_el_after_t"] + results["co2_heat_after_t"])
+    import plotly.express as px  # Plotly is loaded on first use of the results view
+    import plotly.graph_objects as go
+    results = simulate(measures_df)
     
-    # Umlage – vereinfachte Abbildung §559 / §559e (Kappungsgrenzen je 6 Jahre)
-    cap_limit = cap_low_rent_eur if avg_rent_eur_m2 < 7.0 else cap_modernisierung_eur
-    # jährliche Obergrenze pro m²: Cap / 6
-    annual_cap_per_m2 = cap_limit / 6.0
-    annual_cap_heating_per_m2 = cap_heating_special_eur / 6.0
-    ann_umlage_general = min(results["ann_capex_general"] / max(1.0, rentable_area_m2), annual_cap_per_m2) * rentable_area_m2
-    ann_umlage_heating = min(results["ann_capex_heating"] / max(1.0, rentable_area_m2), annual_cap_heating_per_m2) * rentable_area_m2
-    ann_umlage_total = ann_umlage_general + ann_umlage_heating
-    landlord_net_savings = savings_eur_pa + ann_umlage_total
-    simple_payback_y = results["capex_total"] / max(1e-9, landlord_net_savings) if landlord_net_savings > 0 else np.inf
+    # Summaries & Umlage (§559 / §559e, Kappungsgrenzen je 6 Jahre)
+    umlage_res = umlage(
+        results["ann_capex_general"], results["ann_capex_heating"], rentable_area_m2, avg_rent_eur_m2,
+        cap_modernisierung_eur, cap_low_rent_eur, cap_heating_special_eur,
+    )
+    kpis = scenario_kpis(baseline, results, umlage_res)
+    annual_cap_per_m2 = float(umlage_res["annual_cap_per_m2"])
+    annual_cap_heating_per_m2 = float(umlage_res["annual_cap_heating_per_m2"])
+    ann_umlage_total = float(umlage_res["ann_umlage_total"])
+    savings_eur_pa = float(kpis["savings_eur_pa"])
+    co2_savings_t = float(kpis["co2_savings_t"])
+    simple_payback_y = float(kpis["simple_payback_y"])
+    # tables and figures of this view come from report.py (same as the portfolio reports);
+    # figures are rebuilt only when their data changes (see cache.py)
+    view_results = {key: float(value) for part in (baseline, results, umlage_res, kpis) for key, value in part.items()}
     
     cols = st.columns(4)
     cols[0].metric("CAPEX gesamt [€]", f"{results['capex_total']:,.0f}".replace(",", "."))
     cols[1].metric("Einsparung p.a. [€]", f"{savings_eur_pa:,.0f}".replace(",", "."))
     cols[2].metric("CO₂-Einsparung [t/a]", f"{co2_savings_t:,.2f}".replace(",", "."))
     cols[3].metric("Amortisation (vereinfachte) [a]", "∞" if np.isinf(simple_payback_y) else f"{simple_payback_y:,.1f}".replace(",", "."))
+    if hourly_hp:
+        hp = {key: float(value) for key, value in package_heat_pump(
+            building_inputs, measures_to_arrays(measures_df), **hourly_hp_settings).items()}
+        colW = st.columns(4)
+        colW[0].metric("WP-Leistung (Auslegung) [kW_th]", f"{hp['hp_kw']:,.1f}".replace(",", "."))
+        colW[1].metric("JAZ (stündlich)", f"{hp['scop']:.2f}")
+        colW[2].metric("WP-Deckungsanteil [%]", f"{hp['coverage']*100:.1f}")
+        colW[3].metric("Elektr. Spitzenlast WP [kW]", f"{hp['peak_el_kw']:,.1f}".replace(",", "."),
+                       help="Bivalenzpunkt: " + ("–" if np.isnan(hp["bivalence_c"]) else f"{hp['bivalence_c']:.1f} °C"))
     
     st.markdown("### Kosten & Emissionen – Vorher/Nachher")
-    df_comp = pd.DataFrame({
-        "Kategorie": ["Stromkosten", "Heizkosten", "CO₂-Kosten", "Gesamt"],
-        "Vorher [€/a]": [baseline["Kosten Strom [€/a]"], baseline["Kosten Heizung [€/a]"], baseline["CO2-Kosten [€/a]"], baseline["Gesamtkosten [€/a]"]],
-        "Nachher [€/a]": [results["cost_el_after"], results["cost_heat_after"], results["co2_cost_after"], cost_after_total]
-    })
+    with span("df_comp"):
+        df_comp = comparison_table(view_results)
     st.dataframe(df_comp, use_container_width=True)
     
     st.markdown("### Strom- und Heizenergie – Vorher/Nachher [kWh/a]")
-    df_energy = pd.DataFrame({
-        "Energie": ["Strom", "Heizung"],
-        "Vorher": [e_el_kwh, e_heat_kwh],
-        "Nachher": [results["el_after"], results["heat_after"]]
-    })
-    fig1 = px.bar(df_energy, x="Energie", y=["Vorher", "Nachher"], barmode="group", title="Energieverbrauch [kWh/a]")
-    st.plotly_chart(fig1, use_container_width=True)
+    with span("df_energy"):
+        df_energy = energy_table(view_results)
+    with span("px.bar"):
+        fig1 = cached_call(energy_figure, df_energy)
+    with span("st.plotly_chart", figure="energy"):
+        st.plotly_chart(fig1, use_container_width=True)
     
     st.markdown("### Waterfall: Jährliche Netto-Wirkung [€]")
-    wf = pd.DataFrame({
-        "Stufe": ["Baseline-Kosten", "– Einsparungen Energie/CO₂", "+ Umlage (Mieter)", "Gesamt Nachher"],
-        "Wert": [baseline["Gesamtkosten [€/a]"], -savings_eur_pa, ann_umlage_total, cost_after_total]
-    })
-    
-    fig2 = go.Figure(go.Waterfall(
-        name="Kostenwirkung",
-        orientation="v",
-        measure=["absolute", "relative", "relative", "total"],
-        x=wf["Stufe"],
-        y=wf["Wert"],
-        connector={"line": {"color": "rgb(63, 63, 63)"}}
-    ))
-    fig2.update_layout(title="Kostenwirkung p.a.", waterfallgap=0.3)
-    st.plotly_chart(fig2, use_container_width=True)
+    with span("wf"):
+        wf = waterfall_table(view_results)
+    with span("go.Waterfall"):
+        fig2 = cached_call(waterfall_figure, wf)
+    with span("st.plotly_chart", figure="waterfall"):
+        st.plotly_chart(fig2, use_container_width=True)
     
     st.markdown("### Detail: Umlage (vereinfachtes Modell)")
     st.write(f"Allg. Umlage (§559, {umlage_pct_general*100:.1f}% p.a.) begrenzt auf {annual_cap_per_m2:.2f} €/m²·a, Heizung (§559e, {umlage_pct_heating*100:.1f}% p.a.) begrenzt auf {annual_cap_heating_per_m2:.2f} €/m²·a.")
-    df_umlage = pd.DataFrame({
-        "Komponente": ["Umlage allg.", "Umlage Heizung", "Umlage gesamt"],
-        "€/a": [ann_umlage_general, ann_umlage_heating, ann_umlage_total],
-        "€/m²·a": [ann_umlage_general/max(1.0, rentable_area_m2), ann_umlage_heating/max(1.0, rentable_area_m2), ann_umlage_total/max(1.0, rentable_area_m2)]
-    })
+    df_umlage = umlage_table(view_results, rentable_area_m2)
     st.dataframe(df_umlage, use_container_width=True)
     
+    st.markdown("### Lebenszyklus: Cashflows, Kapitalwert (NPV) & IRR")
+    with st.expander("Mehrjährige Wirtschaftlichkeit inkl. Reinvestitionen nach Lebensdauer"):
+        colL1, colL2, colL3 = st.columns(3)
+        lc_horizon = colL1.slider("Betrachtungszeitraum [a]", 5, 40, 30)
+        lc_rate = colL2.number_input("Kalkulationszins [%]", min_value=0.0, max_value=20.0, value=4.0, step=0.5) / 100.0
+        lc_capex_esc = colL3.number_input("Baukostensteigerung [% p.a.]", min_value=0.0, max_value=20.0, value=2.0, step=0.5) / 100.0
+        lc_esc_el = colL1.number_input("Strompreissteigerung [% p.a.]", min_value=-10.0, max_value=20.0, value=2.0, step=0.5) / 100.0
+        lc_esc_heat = colL2.number_input(f"{carrier}-Preissteigerung [% p.a.]", min_value=-10.0, max_value=20.0, value=3.0, step=0.5) / 100.0
+        lc_co2_step = colL3.number_input("CO₂-Preis-Anstieg [€/t je Jahr]", min_value=0.0, value=10.0, step=1.0)
+        lc = lifecycle(
+            building_inputs, scenario_measures(measures_df),
+            horizon=lc_horizon, discount_rate=lc_rate, esc_el=lc_esc_el, esc_heat=lc_esc_heat,
+            co2_step_eur_t=lc_co2_step, capex_escalation=lc_capex_esc,
+        )
+        lc_irr = float(lc["irr"])
+        lc_payback = float(lc["discounted_payback_y"])
+        colR1, colR2, colR3 = st.columns(3)
+        colR1.metric("Kapitalwert (NPV) [€]", f"{float(lc['npv_eur']):,.0f}".replace(",", "."))
+        colR2.metric("Interner Zinsfuß (IRR)", "–" if np.isnan(lc_irr) else f"{lc_irr*100:.1f} %")
+        colR3.metric("Dynamische Amortisation [a]", "∞" if np.isinf(lc_payback) else f"{lc_payback:,.1f}".replace(",", "."))
+        lc_years = np.arange(lc_horizon + 1)
+        fig_lc = go.Figure()
+        fig_lc.add_bar(x=lc_years, y=lc["cash_flows"], name="Cashflow [€]")
+        fig_lc.add_scatter(x=lc_years, y=np.cumsum(lc["cash_flows"] * (1.0 + lc_rate) ** -lc_years), name="kumuliert, diskontiert [€]")
+        fig_lc.update_layout(title="Jährliche Cashflows (inkl. Reinvestitionen, Restwert im letzten Jahr)", xaxis_title="Jahr")
+        st.plotly_chart(fig_lc, use_container_width=True)
+    
+    st.markdown("### Beitrag je Maßnahme (Shapley-Werte / Leave-one-out)")
+    df_attr = attribute(building_inputs, scenario_measures(measures_df))
+    if df_attr.empty:
+        st.caption("Keine Maßnahme aktiv.")
+    else:
+        st.caption("Shapley: fairer Anteil an der Gesamtwirkung über alle Reihenfolgen (Summe = Paketwirkung); "
+                   "Leave-one-out: Verlust, wenn nur diese Maßnahme entfällt.")
+        st.dataframe(df_attr, use_container_width=True, hide_index=True)
+        fig_attr = px.bar(df_attr, x="Code", y=["Shapley [€/a]", "Leave-one-out [€/a]"], barmode="group",
+                          title="Einsparbeitrag je Maßnahme [€/a]")
+        st.plotly_chart(fig_attr, use_container_width=True)
+    
+    st.markdown("### PV-/Speicher-Dimensionierung (8760 h)")
+    with st.expander("Eigenverbrauch und Autarkie über PV-Größe und Speicher"):
+        if st.checkbox("Dimensionierungskurven berechnen", value=False):
+            profiles = {key: hourly_settings.get(key) for key in ("load_profile", "pv_profile")}
+            df_sizing = sizing_curves(e_el_kwh, pv_yield, np.linspace(10.0, max(20.0, 2.0 * pv_kwp), 12),
+                                      [0.0, 0.5 * pv_kwp, pv_kwp, 2.0 * pv_kwp], **profiles)
+            df_sizing["Speicher [kWh]"] = df_sizing["Speicher [kWh]"].map(lambda v: f"{v:,.0f} kWh".replace(",", "."))
+            fig_pv = px.line(df_sizing, x="PV [kWp]", y="Eigenverbrauchsanteil [%]", color="Speicher [kWh]", markers=True,
+                             hover_data=["Autarkiegrad [%]"], title="Eigenverbrauchsanteil nach PV-Größe und Speicher")
+            st.plotly_chart(fig_pv, use_container_width=True)
+
+    st.markdown("### Pareto-Optimierung (Maßnahmenpakete)")
+    with st.expander("Alle Kombinationen des Katalogs bewerten"):
+        budget_eur = st.number_input("CAPEX-Budget [€] (0 = unbegrenzt)", min_value=0.0, value=0.0, step=10000.0)
+        if st.checkbox("Pareto-Front berechnen (CAPEX vs. Einsparung vs. CO₂ vs. Amortisation)", value=False):
+            df_pareto = pareto_packages(
+                building_inputs, scenario_measures(measures_df),
+                budget=budget_eur if budget_eur > 0 else None,
+            )
+            st.dataframe(df_pareto.drop(columns="mask"), use_container_width=True)
+            fig3 = px.scatter(df_pareto, x="capex_total", y="savings_eur_pa", color="co2_savings_t",
+                              hover_data=["Maßnahmen", "simple_payback_y"], title="Pareto-optimale Pakete")
+            st.plotly_chart(fig3, use_container_width=True)
+
+    st.markdown("### Sanierungsfahrplan (Jahresbudgets)")
+    rm_plan = None
+    with st.expander("Aktive Maßnahmen auf Jahre verteilen"):
+        colF1, colF2, colF3, colF4 = st.columns(4)
+        rm_start = colF1.number_input("Startjahr", min_value=2021, max_value=2060, value=2025, step=1)
+        rm_years = colF2.slider("Planungsjahre", 1, 15, 5)
+        rm_budget = colF3.number_input("Budget je Jahr [€]", min_value=0.0, value=300000.0, step=10000.0)
+        rm_objective = colF4.selectbox("Ziel", ["CO₂-Reduktion (kumuliert)", "Kapitalwert (NPV)"])
+        if st.checkbox("Fahrplan berechnen", value=False):
+            rm_measures = scenario_measures(measures_df)
+            try:
+                rm = plan_roadmap(
+                    building_inputs, rm_measures, int(rm_start), [rm_budget] * rm_years,
+                    objective="co2" if rm_objective.startswith("CO₂") else "npv",
+                    candidates=rm_measures["active"] if rm_measures["active"].any() else None,
+                )
+            except ValueError as exc:
+                st.error(f"{exc} Kandidaten sind die in Tab 2 aktiven Maßnahmen.")
+            else:
+                rm_plan = rm["plan"]
+                st.dataframe(rm_plan, use_container_width=True, hide_index=True)
+                st.caption("CAPEX je Jahr mit Baupreisindex (ab dem letzten Quartal fortgeschrieben); Hüllmaßnahmen vor der Wärmepumpe, "
+                           "die Wärmepumpe wird auf die verbleibende Heizlast ausgelegt.")
+                fig_rm = px.line(rm["plan"], x="Jahr", y="CO₂-Einsparung [t/a]", markers=True, title="CO₂-Einsparung nach Umsetzungsjahr")
+                st.plotly_chart(fig_rm, use_container_width=True)
+
+    st.markdown("### Umlage je Wohneinheit (Mieterliste)")
+    with st.expander("Kappungsgrenzen je Einheit im rollierenden 6-Jahres-Fenster"):
+        roll_file = st.file_uploader("Mieterliste (CSV/Parquet): unit_id, area_m2, rent_eur_m2, increase_<i>_date, "
+                                     "increase_<i>_eur_m2, increase_<i>_kind", type=["csv", "parquet"])
+        roll = None
+        if roll_file is not None:
+            try:
+                roll = read_rent_roll(roll_file, by_building=False)
+            except ValueError as exc:
+                st.error(str(exc))
+        if roll is not None:
+            staged = rm_plan is not None and st.checkbox("Stufen aus dem Sanierungsfahrplan", value=True)
+            if staged:
+                rr_years, rr_general, rr_heating = steps_from_plan(rm_plan, umlage_pct_general, umlage_pct_heating)
+            else:
+                rr_year = st.number_input("Jahr der Mieterhöhung", min_value=2000.0, max_value=2060.0, value=2025.0, step=0.5)
+                rr_years, rr_general, rr_heating = [rr_year], [results["ann_capex_general"]], [results["ann_capex_heating"]]
+            rr = rent_roll_umlage(roll, rr_years, rr_general, rr_heating, cap_modernisierung_eur, cap_low_rent_eur,
+                                  cap_heating_special_eur)
+            st.dataframe(pd.DataFrame({
+                "Jahr": rr["years"],
+                "Umlage beantragt [€/a]": (rr["requested_general_eur_m2"] + rr["requested_heating_eur_m2"]) @ roll["area_m2"] * 12.0,
+                "Umlage allg. [€/a]": rr["ann_umlage_general"][:, 0],
+                "Umlage Heizung [€/a]": rr["ann_umlage_heating"][:, 0],
+                "Gekappte Einheiten": rr["capped_units"][:, 0].astype(int),
+            }), use_container_width=True, hide_index=True)
+            st.dataframe(unit_table(roll, rr), use_container_width=True, hide_index=True)
+            st.caption(f"{len(roll['area_m2'])} Einheiten, {roll['area_m2'].sum():,.0f} m². Vereinfachtes Gebäudemodell oben: "
+                       f"{ann_umlage_total:,.0f} €/a. Kappung je Einheit: {cap_low_rent_eur:.2f} €/m² bei Miete < 7 €/m², "
+                       f"sonst {cap_modernisierung_eur:.2f} €/m², Heizung {cap_heating_special_eur:.2f} €/m² – "
+                       "jeweils Monatsmiete innerhalb von 6 Jahren inkl. früherer Erhöhungen.")
+
+    st.markdown("### Monte-Carlo-Unsicherheit")
+    with st.expander("Bandbreiten für Einsparung, CO₂-Reduktion und Amortisation"):
+        colM1, colM2, colM3 = st.columns(3)
+        mc_n = colM1.selectbox("Stichproben", [10_000, 100_000, 1_000_000], index=1)
+        spread_prices = colM2.number_input("± Energiepreise [%]", min_value=0.0, max_value=90.0, value=20.0, step=5.0) / 100.0
+        spread_co2 = colM3.number_input("± CO₂-Preis [%]", min_value=0.0, max_value=90.0, value=30.0, step=5.0) / 100.0
+        spread_index = colM1.number_input("± Baupreisindex [%]", min_value=0.0, max_value=90.0, value=10.0, step=5.0) / 100.0
+        spread_savings = colM2.number_input("± Einsparannahmen [%]", min_value=0.0, max_value=90.0, value=25.0, step=5.0) / 100.0
+        spread_scop = colM3.number_input("± HP SCOP [%]", min_value=0.0, max_value=90.0, value=15.0, step=5.0) / 100.0
+        if st.checkbox("Monte-Carlo-Simulation starten", value=False):
+            mc_measures = scenario_measures(measures_df)
+            mc_dists = triangular_spreads(building_inputs, mc_measures, mc_measures["active"], {
+                "p_el": spread_prices, "p_heat": spread_prices, "co2_price": spread_co2, "index_factor": spread_index,
+                "*.heat_pct": spread_savings, "*.el_pct": spread_savings, "*.hp_scop": spread_scop,
+            })
+            mc = run_monte_carlo(building_inputs, mc_measures, mc_dists, n_samples=mc_n)
+            st.dataframe(mc["summary"], use_container_width=True, hide_index=True)
+            st.metric("P(Amortisation > Lebensdauer)", f"{mc['p_payback_exceeds_lifetime']*100:.1f} %",
+                      help="Lebensdauer des Pakets: CAPEX-gewichtetes Mittel der aktiven Maßnahmen")
+    
+    st.markdown("### Parameter-Sweep & Break-even")
+    with st.expander("Kennzahl über zwei Eingaben als Heatmap, Schwelle als Linie"):
+        sw_measures = scenario_measures(measures_df)
+        sw_params = {
+            "p_heat": (f"{carrier}-Preis [€/kWh]", p_heat),
+            "p_el": ("Strompreis [€/kWh]", p_el),
+            "co2_price": ("CO₂-Preis [€/t]", co2_price),
+            "index_factor": ("Baupreisindex-Faktor", index_factor),
+            "*.heat_pct": ("Faktor auf Einsparannahmen Heizung", 1.0),
+            "*.el_pct": ("Faktor auf Einsparannahmen Strom", 1.0),
+        }
+        if "heat_pump_aw" in list(sw_measures["code"]):
+            sw_params["heat_pump_aw.hp_scop"] = ("HP SCOP", float(sw_measures["hp_scop"][list(sw_measures["code"]).index("heat_pump_aw")]))
+        colX1, colX2, colX3 = st.columns(3)
+        sw_x = colX1.selectbox("x-Achse", list(sw_params), index=0, format_func=lambda k: sw_params[k][0])
+        sw_y = colX2.selectbox("y-Achse", [k for k in sw_params if k != sw_x], index=1, format_func=lambda k: sw_params[k][0])
+        sw_n = colX3.selectbox("Rasterpunkte je Achse", [50, 100, 200], index=2)
+        sw_metric = colX1.selectbox("Kennzahl", list(SWEEP_METRICS), format_func=SWEEP_METRICS.get)
+        sw_target = colX2.number_input("Schwelle (Break-even)", value=0.0 if sw_metric == "npv_eur" else 10.0, step=1.0)
+        x_now, y_now = sw_params[sw_x][1], sw_params[sw_y][1]
+        x_lo, x_hi = colX3.slider("Bereich x [% des aktuellen Werts]", 0, 400, (50, 200)) if x_now else (0, 100)
+        y_lo, y_hi = colX1.slider("Bereich y [% des aktuellen Werts]", 0, 400, (0, 300)) if y_now else (0, 100)
+        if st.checkbox("Sweep berechnen", value=False):
+            # parameters with current value 0 (e.g. CO₂ price) are swept over 0..100 in their own unit
+            xs = np.linspace(x_lo / 100.0 * (x_now or 1.0), x_hi / 100.0 * (x_now or 1.0), sw_n)
+            ys = np.linspace(y_lo / 100.0 * (y_now or 1.0), y_hi / 100.0 * (y_now or 1.0), sw_n)
+            sw_economics = dict(horizon=lc_horizon, discount_rate=lc_rate, esc_el=lc_esc_el, esc_heat=lc_esc_heat,
+                                co2_step_eur_t=lc_co2_step, capex_escalation=lc_capex_esc)
+            with span("sweep", points=sw_n * sw_n):
+                grid = cached_call(sweep, building_inputs, sw_measures, {sw_y: ys, sw_x: xs}, metrics=(sw_metric,), **sw_economics)[sw_metric]
+            with span("break_even", points=sw_n):
+                curve = cached_call(break_even, building_inputs, sw_measures, sw_x, xs[0], xs[-1], target=sw_target, metric=sw_metric,
+                                    axes={sw_y: ys}, xtol=(xs[-1] - xs[0]) * 1e-4, **sw_economics)
+                now = float(cached_call(break_even, building_inputs, sw_measures, sw_x, xs[0], xs[-1], target=sw_target,
+                                        metric=sw_metric, xtol=(xs[-1] - xs[0]) * 1e-4, **sw_economics))
+            fig_sw = px.imshow(np.where(np.isfinite(grid), grid, np.nan), x=xs, y=ys, origin="lower", aspect="auto",
+                               labels={"x": sw_params[sw_x][0], "y": sw_params[sw_y][0], "color": SWEEP_METRICS[sw_metric]},
+                               color_continuous_scale="RdYlGn_r" if sw_metric.endswith("_y") else "RdYlGn")
+            fig_sw.add_trace(go.Scatter(x=curve, y=ys, mode="lines", line={"color": "black", "width": 2},
+                                        name=f"Schwelle {sw_target:g}"))
+            fig_sw.add_trace(go.Scatter(x=[x_now], y=[y_now], mode="markers", marker={"color": "black", "size": 10, "symbol": "x"},
+                                        name="aktuell"))
+            fig_sw.update_layout(legend={"orientation": "h", "y": -0.2})
+            st.plotly_chart(fig_sw, use_container_width=True)
+            st.caption(f"Break-even {sw_params[sw_x][0]} bei aktuellen übrigen Eingaben: "
+                       + ("außerhalb des Bereichs" if np.isnan(now) else f"{now:,.4g}".replace(",", "X").replace(".", ",").replace("X", "."))
+                       + f" · {sw_n * sw_n:,} Rasterpunkte in einem vektorisierten Aufruf".replace(",", "."))
+
+    st.markdown("### Szenario-Speicher")
+    with st.expander("Szenarien speichern, laden und vergleichen"):
+        colS1, colS2, colS3 = st.columns(3)
+        store_building = colS1.text_input("Gebäude-ID", value="Gebäude 1", key="store_building")
+        store_name = colS2.text_input("Szenario-Name", value="", key="store_name")
+        store_tag = colS3.text_input("Tag", value="", key="store_tag")
+        store_save = st.button("Aktuelles Szenario speichern")
+        # the database file is created with the first saved scenario
+        if store_save or os.path.exists(STORE_PATH):
+            with ScenarioStore(STORE_PATH) as store:
+                if store_save:
+                    store.save(store_building, building_inputs, scenario_measures(measures_df),
+                               results={**baseline, **results, **umlage_res, **kpis}, tag=store_tag, name=store_name)
+                saved = store.find(building=store_building)
+                if len(saved) == 0:
+                    st.caption("Für diese Gebäude-ID sind noch keine Szenarien gespeichert.")
+                else:
+                    labels = {i: f"{c} · {t or '–'} · {n or h[:8]}" for i, c, t, n, h in
+                              zip(saved.index, saved["created"], saved["tag"], saved["name"], saved["hash"])}
+                    st.dataframe(saved[["created", "tag", "name", "capex_total", "savings_eur_pa", "co2_savings_t", "simple_payback_y"]].rename(
+                        columns={"created": "Gespeichert", "tag": "Tag", "name": "Name", "capex_total": "CAPEX [€]",
+                                 "savings_eur_pa": "Einsparung [€/a]", "co2_savings_t": "CO₂-Einsparung [t/a]",
+                                 "simple_payback_y": "Amortisation [a]"}), use_container_width=True, hide_index=True)
+                    picked = st.multiselect("Vergleichen (erstes = Referenz)", list(labels), format_func=labels.get, key="store_compare")
+                    if picked:
+                        st.dataframe(compare(saved.loc[picked]), use_container_width=True)
+                        if st.button("Maßnahmen des ersten Szenarios übernehmen"):
+                            _, stored_measures = store.load(saved.loc[picked[0], "hash"])
+                            st.session_state["measures_overlay"] = overlay_from_table(base_df, measures_table(measures_df, stored_measures))
+                            st.rerun()
+        st.caption("Gleiche Eingaben werden anhand eines Inhalts-Hashes nur einmal gespeichert. Übernommen wird die "
+                   "Maßnahmentabelle; Sidebar-Eingaben bitte bei Bedarf angleichen.")
+
     st.markdown("### Hinweise")
     st.info(
         "• Investitionskosten werden anhand des Destatis **Baupreisindex (Instandhaltung, 2021=100)** skaliert.\n"
@@ -534,6 +568,7 @@ with tab3:
         "• PV-Logik: Eigenverbrauch reduziert Strombezug; Überschuss wird mit der angegebenen Vergütung saldiert."
     )
 
+stage("footer")
 st.markdown("---")
 with st.expander("Quellen (Kurzüberblick)"):
     st.markdown("""
@@ -542,3 +577,48 @@ with st.expander("Quellen (Kurzüberblick)"):
 - **Emissionsfaktor Strommix**: UBA – 2024: 363 g CO₂/kWh (Inlandsverbrauch).
 - **Erdgas/Heizöl Emissionsfaktoren**: BMWK/BAFA Richtwerte.
     """)
+
+cache_stats = CACHE.stats()
+st.sidebar.markdown("---")
+st.sidebar.caption(
+    f"Ergebnis-Cache: {cache_stats['hits']} Treffer (+{cache_stats['disk_hits']} Disk), {cache_stats['misses']} Fehlzugriffe, "
+    f"Trefferquote {cache_stats['hit_rate']*100:.0f} %, {cache_stats['entries']} Einträge / {cache_stats['memory_mb']:.1f} MB"
+)
+if st.sidebar.button("Cache leeren"):
+    CACHE.clear()
+run_ctx = get_script_run_ctx()
+session_footprint = record_session(run_ctx.session_id if run_ctx else "local", st.session_state)
+server_sessions = sessions_summary()
+st.sidebar.caption(
+    f"Sitzung: {session_footprint['bytes'] / 1024.0:.0f} kB (Serialisierung {session_footprint['pickle_ms']:.1f} ms) · "
+    f"Server: {server_sessions['sessions']} Sitzungen, Ø {server_sessions['mean_bytes'] / 1024.0:.0f} kB"
+)
+st.sidebar.checkbox("Profiling (Zeitmessung je Rerun)", key="profiling",
+                    help="Zeigt Dauer je Schritt und Speicherbedarf des Session-States; Export als Chrome-Trace")
+
+# ------------------------------
+# Debug: profile of this rerun
+# ------------------------------
+if profiler is not None:
+    stage(None)
+    sizes = profiler.snapshot("session_state", st.session_state)
+    runs = st.session_state.setdefault("profile_runs", [])
+    runs.append(profiler.events)
+    del runs[:-PROFILE_HISTORY]
+    with st.expander("Profiling (Debug)", expanded=True):
+        total_ms = sum(e["dur"] for e in profiler.events if e["ph"] == "X" and e["args"].get("stage")) / 1000.0
+        st.caption(f"Dieser Rerun: {total_ms:,.1f} ms (ohne Übertragung an den Browser)".replace(",", "."))
+        df_profile = pd.DataFrame(profiler.summary(), columns=["name", "calls", "total_ms", "mean_ms", "max_ms"]).rename(columns={
+            "name": "Schritt", "calls": "Aufrufe", "total_ms": "Summe [ms]", "mean_ms": "Mittel [ms]", "max_ms": "Max [ms]"})
+        st.dataframe(df_profile, use_container_width=True, hide_index=True)
+        df_memory = pd.DataFrame({"Schlüssel": list(sizes), "Größe [kB]": [v / 1024.0 for v in sizes.values()]})
+        st.markdown(f"**st.session_state**: {sum(sizes.values()) / 1024.0:,.1f} kB".replace(",", "."))
+        st.dataframe(df_memory.sort_values("Größe [kB]", ascending=False), use_container_width=True, hide_index=True)
+        st.caption(f"Pickle aller Schlüssel: {session_footprint['pickle_bytes'] / 1024.0:,.1f} kB in {session_footprint['pickle_ms']:.1f} ms"
+                   f" ({session_footprint['unpicklable']} nicht serialisierbar) · Server: {server_sessions['sessions']} aktive Sitzungen,"
+                   f" zusammen {server_sessions['total_bytes'] / 1024.0:,.1f} kB, max. {server_sessions['max_bytes'] / 1024.0:,.1f} kB".replace(",", "."))
+        trace = Profiler("energyaudit")
+        for events in runs:
+            trace.add_events(events)
+        st.download_button(f"Chrome-Trace der letzten {len(runs)} Reruns (JSON)", json.dumps(trace.chrome_trace(), default=str),
+                           file_name="energyaudit_trace.json", mime="application/json")
@@ -0,0 +1,352 @@
+# benchmark.py
+# ------------------------------
+# Benchmark suite for the model core (offline, no Streamlit)
+# Times the building blocks of a rerun (measures table, simulate for 1 / all / random
+# measure selections, Umlage caps, baseline KPIs), a synthetic 10k-building portfolio
+# chunk and a 200x200 price sweep with break-even curve, and checks that the vectorized
+# engine reproduces the original row-by-row (iterrows) simulate() of the app in € and
+# tCO2 for random buildings and selections.
+# Results are written as JSON; with --baseline a previous run is compared and the exit
+# code is 1 if a benchmark got slower than --threshold or the equivalence check fails.
+#
+#   python benchmark.py --out bench.json
+#   python benchmark.py --out bench_new.json --baseline bench.json --threshold 1.25
+#
+# Timings use timeit (auto-ranged loops, median/best of --repeat runs per call) and the
+# uncached functions, so the result cache does not hide engine changes.
+# ------------------------------
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from engine import CODE_HP, CODE_LED, CODE_PV, CODE_WRG, RESULT_KEYS, measures_to_arrays, simulate_batch, stack_measures
+from catalog import catalog_entries, catalog_from_entries
+from model import CATALOG, DEFAULT_EF, DEFAULT_INPUTS, baseline_kpis, build_measures_df, derive_quantities, simulate, umlage
+from portfolio import building_inputs, evaluate_chunk
+from sweep import break_even, sweep
+
+EURO_KEYS = ("capex_total", "ann_capex_general", "ann_capex_heating", "cost_el_after", "cost_heat_after", "co2_cost_after")
+CO2_KEYS = ("co2_el_after_t", "co2_heat_after_t")
+DEFAULT_THRESHOLD = 1.25      # current / baseline median above this counts as regression
+MIN_REGRESSION_MS = 0.05      # ignore differences below timer noise
+ABS_TOLERANCE = 1e-6          # € resp. t
+REL_TOLERANCE = 1e-9
+DEFAULT_OUT = os.path.join(os.path.expanduser("~"), ".cache", "energyaudit", "benchmark_results.json")
+
+
+# ------------------------------
+# Reference implementation: the app's original simulate(), row by row
+# Same rules as before the engine existed; the sidebar globals come from `inputs`.
+# ------------------------------
+def reference_simulate(inputs: dict, measures_df: pd.DataFrame) -> dict:
+    heat_factor = 1.0
+    el_factor = 1.0
+    extra_el_kwh = 0.0
+    pv_self_kwh = 0.0
+    pv_feed_kwh = 0.0
+    hp_active = False
+    hp_scop = 3.0
+    hp_coverage = 0.0
+    total_capex = 0.0
+    ann_capex_general = 0.0
+    ann_capex_heating = 0.0
+
+    for _, row in measures_df.iterrows():
+        if not bool(row.get("Aktiv", False)):
+            continue
+        code = row["Code"]
+        qty = float(row["Menge"] or 0.0)
+        capex = qty * float(row["Capex/Einheit @Index100 [€]"] or 0.0) * inputs["index_factor"]
+        total_capex += capex
+        if code == CODE_HP:
+            ann_capex_heating += capex * inputs["umlage_pct_heating"]
+        else:
+            ann_capex_general += capex * inputs["umlage_pct_general"]
+
+        if code == CODE_LED:
+            share = (row["Stromanteil für LED [% vom Strom]"] or 0.0) / 100.0
+            red = (row["LED-Reduktion [% dieses Anteils]"] or 0.0) / 100.0
+            el_factor *= (1.0 - share * red)
+        elif code == CODE_WRG:
+            heat_factor *= (1.0 - (row["Einsparung Heizung [%]"] or 0.0) / 100.0)
+            extra_el_kwh += float(row["WRG-Zusatzstrom [kWh/Wohneinheit]"] or 0.0) * qty
+        elif code == CODE_PV:
+            spec = float(row["PV-spez. Ertrag [kWh/kWp]"] or inputs["pv_yield"])
+            sc = (row["PV-EV-Anteil [%]"] or 0.0) / 100.0
+            pv_prod = spec * qty
+            pv_self_kwh += pv_prod * sc
+            pv_feed_kwh += pv_prod * (1.0 - sc)
+        elif code == CODE_HP:
+            hp_active = True
+            hp_scop = float(row["HP SCOP"] or 3.0)
+            hp_coverage = (row["HP Abdeckung Wärme [%]"] or 0.0) / 100.0
+        else:
+            heat_factor *= (1.0 - (row["Einsparung Heizung [%]"] or 0.0) / 100.0)
+            el_factor *= (1.0 - (row["Einsparung Strom [%]"] or 0.0) / 100.0)
+
+    heat_after = inputs["e_heat_kwh"] * heat_factor
+    el_after = inputs["e_el_kwh"] * el_factor
+    hp_el_kwh = 0.0
+    if hp_active and hp_coverage > 0.0 and hp_scop > 0.1:
+        hp_el_kwh = heat_after * hp_coverage / hp_scop
+        heat_after = heat_after * (1.0 - hp_coverage)
+        el_after += hp_el_kwh
+    el_after = max(0.0, el_after - pv_self_kwh)
+    el_after += extra_el_kwh
+
+    pv_rows = measures_df.loc[measures_df["Code"] == CODE_PV, "PV-Einspeise [€/kWh]"]
+    pv_feed_in_rate = float(pv_rows.values[0]) if len(pv_rows) else 0.0
+    cost_el_after = el_after * inputs["p_el"] - pv_feed_kwh * pv_feed_in_rate
+    cost_heat_after = heat_after * inputs["p_heat"]
+    co2_el_after_t = el_after * inputs["ef_el"] / 1000.0
+    co2_heat_after_t = heat_after * inputs["ef_heat"] / 1000.0
+    co2_cost_after = 0.0
+    if inputs["apply_co2_el"]:
+        co2_cost_after += co2_el_after_t * inputs["co2_price"]
+    if inputs["apply_co2_heat"]:
+        co2_cost_after += co2_heat_after_t * inputs["co2_price"]
+
+    return {
+        "capex_total": total_capex,
+        "ann_capex_general": ann_capex_general,
+        "ann_capex_heating": ann_capex_heating,
+        "el_after": el_after,
+        "heat_after": heat_after,
+        "hp_el_kwh": hp_el_kwh,
+        "pv_self_kwh": pv_self_kwh,
+        "pv_feed_kwh": pv_feed_kwh,
+        "cost_el_after": cost_el_after,
+        "cost_heat_after": cost_heat_after,
+        "co2_el_after_t": co2_el_after_t,
+        "co2_heat_after_t": co2_heat_after_t,
+        "co2_cost_after": co2_cost_after,
+    }
+
+
+# ------------------------------
+# Synthetic inputs
+# ------------------------------
+# Building file as read by portfolio.py (random but reproducible)
+def synthetic_portfolio(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    area = rng.uniform(300.0, 12000.0, n)
+    codes = CATALOG["code"]
+    picks = rng.random((n, len(codes))) < 0.4
+    return pd.DataFrame({
+        "building_id": [f"B{i:06d}" for i in range(n)],
+        "area_m2": area.round(1),
+        "units": np.maximum(1, (area / rng.uniform(55.0, 90.0, n)).round()),
+        "window_ratio": rng.uniform(0.12, 0.35, n).round(3),
+        "e_el_kwh": (area * rng.uniform(20.0, 60.0, n)).round(),
+        "e_heat_kwh": (area * rng.uniform(60.0, 250.0, n)).round(),
+        "carrier": rng.choice(["Erdgas", "Heizöl", "Fernwärme"], n),
+        "apply_co2_el": rng.random(n) < 0.3,
+        "pv_kwp": rng.uniform(0.0, 250.0, n).round(1),
+        "pv_yield": rng.uniform(800.0, 1100.0, n).round(),
+        "pv_sc": rng.uniform(0.2, 0.9, n).round(3),
+        "avg_rent_eur_m2": rng.uniform(5.0, 14.0, n).round(2),
+        "measures": [";".join(codes[row]) for row in picks],
+    })
+
+
+def _building(inputs: dict, i: int) -> dict:
+    return {key: value[i].item() if isinstance(value, np.ndarray) else value for key, value in inputs.items()}
+
+
+# Measures table of one building as in tab 2 (defaults, quantities from the building)
+def _measures_df(b: dict, catalog=None) -> pd.DataFrame:
+    derived = derive_quantities(b["area_m2"], b["units"], b["common_area_m2"], b["window_ratio"],
+                                b["pv_kwp"], b["pv_yield"], b["e_heat_kwh"], b["flh"])
+    return build_measures_df(derived, b["pv_yield"], b["pv_sc"], b["pv_fit"], catalog)
+
+
+# Random user edits of the table: selection, savings, SCOP/coverage (incl. 0 = fallback / off);
+# some savings at the editor's maximum of 100 % (engine: heat_full / el_full instead of log(0))
+def _randomize(df: pd.DataFrame, rng) -> pd.DataFrame:
+    df = df.copy()
+    k = len(df)
+    df["Aktiv"] = rng.random(k) < rng.uniform(0.1, 0.9)
+    heat = np.where(rng.random(k) < 0.1, 100.0, rng.uniform(0.0, 40.0, k).round(1))
+    el = np.where(rng.random(k) < 0.1, 100.0, rng.uniform(0.0, 20.0, k).round(1))
+    df["Einsparung Heizung [%]"] = np.where(rng.random(k) < 0.3, heat, df["Einsparung Heizung [%]"])
+    df["Einsparung Strom [%]"] = np.where(rng.random(k) < 0.2, el, df["Einsparung Strom [%]"])
+    is_led = (df["Code"] == CODE_LED).to_numpy()
+    if rng.random() < 0.1:
+        df.loc[is_led, ["Stromanteil für LED [% vom Strom]", "LED-Reduktion [% dieses Anteils]"]] = 100.0
+    is_hp = (df["Code"] == CODE_HP).to_numpy()
+    df.loc[is_hp, "HP SCOP"] = rng.choice([0.0, 2.4, 3.2, 4.1])
+    df.loc[is_hp, "HP Abdeckung Wärme [%]"] = rng.choice([0.0, 60.0, 100.0])
+    return df
+
+
+# ------------------------------
+# Equivalence: engine (single and batch) vs. reference
+# ------------------------------
+def check_equivalence(n_cases: int = 500, seed: int = 1) -> dict:
+    rng = np.random.default_rng(seed)
+    inputs = building_inputs(synthetic_portfolio(n_cases, seed))
+    frames, reference, single = [], [], []
+    for i in range(n_cases):
+        b = _building(inputs, i)
+        df = _randomize(_measures_df(b), rng)
+        frames.append(measures_to_arrays(df))
+        reference.append(reference_simulate(b, df))
+        single.append(simulate(b, df))
+    batch = simulate_batch(inputs, stack_measures(frames))
+
+    report = {"cases": n_cases, "max_abs_diff": {}, "max_rel_diff": {}}
+    passed = True
+    for key in RESULT_KEYS:
+        ref = np.array([r[key] for r in reference])
+        for name, values in (("simulate", np.array([s[key] for s in single])), ("batch", batch[key])):
+            diff = np.abs(values - ref)
+            rel = diff / np.maximum(np.abs(ref), 1.0)
+            report["max_abs_diff"][f"{name}:{key}"] = float(diff.max())
+            report["max_rel_diff"][f"{name}:{key}"] = float(rel.max())
+            if key in EURO_KEYS + CO2_KEYS:
+                passed &= bool(np.all(diff <= ABS_TOLERANCE + REL_TOLERANCE * np.abs(ref)))
+    report["passed"] = passed
+    return report
+
+
+# Default catalog plus own measures on the non-default kernels (solar thermal, facade PV, heat network)
+EXTRA_MEASURES = [
+    {"code": "solar_thermal", "name": "Solarthermie (TWW)", "category": "Erzeugung", "unit": "m² Kollektorfläche",
+     "qty_from": "units", "capex_unit_2021": 900.0, "lifetime_y": 20, "kernel": "solar_thermal", "params": {"heat_yield": 400.0}},
+    {"code": "pv_facade", "name": "PV-Fassade", "category": "Erzeugung", "unit": "kWp", "qty_from": "pv_kwp",
+     "capex_unit_2021": 1800.0, "lifetime_y": 25, "kernel": "pv", "params": {"pv_yield": 650.0, "pv_sc": 0.7, "pv_fit": 0.08}},
+    {"code": "heat_network", "name": "Anschluss Wärmenetz", "category": "Heizungssystem", "unit": "kW_th (abgeleitet)",
+     "qty_from": "derived_heat_load", "capex_unit_2021": 600.0, "lifetime_y": 30, "kernel": "heat_network",
+     "params": {"net_price": 0.13, "net_ef": 0.12}},
+]
+
+
+def extended_catalog() -> dict:
+    return catalog_from_entries(catalog_entries(CATALOG) + EXTRA_MEASURES, "benchmark")
+
+
+# ------------------------------
+# Timings
+# ------------------------------
+def _time(fn, repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    runs = np.array(timer.repeat(repeat, number)) / number * 1000.0
+    return {"median_ms": float(np.median(runs)), "best_ms": float(runs.min()), "loops": number, "repeat": repeat}
+
+
+def run_benchmarks(repeat: int = 5, portfolio_size: int = 10_000, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    b = dict(DEFAULT_INPUTS, ef_heat=DEFAULT_EF["erdgas"], index_factor=1.35, common_area_m2=DEFAULT_INPUTS["area_m2"] * 0.1)
+    table = _measures_df(b)
+    one = table.assign(Aktiv=table["Code"] == CODE_HP)
+    full = table.assign(Aktiv=True)
+    random_tables = [table.assign(Aktiv=rng.random(len(table)) < 0.5) for _ in range(100)]
+    arrays = measures_to_arrays(table)
+    selections = rng.random((portfolio_size, len(table))) < 0.5
+    extended = measures_to_arrays(_measures_df(b, extended_catalog()))
+    extended_selections = rng.random((portfolio_size, len(extended["code"]))) < 0.5
+    chunk = synthetic_portfolio(portfolio_size, seed)
+    many = building_inputs(chunk)
+    kpi_args = ("e_el_kwh", "e_heat_kwh", "p_el", "p_heat", "ef_el", "ef_heat", "co2_price", "apply_co2_el", "apply_co2_heat")
+    umlage_args = ("rentable_area_m2", "avg_rent_eur_m2", "cap_modernisierung_eur", "cap_low_rent_eur", "cap_heating_special_eur")
+    capex = rng.uniform(0.0, 50_000.0, (2, portfolio_size))
+    n = f"{portfolio_size // 1000}k" if portfolio_size % 1000 == 0 else str(portfolio_size)
+    sweep_inputs = dict(b, rentable_area_m2=DEFAULT_INPUTS["area_m2"] * 0.9)
+    hp_package = dict(arrays, active=np.isin(arrays["code"], [CODE_HP, CODE_PV, "roof_ins"]))
+    price_axes = {"p_heat": np.linspace(0.06, 0.30, 200), "co2_price": np.linspace(0.0, 300.0, 200)}
+
+    cases = {
+        "build_measures_df": lambda: _measures_df(b),
+        "simulate_iterrows[1]": lambda: reference_simulate(b, one),
+        "simulate_iterrows[all]": lambda: reference_simulate(b, full),
+        "simulate_iterrows[random x100]": lambda: [reference_simulate(b, df) for df in random_tables],
+        "simulate_engine[1]": lambda: simulate(b, one),
+        "simulate_engine[all]": lambda: simulate(b, full),
+        "simulate_engine[random x100]": lambda: [simulate(b, df) for df in random_tables],
+        f"simulate_batch[random x{n}]": lambda: simulate_batch(b, arrays, selections),
+        f"simulate_batch[random x{n}, +3 eigene Maßnahmen]": lambda: simulate_batch(b, extended, extended_selections),
+        "umlage[1]": lambda: umlage(12_000.0, 4_000.0, b["area_m2"] * 0.9, b["avg_rent_eur_m2"], b["cap_modernisierung_eur"],
+                                    b["cap_low_rent_eur"], b["cap_heating_special_eur"]),
+        f"umlage[{n}]": lambda: umlage(capex[0], capex[1], *(many[key] for key in umlage_args)),
+        "baseline_kpis[1]": lambda: baseline_kpis(*(b[key] for key in kpi_args)),
+        f"baseline_kpis[{n}]": lambda: baseline_kpis(*(many[key] for key in kpi_args)),
+        f"portfolio[{n}]": lambda: evaluate_chunk(chunk),
+        "sweep[200x200, Amortisation + NPV]": lambda: sweep(sweep_inputs, hp_package, price_axes, metrics=("simple_payback_y", "npv_eur")),
+        "break_even[NPV=0 x200]": lambda: break_even(sweep_inputs, hp_package, "p_heat", 0.01, 1.0, axes={"co2_price": price_axes["co2_price"]}),
+    }
+    return {name: _time(fn, repeat) for name, fn in cases.items()}
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    # benchmarks present in both runs whose median got slower than threshold x baseline
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name)
+        if old is None:
+            continue
+        ratio = result["median_ms"] / max(old["median_ms"], 1e-12)
+        if ratio > threshold and result["median_ms"] - old["median_ms"] > MIN_REGRESSION_MS:
+            regressions.append({"name": name, "baseline_ms": old["median_ms"], "current_ms": result["median_ms"], "ratio": ratio})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks und Äquivalenzprüfung des Modellkerns.")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="JSON-Datei für die Ergebnisse")
+    parser.add_argument("--baseline", default=None, help="frühere Ergebnisdatei zum Vergleich")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Faktor, ab dem ein Benchmark als Regression gilt")
+    parser.add_argument("--repeat", type=int, default=5, help="Wiederholungen je Benchmark")
+    parser.add_argument("--portfolio-size", type=int, default=10_000, help="Gebäude im synthetischen Portfolio")
+    parser.add_argument("--cases", type=int, default=500, help="Zufallsfälle für die Äquivalenzprüfung")
+    args = parser.parse_args(argv)
+
+    result = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+        },
+        "equivalence": check_equivalence(args.cases),
+        "benchmarks": run_benchmarks(args.repeat, args.portfolio_size),
+    }
+    ok = result["equivalence"]["passed"]
+    print(f"Äquivalenz iterrows ↔ Engine ({args.cases} Fälle): {'OK' if ok else 'ABWEICHUNG'}")
+    if not ok:
+        for key, value in result["equivalence"]["max_abs_diff"].items():
+            print(f"  {key}: max. Abweichung {value:.3g}")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    for name, bench in result["benchmarks"].items():
+        line = f"{name:<34}{bench['median_ms']:>12.3f} ms"
+        old = (baseline or {}).get("benchmarks", {}).get(name)
+        if old:
+            line += f"   (Basis {old['median_ms']:.3f} ms, x{bench['median_ms'] / max(old['median_ms'], 1e-12):.2f})"
+        print(line)
+    if baseline is not None:
+        result["regressions"] = compare(result, baseline, args.threshold)
+        for r in result["regressions"]:
+            print(f"Regression: {r['name']} {r['baseline_ms']:.3f} → {r['current_ms']:.3f} ms (x{r['ratio']:.2f})")
+        ok &= not result["regressions"]
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"Ergebnisse → {args.out}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
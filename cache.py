@@ -0,0 +1,262 @@
+# cache.py
+# ------------------------------
+# Content-addressed result cache
+# Results are keyed by a canonical hash of the function name and all arguments
+# (dicts in sorted key order, arrays by dtype/shape/bytes, DataFrames by content), so a
+# Streamlit rerun after an unrelated widget change, a repeated optimizer call or a
+# building seen before by the portfolio runner is served from the cache instead of the engine.
+# - memory tier: LRU bounded in bytes, one per process (shared by all Streamlit sessions)
+# - disk tier (optional): pickle files in ENERGYAUDIT_CACHE_DIR, pruned oldest-first once
+#   the running total of written bytes exceeds the limit
+# Keys are salted with CODE_VERSION (hash of the modules and catalog next to this file and
+# the numpy/pandas versions), so disk entries of an older code state are never served.
+# Hit/miss counters are kept per tier (see stats()). Portfolio and service batches are
+# cached per building (portfolio._row_keys), not per chunk: a chunk is rarely seen twice,
+# a building often (repeated runs, a few changed rows, the same request again).
+# ------------------------------
+import functools
+import glob
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MEMORY_MB = 256
+DEFAULT_DISK_MB = 2048
+PRUNE_TO = 0.9  # pruning frees 10 % of the disk limit, so it does not run on every put
+
+
+# ------------------------------
+# Canonical hashing
+# ------------------------------
+def _feed(h, value):
+    if value is None or isinstance(value, (bool, np.bool_)):
+        h.update(repr(value).encode())
+    elif isinstance(value, (int, float, str, np.integer, np.floating)):
+        h.update(type(value).__name__.encode() + b":" + repr(value).encode())
+    elif isinstance(value, dict):
+        h.update(b"{")
+        for key in sorted(value, key=str):
+            _feed(h, str(key))
+            _feed(h, value[key])
+        h.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        h.update(b"[")
+        for item in value:
+            _feed(h, item)
+        h.update(b"]")
+    elif isinstance(value, np.ndarray):
+        h.update(f"nd{value.dtype.str}{value.shape}".encode())
+        if value.dtype == object:
+            _feed(h, value.tolist())
+        else:
+            h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, pd.DataFrame):
+        h.update(b"df")
+        _feed(h, [str(c) for c in value.columns])
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    else:
+        raise TypeError(f"nicht hashbar für den Cache: {type(value).__name__}")
+
+
+def _code_version() -> str:
+    h = hashlib.blake2b(digest_size=8)
+    h.update(f"{np.__version__} {pd.__version__} {os.environ.get('ENERGYAUDIT_CATALOG', '')}".encode())
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(folder, "*.py")) + glob.glob(os.path.join(folder, "*.json"))):
+        with open(path, "rb") as f:
+            h.update(os.path.basename(path).encode() + f.read())
+    return h.hexdigest()
+
+
+CODE_VERSION = _code_version()
+
+
+def canonical_key(*parts) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    _feed(h, parts)
+    return h.hexdigest()
+
+
+# Memory footprint of a cached value: arrays and DataFrames deep (object/string contents
+# included), other objects (Plotly figures, ...) by their pickled size
+def _nbytes(value) -> int:
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values()) + 64 * len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value) + 8 * len(value)
+    if value is None or isinstance(value, (bool, int, float, str, bytes, np.generic)):
+        return sys.getsizeof(value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+# Copy handed out by the cache: containers and arrays are copied, DataFrames shallow
+# (copy-on-write), so callers may change keys, columns or array values without touching it
+def _copy(value):
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, dict):
+        return {key: _copy(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)) and not hasattr(value, "_fields"):
+        return type(value)(_copy(v) for v in value)
+    return value
+
+
+# ------------------------------
+# Two-tier cache
+# ------------------------------
+class ResultCache:
+    def __init__(self, memory_mb: float = DEFAULT_MEMORY_MB, disk_dir=None, disk_mb: float = DEFAULT_DISK_MB):
+        self.max_bytes = int(memory_mb * 2 ** 20)
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = int(disk_mb * 2 ** 20)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # running total of the disk tier, counted on the first put
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "uncacheable": 0}
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return _copy(self._entries[key][0])
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                with self._lock:
+                    self.counters["disk_hits"] += 1
+                self._remember(key, value)
+                return _copy(value)
+        with self._lock:
+            self.counters["misses"] += 1
+        return default
+
+    def put(self, key: str, value):
+        self._remember(key, value)
+        if self.disk_dir:
+            if self._disk_bytes is None:
+                os.makedirs(self.disk_dir, exist_ok=True)
+                self._disk_bytes = sum(e.stat().st_size for e in os.scandir(self.disk_dir) if e.name.endswith(".pkl"))
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp = f"{self._disk_path(key)}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._disk_path(key))
+            self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_disk_bytes:
+                self.prune_disk()
+
+    def count_uncacheable(self):
+        with self._lock:
+            self.counters["uncacheable"] += 1
+
+    def _remember(self, key: str, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.counters["evictions"] += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def prune_disk(self):
+        # drop the least recently written files down to PRUNE_TO of the disk limit; the running
+        # total of put() only triggers this scan (other processes may write the same folder)
+        files = [e for e in os.scandir(self.disk_dir) if e.name.endswith(".pkl")]
+        files.sort(key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in files)
+        for entry in files:
+            if total <= PRUNE_TO * self.max_disk_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+        self._disk_bytes = total
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if disk and self.disk_dir and os.path.isdir(self.disk_dir):
+            for entry in os.scandir(self.disk_dir):
+                if entry.name.endswith(".pkl"):
+                    os.remove(entry.path)
+            self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "memory_mb": self._bytes / 2 ** 20,
+            "hit_rate": (self.counters["hits"] + self.counters["disk_hits"]) / lookups if lookups else 0.0,
+        }
+
+
+CACHE = ResultCache(
+    memory_mb=float(os.environ.get("ENERGYAUDIT_CACHE_MB", DEFAULT_MEMORY_MB)),
+    disk_dir=os.environ.get("ENERGYAUDIT_CACHE_DIR") or None,
+)
+
+
+# Enable/disable the disk tier; the environment variable carries it into worker processes
+def configure(disk_dir=None, memory_mb=None):
+    CACHE.disk_dir = disk_dir
+    CACHE._disk_bytes = None
+    if disk_dir:
+        os.environ["ENERGYAUDIT_CACHE_DIR"] = disk_dir
+    else:
+        os.environ.pop("ENERGYAUDIT_CACHE_DIR", None)
+    if memory_mb is not None:
+        CACHE.max_bytes = int(memory_mb * 2 ** 20)
+
+
+def cached_call(fn, *args, **kwargs):
+    try:
+        key = canonical_key(CODE_VERSION, fn.__module__, fn.__qualname__, args, kwargs)
+    except TypeError:
+        CACHE.count_uncacheable()
+        return fn(*args, **kwargs)
+    missing = object()
+    value = CACHE.get(key, missing)
+    if value is missing:
+        value = fn(*args, **kwargs)
+        CACHE.put(key, value)
+        value = _copy(value)
+    return value
+
+
+# Decorator: results of fn served from CACHE; fn.uncached is the plain function
+def memoize(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return cached_call(fn, *args, **kwargs)
+    wrapper.uncached = fn
+    return wrapper
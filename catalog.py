@@ -0,0 +1,105 @@
+# catalog.py
+# ------------------------------
+# Measure catalog file (JSON) -> typed, column-wise arrays
+# One entry per measure with its effect kernel (engine.register_kernel) and only the
+# parameters that kernel reads; everything else stays at the column default. The kernel of
+# each measure travels with the catalog arrays and the measures table (column "Typ"), so a
+# catalog never changes how other catalogs or sessions are simulated. Own measures (solar
+# thermal, facade PV, heat network, ...) only need a catalog entry, or an additional kernel
+# registered before loading.
+#
+#   {"version": 1, "measures": [
+#     {"code": "solar_thermal", "name": "Solarthermie (TWW)", "category": "Erzeugung",
+#      "unit": "m² Kollektorfläche", "qty_from": "area", "capex_unit_2021": 900.0,
+#      "lifetime_y": 20, "kernel": "solar_thermal", "params": {"heat_yield": 400.0}}]}
+#
+# Parameters are in engine units (fractions, not percent). Parameters without a value are
+# NaN in the arrays; build_measures_df fills the PV ones from the sidebar, the rest with 0.
+# ------------------------------
+import json
+import os
+
+import numpy as np
+
+from engine import KERNELS, MEASURE_COLUMNS, PARAM_COLUMNS
+
+CATALOG_VERSION = 1
+QTY_FROM = ("area", "units", "common_area", "window_ratio", "pv_kwp", "derived_heat_load")
+# field -> numpy dtype; all fields are required
+FIELDS = {
+    "code": str,
+    "name": str,
+    "category": str,
+    "unit": str,
+    "qty_from": str,
+    "capex_unit_2021": float,
+    "lifetime_y": int,
+    "kernel": str,
+}
+FIXED_KEYS = ("qty", "capex_unit", "lifetime_y")  # given by the fields above, not by params
+DEFAULT_PATH = os.environ.get("ENERGYAUDIT_CATALOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "measures.json"))
+
+
+def _check_entry(entry: dict, i: int, name: str):
+    missing = [field for field in FIELDS if field not in entry]
+    if missing:
+        raise ValueError(f"{name}: Maßnahme {i + 1} – Feld(er) {', '.join(missing)} fehlen.")
+    label = f"{name}: Maßnahme '{entry['code']}'"
+    if entry["kernel"] not in KERNELS:
+        raise ValueError(f"{label} – unbekannter Typ '{entry['kernel']}' (registriert: {', '.join(KERNELS)}).")
+    if entry["qty_from"] not in QTY_FROM:
+        raise ValueError(f"{label} – qty_from muss eines von {', '.join(QTY_FROM)} sein.")
+    allowed = set(KERNELS[entry["kernel"]]["reads"]) - set(FIXED_KEYS)
+    unknown = sorted(set(entry.get("params", {})) - allowed)
+    if unknown:
+        raise ValueError(f"{label} – Parameter {', '.join(unknown)} gehören nicht zum Typ '{entry['kernel']}' "
+                         f"(erlaubt: {', '.join(sorted(allowed)) or '–'}).")
+
+
+# Entries (list of dicts) -> catalog arrays: one (K,) array per field, params as (K,) float
+# arrays for every MEASURE_COLUMNS key and the kernel parameters used in the catalog
+def catalog_from_entries(entries, name: str = "Katalog") -> dict:
+    for i, entry in enumerate(entries):
+        _check_entry(entry, i, name)
+    codes = [entry["code"] for entry in entries]
+    duplicates = sorted({code for code in codes if codes.count(code) > 1})
+    if duplicates:
+        raise ValueError(f"{name}: Codes mehrfach vergeben: {', '.join(duplicates)}.")
+    catalog = {}
+    for field, kind in FIELDS.items():
+        try:
+            values = [kind(entry[field]) for entry in entries]
+        except (TypeError, ValueError):
+            raise ValueError(f"{name}: Feld '{field}' muss vom Typ {kind.__name__} sein.") from None
+        catalog[field] = np.array(values, dtype=kind)
+    used = {key for entry in entries for key in KERNELS[entry["kernel"]]["params"]}
+    keys = [key for key in MEASURE_COLUMNS.values() if key not in FIXED_KEYS] + [key for key in PARAM_COLUMNS.values() if key in used]
+    catalog["params"] = {key: np.array([float(entry.get("params", {}).get(key, np.nan)) for entry in entries]) for key in keys}
+    return catalog
+
+
+def load_catalog(path=DEFAULT_PATH) -> dict:
+    name = getattr(path, "name", str(path))  # paths or uploaded files
+    if hasattr(path, "read"):
+        data = json.loads(path.read())
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    if data.get("version", CATALOG_VERSION) != CATALOG_VERSION:
+        raise ValueError(f"{name}: Katalogversion {data.get('version')} wird nicht unterstützt (erwartet {CATALOG_VERSION}).")
+    return catalog_from_entries(data.get("measures", []), name)
+
+
+# Catalog arrays -> entries as in the file (inverse of catalog_from_entries)
+def catalog_entries(catalog: dict) -> list:
+    entries = []
+    for i in range(len(catalog["code"])):
+        entry = {field: catalog[field][i].item() for field in FIELDS}
+        entry["params"] = {key: float(values[i]) for key, values in catalog["params"].items() if not np.isnan(values[i])}
+        entries.append(entry)
+    return entries
+
+
+def save_catalog(catalog: dict, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": CATALOG_VERSION, "measures": catalog_entries(catalog)}, f, ensure_ascii=False, indent=1)
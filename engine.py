@@ -0,0 +1,411 @@
+# engine.py
+# ------------------------------
+# Headless, vectorized simulation engine
+# Evaluates N cases (buildings, samples, sweep points, ...) x M measure selections in
+# one call. Same model as the Streamlit app: multiplicative heat/electricity factors,
+# heat pump fuel switch after envelope/optimization effects, PV self-consumption
+# netting and CO2 pricing. Only numpy (pandas for the DataFrame bridge).
+# Measure behaviour comes from effect kernels (register_kernel): each kernel turns the
+# parameter columns of its rows into additive terms (log-factors, kWh, €) that are summed
+# over the active set as matrix products; "switch" kernels (heat pump, heat network)
+# replace the remaining heat after those terms. The kernel of a row is measures["kernel"]
+# (column "Typ" of the measures table); tables without it use CODE_KERNELS of the built-in
+# catalog. The mapping is never changed at runtime, so catalogs of different sessions and
+# cached results cannot interfere.
+# ------------------------------
+import numpy as np
+
+# Building-level inputs (scalar or shape (N,)), named like the sidebar variables
+BUILDING_KEYS = (
+    "e_el_kwh", "e_heat_kwh",
+    "p_el", "p_heat",
+    "ef_el", "ef_heat",
+    "co2_price", "apply_co2_el", "apply_co2_heat",
+    "index_factor",
+    "umlage_pct_general", "umlage_pct_heating",
+    "pv_yield",
+)
+
+# Measures table column -> engine key; percent columns are converted to fractions
+MEASURE_COLUMNS = {
+    "Menge": "qty",
+    "Capex/Einheit @Index100 [€]": "capex_unit",
+    "Lebensdauer [a]": "lifetime_y",
+    "Einsparung Heizung [%]": "heat_pct",
+    "Einsparung Strom [%]": "el_pct",
+    "Stromanteil für LED [% vom Strom]": "led_share",
+    "LED-Reduktion [% dieses Anteils]": "led_red",
+    "WRG-Zusatzstrom [kWh/Wohneinheit]": "wrg_kwh_per_unit",
+    "HP SCOP": "hp_scop",
+    "HP Abdeckung Wärme [%]": "hp_coverage",
+    "PV-spez. Ertrag [kWh/kWp]": "pv_yield",
+    "PV-EV-Anteil [%]": "pv_sc",
+    "PV-Einspeise [€/kWh]": "pv_fit",
+}
+PERCENT_KEYS = ("heat_pct", "el_pct", "led_share", "led_red", "hp_coverage", "pv_sc")
+
+# Codes of the built-in catalog; rows without a kernel fall back to CODE_KERNELS, then "percent"
+# (read-only: uploaded catalogs carry their kernels in the measures table, KERNEL_COLUMN)
+CODE_LED = "led_lighting"
+CODE_WRG = "vent_wrg"
+CODE_PV = "pv_system"
+CODE_HP = "heat_pump_aw"
+HP_DEFAULT_SCOP = 3.0
+DEFAULT_KERNEL = "percent"
+CODE_KERNELS = {CODE_LED: "el_share", CODE_WRG: "ventilation", CODE_PV: "pv", CODE_HP: "heat_pump"}
+KERNEL_COLUMN = "Typ"
+
+# Effect kernels: name -> {"fn", "reads", "params", "rows", "umlage_heating", "switch"}
+KERNELS = {}
+# Parameters of registered kernels beyond MEASURE_COLUMNS: table column -> engine key, engine key -> default
+PARAM_COLUMNS = {}
+PARAM_DEFAULTS = {}
+# Terms summed over the active measures; the other kernel outputs are per-row values of switch kernels
+SUM_TERMS = ("heat_red", "el_red", "extra_el_kwh", "heat_offset_kwh", "pv_self_kwh", "pv_feed_kwh", "pv_feed_eur")
+
+RESULT_KEYS = (
+    "capex_total", "ann_capex_general", "ann_capex_heating",
+    "el_after", "heat_after", "hp_el_kwh", "pv_self_kwh", "pv_feed_kwh",
+    "cost_el_after", "cost_heat_after",
+    "co2_el_after_t", "co2_heat_after_t", "co2_cost_after",
+)
+
+
+# ------------------------------
+# Effect kernels
+# ------------------------------
+# fn(b, m) -> terms for the kernel's rows; b: building inputs (n,), m: the `reads` and `params`
+# columns of those rows, (n, k_rows). Outputs named in SUM_TERMS are summed over the active set,
+# `rows` are per-row values handed to `switch(state, on, row)` for the last active row.
+def register_kernel(name: str, reads=(), params=None, rows=(), umlage_heating: bool = False, switch=None):
+    params = params or {}
+
+    def decorate(fn):
+        KERNELS[name] = {"fn": fn, "reads": tuple(reads) + tuple(params), "params": params, "rows": tuple(rows),
+                         "umlage_heating": umlage_heating, "switch": switch}
+        for key, (column, default) in params.items():
+            PARAM_COLUMNS[column] = key
+            PARAM_DEFAULTS[key] = default
+        return fn
+    return decorate
+
+
+def kernels_of(measures: dict) -> np.ndarray:
+    if "kernel" in measures:
+        return np.asarray(measures["kernel"])
+    return np.array([CODE_KERNELS.get(code, DEFAULT_KERNEL) for code in np.asarray(measures["code"]).tolist()])
+
+
+# Rows of measures handled by kernel `name` (e.g. "pv", "heat_pump"), shape (K,)
+def kernel_mask(measures: dict, name: str) -> np.ndarray:
+    return kernels_of(measures) == name
+
+
+@register_kernel("percent", reads=("heat_pct", "el_pct"))
+def _percent(b, m):
+    return {"heat_red": m["heat_pct"], "el_red": m["el_pct"]}
+
+
+@register_kernel("el_share", reads=("led_share", "led_red"))
+def _el_share(b, m):
+    return {"el_red": m["led_share"] * m["led_red"]}
+
+
+@register_kernel("ventilation", reads=("qty", "heat_pct", "wrg_kwh_per_unit"))
+def _ventilation(b, m):
+    return {"heat_red": m["heat_pct"], "extra_el_kwh": m["wrg_kwh_per_unit"] * m["qty"]}
+
+
+# PV (roof or facade): specific yield of the row, 0 = the building's pv_yield; pv_loss is the
+# share of the generation lost in a battery (set by hourly.with_hourly_pv), neither used nor fed in
+@register_kernel("pv", reads=("qty", "pv_yield", "pv_sc", "pv_fit"), params={"pv_loss": ("PV-Speicherverlust [Anteil]", 0.0)})
+def _pv(b, m):
+    spec = np.where(m["pv_yield"] != 0.0, m["pv_yield"], b["pv_yield"][:, None])
+    prod = spec * m["qty"]
+    feed = prod * np.maximum(1.0 - m["pv_sc"] - m["pv_loss"], 0.0)
+    return {"pv_self_kwh": prod * m["pv_sc"], "pv_feed_kwh": feed, "pv_feed_eur": feed * m["pv_fit"]}
+
+
+# Solar thermal: heat yield per unit (m² collector), subtracted after the reduction factors
+@register_kernel("solar_thermal", reads=("qty",), params={"heat_yield": ("Wärmeertrag [kWh/Einheit]", 0.0)})
+def _solar_thermal(b, m):
+    return {"heat_offset_kwh": m["heat_yield"] * m["qty"]}
+
+
+def _heat_pump_switch(state, on, row):
+    on = on & (row["hp_coverage"] > 0.0) & (row["hp_scop"] > 0.1)
+    state["hp_el"] = state["hp_el"] + np.where(on, state["heat"] * row["hp_coverage"] / np.where(on, row["hp_scop"], 1.0), 0.0)
+    state["heat"] = np.where(on, state["heat"] * (1.0 - row["hp_coverage"]), state["heat"])
+
+
+@register_kernel("heat_pump", reads=("hp_scop", "hp_coverage"), rows=("hp_scop", "hp_coverage"), umlage_heating=True,
+                 switch=_heat_pump_switch)
+def _heat_pump(b, m):
+    return {"hp_scop": np.where(m["hp_scop"] != 0.0, m["hp_scop"], HP_DEFAULT_SCOP), "hp_coverage": m["hp_coverage"]}
+
+
+# Heat network connection: supplies the heat left after the heat pump at the network's price
+# and emission factor. net_price is without CO2: the network's emissions count in
+# co2_heat_after_t and are priced with the building's CO2 price like fuel (apply_co2_heat),
+# in co2_cost_after as in the lifecycle cash flows
+def _heat_network_switch(state, on, row):
+    net = np.where(on, state["heat"], 0.0)
+    state["net_heat"] = state["net_heat"] + net
+    state["net_cost"] = state["net_cost"] + net * row["net_price"]
+    state["net_co2_t"] = state["net_co2_t"] + net * row["net_ef"] / 1000.0
+    state["heat"] = state["heat"] - net
+
+
+@register_kernel("heat_network", params={"net_price": ("Netz-Wärmepreis [€/kWh]", 0.0), "net_ef": ("Netz-EF [kg/kWh]", 0.0)},
+                 rows=("net_price", "net_ef"), umlage_heating=True, switch=_heat_network_switch)
+def _heat_network(b, m):
+    return {"net_price": m["net_price"], "net_ef": m["net_ef"]}
+
+
+# ------------------------------
+# Measures tables and arrays
+# ------------------------------
+# DataFrame bridge: measures table (as edited in tab 2) -> dict of arrays, shape (K,)
+def measures_to_arrays(measures_df: "pd.DataFrame") -> dict:
+    import pandas as pd  # only the DataFrame bridge needs pandas; keeps `import engine` fast
+    # One object-array conversion of the whole table instead of one pandas Series operation
+    # per column (~25 us each), which dominated a single-building rerun; pd.to_numeric only
+    # for columns that do not convert directly (text cells such as "12,5")
+    position = {name: i for i, name in enumerate(measures_df.columns.to_numpy().tolist())}
+    table = measures_df.to_numpy(dtype=object)
+    active = table[:, position["Aktiv"]]
+    arrays = {
+        "code": np.array([str(code) for code in table[:, position["Code"]]], dtype=object),
+        "active": np.where(pd.isna(active), False, active).astype(bool),
+    }
+    if "Kategorie" in position:
+        arrays["category"] = np.array([str(c) for c in table[:, position["Kategorie"]]], dtype=object)
+    fallback = kernels_of(arrays)
+    if KERNEL_COLUMN in position:
+        kernel = table[:, position[KERNEL_COLUMN]]
+        kernel = np.where(pd.isna(kernel), "", kernel).astype(str)
+        arrays["kernel"] = np.where(kernel != "", kernel, fallback).astype(str)
+    else:
+        arrays["kernel"] = fallback
+    columns = {col: key for col, key in {**MEASURE_COLUMNS, **PARAM_COLUMNS}.items() if col in MEASURE_COLUMNS or col in position}
+    for col, key in columns.items():
+        raw = table[:, position[col]]
+        try:
+            values = raw.astype(float)
+        except (TypeError, ValueError):
+            values = pd.to_numeric(pd.Series(raw), errors="coerce").to_numpy(dtype=float, na_value=np.nan, copy=True)
+        values[np.isnan(values)] = 0.0
+        arrays[key] = values / 100.0 if key in PERCENT_KEYS else values
+    return arrays
+
+
+# Numeric measure keys of a measures dict: MEASURE_COLUMNS plus the kernel parameters it carries
+def measure_keys(measures: dict) -> tuple:
+    return tuple(MEASURE_COLUMNS.values()) + tuple(key for key in PARAM_COLUMNS.values() if key in measures)
+
+
+# Stack per-building measure arrays (same catalog order) into shape (N, K)
+def stack_measures(measures_list) -> dict:
+    first = measures_list[0]
+    stacked = {"code": first["code"], "kernel": kernels_of(first), "active": np.stack([m["active"] for m in measures_list])}
+    if "category" in first:
+        stacked["category"] = first["category"]
+    for key in measure_keys(first):
+        stacked[key] = np.stack([np.broadcast_to(m[key], first["code"].shape) for m in measures_list])
+    return stacked
+
+
+# Inputs that already have the case shape (always for a single building) are only reshaped:
+# np.broadcast_to costs ~10 us per call, ~25 calls per simulate_batch
+def _as_cases(value, case_shape: tuple, n: int) -> np.ndarray:
+    value = np.asarray(value, dtype=float)
+    if value.shape != case_shape:
+        value = np.broadcast_to(value, case_shape)
+    return value.reshape(n)
+
+
+def _as_case_measures(value, case_shape: tuple, n: int, k: int) -> np.ndarray:
+    value = np.asarray(value, dtype=float)
+    if value.shape != case_shape + (k,):
+        value = np.broadcast_to(value, case_shape + (k,))
+    return value.reshape(n, k)
+
+
+# Sums over active measures, all terms in one product: A (M, K) or (N, M, K),
+# terms {key: (N, K)} -> {key: (N, M)}
+def _active_sums(A: np.ndarray, terms: dict, keys) -> dict:
+    V = np.stack([terms[key] for key in keys])  # (T, N, K)
+    if A.ndim == 2:
+        S = (V.reshape(-1, V.shape[-1]) @ A.T).reshape(V.shape[:2] + A.shape[:1])
+    else:
+        S = np.einsum("nmk,tnk->tnm", A, V)
+    return dict(zip(keys, S))
+
+
+# Per-measure terms, inputs flattened to (n,) / (n, K); all effects that combine linearly
+# over the active set (sums, or log-factors for the multiplicative reductions). Each kernel
+# only sees the columns of its own rows.
+def _terms(b: dict, m: dict, kernel: np.ndarray) -> dict:
+    n, k = m["qty"].shape
+    t = {key: np.zeros((n, k)) for key in SUM_TERMS}
+    heating = np.zeros(k, dtype=bool)
+    rows = {}
+    for i, name in enumerate(kernel.tolist()):
+        rows.setdefault(name, []).append(i)
+    for name in sorted(rows):
+        if name not in KERNELS:
+            raise ValueError(f"Unbekannter Maßnahmentyp '{name}' (registrierte Typen: {', '.join(KERNELS)}).")
+        spec = KERNELS[name]
+        cols = np.array(rows[name])
+        sub = {key: m[key][:, cols] if key in m else np.full((n, len(cols)), PARAM_DEFAULTS[key]) for key in spec["reads"]}
+        for key, value in spec["fn"](b, sub).items():
+            if key not in t:
+                t[key] = np.zeros((n, k))
+            t[key][:, cols] = value
+        heating[cols] = spec["umlage_heating"]
+
+    # CAPEX & Umlage base (heating systems -> §559e, everything else -> §559)
+    capex = m["qty"] * m["capex_unit"] * b["index_factor"][:, None]
+
+    # Multiplicative reductions; reductions >= 100 % zero the factor
+    heat_full = t["heat_red"] >= 1.0
+    el_full = t["el_red"] >= 1.0
+    t.update({
+        "capex": capex,
+        "ann_capex_general": np.where(heating, 0.0, capex * b["umlage_pct_general"][:, None]),
+        "ann_capex_heating": np.where(heating, capex * b["umlage_pct_heating"][:, None], 0.0),
+        "log_heat_keep": np.log1p(-np.where(heat_full, 0.0, t.pop("heat_red"))),
+        "heat_full": heat_full.astype(float),
+        "log_el_keep": np.log1p(-np.where(el_full, 0.0, t.pop("el_red"))),
+        "el_full": el_full.astype(float),
+    })
+    return t
+
+
+def _case_shape(building: dict, measures: dict) -> tuple:
+    shapes = {np.shape(building[key]) for key in BUILDING_KEYS}
+    shapes.update(np.shape(measures[key])[:-1] for key in measure_keys(measures))
+    shapes.discard(())
+    return np.broadcast_shapes(*shapes) if shapes else ()
+
+
+def _flatten_inputs(building: dict, measures: dict, case_shape: tuple):
+    n = int(np.prod(case_shape)) if case_shape else 1
+    k = np.asarray(measures["code"]).shape[-1]
+    b = {key: _as_cases(building[key], case_shape, n) for key in BUILDING_KEYS}
+    m = {key: _as_case_measures(measures[key], case_shape, n, k) for key in measure_keys(measures)}
+    return b, m
+
+
+# Per-measure terms of a building (or case array), shape case_shape + (K,): the
+# quantities simulate_batch sums over the active measures (capex, log-factors, PV, ...)
+def measure_terms(building: dict, measures: dict) -> dict:
+    case_shape = _case_shape(building, measures)
+    b, m = _flatten_inputs(building, measures, case_shape)
+    terms = _terms(b, m, kernels_of(measures))
+    k = len(measures["code"])
+    return {key: value.reshape(tuple(case_shape) + (k,)) for key, value in terms.items()}
+
+
+def simulate_batch(building: dict, measures: dict, active=None) -> dict:
+    # building: BUILDING_KEYS, each scalar or array (broadcastable case shape, e.g. (N,))
+    # measures: dict from measures_to_arrays/stack_measures, numeric entries (K,) or case_shape + (K,)
+    # active:   bool selection (K,), (M, K) or (N, M, K); defaults to measures["active"]
+    #           ((K,), or per case (N, K) from stack_measures)
+    # returns:  RESULT_KEYS, each of shape case_shape + selection_shape
+    #           (case_shape = () for scalar buildings, selection_shape = () for a (K,) mask)
+    code = np.asarray(measures["code"])
+    k = code.shape[-1]
+    per_case = False
+    if active is None:
+        active = np.asarray(measures["active"], dtype=bool)
+        if active.ndim == 2:
+            per_case, active = True, active[:, None, :]
+    active = np.asarray(active, dtype=bool)
+
+    case_shape = _case_shape(building, measures)
+    if active.ndim == 3:
+        case_shape = np.broadcast_shapes(case_shape, active.shape[:1])
+    n = int(np.prod(case_shape)) if case_shape else 1
+    if active.ndim == 1:
+        sel_shape, A = (), active[None, :]
+    elif active.ndim == 2:
+        sel_shape, A = active.shape[:1], active
+    else:
+        sel_shape, A = active.shape[1:2], np.broadcast_to(active, (n,) + active.shape[1:])
+    if per_case:
+        sel_shape = ()
+    Af = A.astype(float)
+
+    b, m = _flatten_inputs(building, measures, case_shape)
+    kernel = kernels_of(measures)
+    t = _terms(b, m, kernel)
+
+    sums = _active_sums(Af, t, ("capex", "ann_capex_general", "ann_capex_heating", "heat_full", "log_heat_keep", "el_full",
+                                "log_el_keep", "extra_el_kwh", "heat_offset_kwh", "pv_self_kwh", "pv_feed_kwh", "pv_feed_eur"))
+    capex_total = sums["capex"]
+    ann_capex_general = sums["ann_capex_general"]
+    ann_capex_heating = sums["ann_capex_heating"]
+
+    # Multiplicative reductions, evaluated in log space so that they stay matrix products
+    heat_factor = np.where(sums["heat_full"] > 0.0, 0.0, np.exp(sums["log_heat_keep"]))
+    el_factor = np.where(sums["el_full"] > 0.0, 0.0, np.exp(sums["log_el_keep"]))
+
+    extra_el_kwh = sums["extra_el_kwh"]
+    pv_self_kwh = sums["pv_self_kwh"]
+    pv_feed_kwh = sums["pv_feed_kwh"]
+    pv_feed_eur = sums["pv_feed_eur"]
+
+    heat_after = b["e_heat_kwh"][:, None] * heat_factor
+    el_after = b["e_el_kwh"][:, None] * el_factor
+    if t["heat_offset_kwh"].any():
+        heat_after = np.maximum(0.0, heat_after - sums["heat_offset_kwh"])
+
+    # Switch kernels on the remaining heat, in registration order (heat pump, then heat network);
+    # per kernel the last active row wins
+    state = {"heat": heat_after, "hp_el": 0.0, "net_heat": 0.0, "net_cost": 0.0, "net_co2_t": 0.0}
+    for name, spec in KERNELS.items():
+        is_kernel = kernel == name
+        if spec["switch"] is None or not is_kernel.any():
+            continue
+        pos = np.where(A & is_kernel, np.arange(k), -1).max(axis=-1)
+        idx = np.maximum(pos, 0)
+        if idx.ndim == 1:
+            row = {key: t[key][:, idx] for key in spec["rows"]}
+        else:
+            row = {key: np.take_along_axis(t[key], idx, axis=1) for key in spec["rows"]}
+        spec["switch"](state, pos >= 0, row)
+    heat_fuel = state["heat"]
+    hp_el_kwh = np.broadcast_to(state["hp_el"], heat_fuel.shape)
+    heat_after = heat_fuel + state["net_heat"]
+    el_after = el_after + hp_el_kwh
+
+    # PV self-consumption reduces purchased electricity, WRG adds to it
+    el_after = np.maximum(0.0, el_after - pv_self_kwh) + extra_el_kwh
+
+    cost_el_after = el_after * b["p_el"][:, None] - pv_feed_eur
+    cost_heat_after = heat_fuel * b["p_heat"][:, None] + state["net_cost"]
+    co2_el_after_t = el_after * b["ef_el"][:, None] / 1000.0
+    co2_heat_after_t = heat_fuel * b["ef_heat"][:, None] / 1000.0 + state["net_co2_t"]
+    co2_cost_after = (
+        np.where(b["apply_co2_el"][:, None] != 0.0, co2_el_after_t * b["co2_price"][:, None], 0.0)
+        + np.where(b["apply_co2_heat"][:, None] != 0.0, co2_heat_after_t * b["co2_price"][:, None], 0.0)
+    )
+
+    totals = {
+        "capex_total": capex_total,
+        "ann_capex_general": ann_capex_general,
+        "ann_capex_heating": ann_capex_heating,
+        "el_after": el_after,
+        "heat_after": heat_after,
+        "hp_el_kwh": hp_el_kwh,
+        "pv_self_kwh": pv_self_kwh,
+        "pv_feed_kwh": pv_feed_kwh,
+        "cost_el_after": cost_el_after,
+        "cost_heat_after": cost_heat_after,
+        "co2_el_after_t": co2_el_after_t,
+        "co2_heat_after_t": co2_heat_after_t,
+        "co2_cost_after": co2_cost_after,
+    }
+    out_shape = tuple(case_shape) + tuple(sel_shape)
+    return {key: np.reshape(value, out_shape) for key, value in totals.items()}
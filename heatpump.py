@@ -0,0 +1,165 @@
+# heatpump.py
+# ------------------------------
+# Temperature-dependent hourly air/water heat pump
+# Replaces the constant `HP SCOP`, the fixed `HP Abdeckung Wärme [%]` and the
+# full-load-hour sizing (e_heat_kwh / flh) by an hourly model driven by an outdoor
+# temperature series (DWD test reference year or synthetic):
+# - e_heat_kwh is distributed over the hours by degree-hours below the heating limit,
+#   plus a constant domestic hot water share
+# - COP per hour from a Carnot fraction between outdoor air and the supply temperature
+#   (heating curve for space heating, fixed temperature for hot water)
+# - the heat pump is sized from the design hour; with a sizing share < 1 (bivalent
+#   parallel) the load above its capacity goes to the old carrier
+# Cases (buildings, parameter sweeps) are arrays; hours are processed in blocks as in
+# hourly.py, so no case x 8760 arrays are kept.
+# ------------------------------
+import numpy as np
+
+from cache import memoize
+from engine import kernel_mask, measure_terms
+from hourly import BLOCK_HOURS, HOURS, read_series
+
+COP_MIN, COP_MAX = 1.0, 7.0
+DEFAULT_HP = {
+    "heating_limit_c": 15.0,      # Heizgrenztemperatur
+    "design_outdoor_c": -12.0,    # Normaußentemperatur (Heizkurve)
+    "supply_design_c": 55.0,      # Vorlauf bei Normaußentemperatur
+    "supply_min_c": 30.0,         # Vorlauf an der Heizgrenze
+    "dhw_share": 0.15,            # Trinkwarmwasser-Anteil an e_heat_kwh
+    "dhw_supply_c": 55.0,
+    "carnot_efficiency": 0.45,    # Gütegrad
+    "sizing_share": 1.0,          # Wärmepumpenleistung / Auslegungslast (< 1: bivalent parallel)
+}
+
+
+# ------------------------------
+# Temperature series
+# ------------------------------
+# Synthetic outdoor temperature [°C]: seasonal and daily cycle plus reproducible
+# day-to-day weather anomalies (cold spells down to about -12 °C)
+def synthetic_temperature(seed: int = 0) -> np.ndarray:
+    day = np.arange(HOURS) // 24
+    hour = np.arange(HOURS) % 24
+    rng = np.random.default_rng(seed)
+    anomaly = np.zeros(365)
+    shocks = rng.normal(0.0, 2.2, 365)
+    for d in range(1, 365):
+        anomaly[d] = 0.8 * anomaly[d - 1] + shocks[d]
+    seasonal = 9.5 - 9.5 * np.cos(2.0 * np.pi * (day - 15) / 365.0)
+    daily = -3.5 * np.cos(2.0 * np.pi * (hour - 3) / 24.0)
+    return seasonal + daily + anomaly[day]
+
+
+# Outdoor temperature from a DWD test reference year (*.dat, column `t` after the `***`
+# line) or from an hourly/quarter-hourly CSV/Parquet file
+def read_temperature(path, column=None) -> np.ndarray:
+    name = getattr(path, "name", str(path))
+    if name.endswith(".dat"):
+        if hasattr(path, "read"):
+            text = path.read().decode("latin-1")
+        else:
+            with open(path, encoding="latin-1") as f:
+                text = f.read()
+        lines = text.splitlines()
+        start = next(i for i, line in enumerate(lines) if line.startswith("***")) + 1
+        values = np.array([float(line.split()[5]) for line in lines[start:] if line.strip()])
+        if len(values) != HOURS:
+            raise ValueError(f"{name}: {len(values)} Stundenwerte, erwartet {HOURS}.")
+        return values
+    return read_series(path, column, quarter_hours="mean")
+
+
+# ------------------------------
+# Hourly model
+# ------------------------------
+def supply_temperature(temperature, supply_design_c, supply_min_c, heating_limit_c, design_outdoor_c):
+    # linear heating curve between (design outdoor, design supply) and (heating limit, min supply)
+    frac = (heating_limit_c - temperature) / (heating_limit_c - design_outdoor_c)
+    return supply_min_c + (supply_design_c - supply_min_c) * np.clip(frac, 0.0, 1.0)
+
+
+def cop(temperature, supply_c, carnot_efficiency):
+    lift = np.maximum(supply_c - temperature, 5.0)
+    return np.clip(carnot_efficiency * (supply_c + 273.15) / lift, COP_MIN, COP_MAX)
+
+
+@memoize
+def simulate_heat_pump(e_heat_kwh, temperature=None, hp_kw=None, **params) -> dict:
+    # e_heat_kwh, hp_kw (None -> sizing_share x design load) and the DEFAULT_HP parameters
+    # broadcast to the case shape C; temperature (8760,) or C + (8760,)
+    p = {key: np.asarray(value, dtype=float) for key, value in {**DEFAULT_HP, **params}.items()}
+    temp = np.asarray(synthetic_temperature() if temperature is None else temperature, dtype=float)
+    e_heat = np.asarray(e_heat_kwh, dtype=float)
+    dhw = p["dhw_share"]
+
+    # space heating shape from degree-hours (shape of the temperature series only)
+    degree_hours = np.maximum(p["heating_limit_c"][..., None] - temp, 0.0)
+    total = degree_hours.sum(axis=-1, keepdims=True)
+    space_shape = degree_hours / np.where(total > 0.0, total, 1.0)
+    design_kw = e_heat * ((1.0 - dhw) * space_shape.max(axis=-1) + dhw / HOURS)
+    capacity = p["sizing_share"] * design_kw if hp_kw is None else np.asarray(hp_kw, dtype=float)
+
+    shape = np.broadcast_shapes(e_heat.shape, capacity.shape, space_shape.shape[:-1],
+                                *(value.shape for value in p.values()))
+    hp_heat = np.zeros(shape)
+    hp_el = np.zeros(shape)
+    peak_el = np.zeros(shape)
+    bivalence = np.full(shape, -np.inf)
+    col = {key: value[..., None] for key, value in p.items()}
+    for start in range(0, HOURS, BLOCK_HOURS):
+        block = slice(start, start + BLOCK_HOURS)
+        t = temp[..., block]
+        space = (e_heat * (1.0 - dhw))[..., None] * space_shape[..., block]
+        water = (e_heat * dhw / HOURS)[..., None]
+        cap = capacity[..., None]
+        hp_space = np.minimum(space, cap)
+        hp_water = np.minimum(water, cap - hp_space)
+        supply = supply_temperature(t, col["supply_design_c"], col["supply_min_c"], col["heating_limit_c"], col["design_outdoor_c"])
+        el = hp_space / cop(t, supply, col["carnot_efficiency"]) + hp_water / cop(t, col["dhw_supply_c"], col["carnot_efficiency"])
+        hp_heat += (hp_space + hp_water).sum(axis=-1)
+        hp_el += el.sum(axis=-1)
+        peak_el = np.maximum(peak_el, el.max(axis=-1))
+        uncovered = space + water > cap * (1.0 + 1e-9)
+        bivalence = np.maximum(bivalence, np.where(uncovered, t, -np.inf).max(axis=-1))
+
+    return {
+        "hp_heat_kwh": hp_heat,
+        "backup_heat_kwh": np.maximum(e_heat - hp_heat, 0.0),
+        "hp_el_kwh": hp_el,
+        "scop": np.where(hp_el > 0.0, hp_heat / np.where(hp_el > 0.0, hp_el, 1.0), 0.0),
+        "coverage": np.where(e_heat > 0.0, hp_heat / np.where(e_heat > 0.0, e_heat, 1.0), 0.0),
+        "design_load_kw": np.broadcast_to(design_kw, shape),
+        "hp_kw": np.broadcast_to(capacity, shape),
+        "peak_el_kw": peak_el,
+        "bivalence_c": np.where(np.isfinite(bivalence), bivalence, np.nan),  # highest outdoor temp with backup
+    }
+
+
+# ------------------------------
+# Engine bridge
+# ------------------------------
+# Hourly heat pump for the load left by the other measures of `active` (default:
+# measures["active"]), i.e. sized after the envelope measures of the package
+def package_heat_pump(inputs: dict, measures: dict, active=None, temperature=None, hp_kw=None, **params) -> dict:
+    is_hp = kernel_mask(measures, "heat_pump")
+    active = np.asarray(measures["active"] if active is None else active, dtype=bool)
+    terms = measure_terms(inputs, measures)
+    other = active & ~is_hp
+    keep = np.exp((terms["log_heat_keep"] * other).sum(axis=-1)) * ((terms["heat_full"] * other).sum(axis=-1) == 0)
+    heat = np.maximum(0.0, np.asarray(inputs["e_heat_kwh"], dtype=float) * keep - (terms["heat_offset_kwh"] * other).sum(axis=-1))
+    return simulate_heat_pump(heat, temperature, hp_kw, **params)
+
+
+# Measures with the heat pump rows' SCOP, coverage and size (qty, kW_th) from the hourly model
+def with_hourly_hp(inputs: dict, measures: dict, active=None, temperature=None, hp_kw=None, **params) -> dict:
+    code = np.asarray(measures["code"])
+    is_hp = kernel_mask(measures, "heat_pump")
+    if not is_hp.any():
+        return measures
+    hp = package_heat_pump(inputs, measures, active, temperature, hp_kw, **params)
+    out = dict(measures)
+    for key, value in (("hp_scop", hp["scop"]), ("hp_coverage", hp["coverage"]), ("qty", hp["hp_kw"])):
+        column = np.array(np.broadcast_to(measures[key], np.broadcast_shapes(np.shape(measures[key]), value.shape + (len(code),))), dtype=float)
+        column[..., is_hp] = value[..., None]
+        out[key] = column
+    return out
@@ -0,0 +1,192 @@
+# hourly.py
+# ------------------------------
+# Hourly (8760 h) PV self-consumption and battery dispatch
+# Replaces the fixed `PV-EV-Anteil [%]` by an hourly balance of a building load profile
+# and a PV generation profile. Profiles are normalized shapes (sum = 1 over the year),
+# scaled per case by the annual consumption and the annual PV production, so a sweep of
+# buildings x kWp x battery sizes only stores the case arrays, never case x 8760 arrays.
+# Without battery the balance is a blockwise min(load, pv); the battery is dispatched
+# greedily (charge from surplus, discharge into deficit) hour by hour, vectorized over
+# all cases.
+# ------------------------------
+import numpy as np
+import pandas as pd
+
+from cache import memoize
+from engine import kernel_mask
+
+HOURS = 8760
+BLOCK_HOURS = 730
+DEFAULT_EFFICIENCY = 0.92  # round trip
+DEFAULT_C_RATE = 0.5       # battery power [kW] per kWh capacity if not given
+
+
+# ------------------------------
+# Profiles
+# ------------------------------
+def _normalize(profile) -> np.ndarray:
+    profile = np.maximum(np.asarray(profile, dtype=float), 0.0)
+    total = profile.sum(axis=-1, keepdims=True)
+    return profile / np.where(total > 0.0, total, 1.0)
+
+
+# Synthetic household load shape (morning/evening peaks, higher in winter)
+def synthetic_load_profile() -> np.ndarray:
+    hour = np.arange(HOURS) % 24
+    day = np.arange(HOURS) // 24
+    daily = (0.55 + 0.35 * np.exp(-0.5 * ((hour - 7.5) / 1.5) ** 2)
+             + 0.25 * np.exp(-0.5 * ((hour - 12.5) / 1.5) ** 2)
+             + 0.6 * np.exp(-0.5 * ((hour - 19.0) / 2.0) ** 2))
+    seasonal = 1.0 + 0.2 * np.cos(2.0 * np.pi * (day - 15) / 365.0)
+    return _normalize(daily * seasonal)
+
+
+# Synthetic PV shape from the solar elevation at `latitude` (clear-sky, no weather)
+def synthetic_pv_profile(latitude: float = 51.0) -> np.ndarray:
+    day = np.arange(HOURS) // 24 + 1
+    hour = np.arange(HOURS) % 24 + 0.5
+    lat = np.radians(latitude)
+    decl = np.radians(23.45) * np.sin(2.0 * np.pi * (284 + day) / 365.0)
+    omega = np.radians(15.0 * (hour - 12.0))
+    sin_alt = np.sin(lat) * np.sin(decl) + np.cos(lat) * np.cos(decl) * np.cos(omega)
+    return _normalize(np.maximum(sin_alt, 0.0) ** 1.3)
+
+
+# Hourly series from a local CSV/Parquet file: one value per hour (8760 or 8784 rows) or per
+# quarter hour (35040 rows, summed or averaged to hours); `column` defaults to the first numeric column
+def read_series(path, column=None, quarter_hours: str = "sum") -> np.ndarray:
+    name = getattr(path, "name", str(path))  # paths or uploaded files
+    df = pd.read_parquet(path) if name.endswith(".parquet") else pd.read_csv(path, sep=None, engine="python")
+    if column is None:
+        numeric = df.select_dtypes("number").columns
+        if len(numeric) == 0:
+            raise ValueError(f"{name}: keine numerische Spalte gefunden.")
+        column = numeric[0]
+    values = df[column].to_numpy(dtype=float, copy=True)
+    if len(values) == 4 * HOURS:
+        values = getattr(values.reshape(HOURS, 4), quarter_hours)(axis=1)
+    elif len(values) == HOURS + 24:
+        values = np.delete(values, np.s_[59 * 24:60 * 24])  # 29 February
+    if len(values) != HOURS:
+        raise ValueError(f"{name}: {len(values)} Werte, erwartet {HOURS} (stündlich) oder {4 * HOURS} (viertelstündlich).")
+    return values
+
+
+def read_profile(path, column=None) -> np.ndarray:
+    return _normalize(read_series(path, column))
+
+
+# ------------------------------
+# Hourly balance
+# ------------------------------
+@memoize
+def simulate_hourly(annual_load_kwh, annual_pv_kwh, load_profile=None, pv_profile=None,
+                    battery_kwh=0.0, battery_kw=None, efficiency: float = DEFAULT_EFFICIENCY) -> dict:
+    # annual_load_kwh, annual_pv_kwh, battery_kwh, battery_kw broadcast to the case shape C;
+    # profiles (8760,) or C + (8760,); returns annual sums of shape C
+    lp = _normalize(synthetic_load_profile() if load_profile is None else load_profile)
+    pp = _normalize(synthetic_pv_profile() if pv_profile is None else pv_profile)
+    load = np.asarray(annual_load_kwh, dtype=float)
+    pv = np.asarray(annual_pv_kwh, dtype=float)
+    cap = np.asarray(battery_kwh, dtype=float)
+    power = DEFAULT_C_RATE * cap if battery_kw is None else np.asarray(battery_kw, dtype=float)
+    shape = np.broadcast_shapes(load.shape, pv.shape, cap.shape, power.shape, lp.shape[:-1], pp.shape[:-1])
+
+    direct = np.zeros(shape)
+    for start in range(0, HOURS, BLOCK_HOURS):
+        block = slice(start, start + BLOCK_HOURS)
+        direct += np.minimum(load[..., None] * lp[..., block], pv[..., None] * pp[..., block]).sum(axis=-1)
+    charged = np.zeros(shape)
+    discharged = np.zeros(shape)
+    if np.any(cap > 0.0):
+        charged, discharged = _dispatch(load, pv, lp, pp, cap, power, efficiency, shape)
+
+    self_kwh = direct + discharged
+    feed_kwh = pv - direct - charged
+    grid_kwh = load - self_kwh
+    return {
+        "pv_self_kwh": self_kwh,
+        "pv_feed_kwh": np.maximum(feed_kwh, 0.0),
+        "grid_kwh": np.maximum(grid_kwh, 0.0),
+        "battery_discharge_kwh": discharged,
+        "self_share": np.where(pv > 0.0, self_kwh / np.where(pv > 0.0, pv, 1.0), 0.0),
+        "autarky": np.where(load > 0.0, self_kwh / np.where(load > 0.0, load, 1.0), 0.0),
+    }
+
+
+# Greedy battery dispatch: sequential in time, vectorized over the cases
+def _dispatch(load, pv, lp, pp, cap, power, efficiency, shape):
+    eta = np.sqrt(efficiency)
+    load = np.broadcast_to(load, shape)
+    pv = np.broadcast_to(pv, shape)
+    cap = np.broadcast_to(cap, shape)
+    power = np.broadcast_to(power, shape)
+    lp_t = np.moveaxis(np.broadcast_to(lp, shape + (HOURS,)) if lp.ndim > 1 else lp, -1, 0)
+    pp_t = np.moveaxis(np.broadcast_to(pp, shape + (HOURS,)) if pp.ndim > 1 else pp, -1, 0)
+    soc = np.zeros(shape)
+    charged = np.zeros(shape)
+    discharged = np.zeros(shape)
+    surplus = np.empty(shape)
+    step = np.empty(shape)
+    for h in range(HOURS):
+        np.subtract(pv * pp_t[h], load * lp_t[h], out=surplus)
+        # charge from surplus (limited by power and free capacity)
+        np.minimum(np.maximum(surplus, 0.0), power, out=step)
+        np.minimum(step, (cap - soc) / eta, out=step)
+        charged += step
+        soc += step * eta
+        # discharge into the deficit (limited by power and stored energy)
+        np.minimum(np.maximum(-surplus, 0.0), power, out=step)
+        np.minimum(step, soc * eta, out=step)
+        discharged += step
+        soc -= step / eta
+    return charged, discharged
+
+
+# ------------------------------
+# Engine bridge and sizing curves
+# ------------------------------
+# Measures with the PV rows' `pv_sc` replaced by the hourly self-consumption share
+# (load = annual consumption of the building before measures) and `pv_loss` set to the
+# share lost in the battery, so only the energy actually fed in earns the feed-in tariff.
+# The PV rows share one load: their summed generation (active rows, all PV rows if none is
+# active) is balanced once and split by each row's share of generation, i.e. every PV row
+# gets the shares of the combined system.
+def with_hourly_pv(inputs: dict, measures: dict, **hourly) -> dict:
+    code = np.asarray(measures["code"])
+    is_pv = kernel_mask(measures, "pv")
+    if not is_pv.any():
+        return measures
+    spec = np.where(np.asarray(measures["pv_yield"]) != 0.0, measures["pv_yield"], np.asarray(inputs["pv_yield"])[..., None])
+    pv_kwh = (np.asarray(measures["qty"]) * spec)[..., is_pv]
+    built = np.asarray(measures["active"], dtype=bool)[..., is_pv]
+    built = np.where(built.any(axis=-1, keepdims=True), built, True)
+    total_kwh = (pv_kwh * built).sum(axis=-1)
+    res = simulate_hourly(np.asarray(inputs["e_el_kwh"], dtype=float), total_kwh, **hourly)
+    feed_share = np.where(total_kwh > 0.0, res["pv_feed_kwh"] / np.where(total_kwh > 0.0, total_kwh, 1.0), 0.0)
+    loss = np.where(total_kwh > 0.0, np.maximum(1.0 - res["self_share"] - feed_share, 0.0), 0.0)
+    shape = np.broadcast_shapes(np.shape(measures["pv_sc"]), res["self_share"].shape + (len(code),))
+    pv_sc = np.array(np.broadcast_to(measures["pv_sc"], shape))
+    pv_sc[..., is_pv] = res["self_share"][..., None]
+    pv_loss = np.zeros(shape)
+    pv_loss[..., is_pv] = loss[..., None]
+    return {**measures, "pv_sc": pv_sc, "pv_loss": pv_loss}
+
+
+# Self-consumption / autarky over kWp x battery sizes for N buildings (arrays of shape (N,))
+def sizing_curves(e_el_kwh, pv_yield, kwp, battery_kwh=(0.0,), **hourly) -> pd.DataFrame:
+    e_el = np.atleast_1d(np.asarray(e_el_kwh, dtype=float))
+    spec = np.broadcast_to(np.asarray(pv_yield, dtype=float), e_el.shape)
+    kwp = np.asarray(kwp, dtype=float)
+    bat = np.asarray(battery_kwh, dtype=float)
+    res = simulate_hourly(e_el[:, None, None], spec[:, None, None] * kwp[None, :, None], battery_kwh=bat[None, None, :], **hourly)
+    grid = np.meshgrid(np.arange(len(e_el)), kwp, bat, indexing="ij")
+    return pd.DataFrame({
+        "Gebäude": grid[0].ravel(),
+        "PV [kWp]": grid[1].ravel(),
+        "Speicher [kWh]": grid[2].ravel(),
+        "Eigenverbrauchsanteil [%]": res["self_share"].ravel() * 100.0,
+        "Autarkiegrad [%]": res["autarky"].ravel() * 100.0,
+        "Einspeisung [kWh/a]": res["pv_feed_kwh"].ravel(),
+        "Netzbezug [kWh/a]": res["grid_kwh"].ravel(),
+    })
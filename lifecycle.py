@@ -0,0 +1,160 @@
+# lifecycle.py
+# ------------------------------
+# Multi-year lifecycle cash flows: NPV, IRR and discounted payback
+# Yearly cash flows over a horizon (<= MAX_HORIZON years) from the annual scenario
+# results: escalated energy-cost savings, CO2 savings priced along a CO2 price path,
+# PV feed-in revenue, Umlage income, reinvestment of each measure at the end of its
+# `lifetime_y` (escalated with the construction cost index) and residual value at the
+# horizon. Everything is an array over cases (buildings, scenarios, ...) x years; the
+# economic parameters broadcast against the case shape, so e.g. inputs of shape (N,)
+# and a discount rate of shape (S, 1) give results of shape (S, N).
+# ------------------------------
+import numpy as np
+
+from cache import memoize
+from engine import measure_terms
+from model import evaluate_scenarios
+
+MAX_HORIZON = 40
+DEFAULT_ECONOMICS = {
+    "horizon": 30,
+    "discount_rate": 0.04,
+    "esc_el": 0.02,            # Strompreis-Steigerung p.a.
+    "esc_heat": 0.03,          # Wärmepreis-Steigerung p.a.
+    "co2_price_path": None,    # €/t for years 1..horizon; None -> co2_price + co2_step_eur_t * (t-1)
+    "co2_step_eur_t": 0.0,
+    "capex_escalation": 0.02,  # Baupreisindex-Fortschreibung p.a. für Reinvestitionen
+    "feed_in_years": 20,       # Dauer der Einspeisevergütung
+    "include_umlage": True,
+    "residual_value": True,
+}
+
+
+def _col(value) -> np.ndarray:
+    # economic parameter (scalar or case array) -> trailing year axis
+    return np.asarray(value, dtype=float)[..., None]
+
+
+# Reinvestment years and residual-value fraction per measure for a given horizon
+def reinvestment_schedule(lifetime_y: np.ndarray, horizon: int):
+    life = np.maximum(np.asarray(lifetime_y, dtype=float), 1.0)
+    years = np.arange(horizon + 1)
+    reinvest = (years[None, :] > 0) & (years[None, :] < horizon) & (years[None, :] % life[:, None] == 0)
+    last_install = life * ((horizon - 1) // life)
+    residual_fraction = (last_install + life - horizon) / life
+    return reinvest, last_install, residual_fraction
+
+
+def cash_flows(evaluated: dict, inputs: dict, capex_k: np.ndarray, active: np.ndarray, lifetime_y: np.ndarray,
+               **economics) -> np.ndarray:
+    # evaluated: evaluate_scenarios output (case shape C); capex_k: initial capex per measure C + (K,)
+    # returns cash flows C + (horizon + 1,), year 0 = initial investment
+    econ = {**DEFAULT_ECONOMICS, **economics}
+    horizon = int(econ["horizon"])
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"Betrachtungszeitraum muss zwischen 1 und {MAX_HORIZON} Jahren liegen.")
+    t = np.arange(1, horizon + 1, dtype=float)
+
+    p_el = np.asarray(inputs["p_el"], dtype=float)
+    el_energy_after = evaluated["el_after"] * p_el
+    feed_in = el_energy_after - evaluated["cost_el_after"]
+    sav_el = evaluated["Kosten Strom [€/a]"] - el_energy_after
+    sav_heat = evaluated["Kosten Heizung [€/a]"] - evaluated["cost_heat_after"]
+    apply_el = np.asarray(inputs["apply_co2_el"], dtype=float)
+    apply_heat = np.asarray(inputs["apply_co2_heat"], dtype=float)
+    priced_t = (apply_el * (evaluated["Emissionen Strom [tCO2/a]"] - evaluated["co2_el_after_t"])
+                + apply_heat * (evaluated["Emissionen Heizung [tCO2/a]"] - evaluated["co2_heat_after_t"]))
+
+    if econ["co2_price_path"] is None:
+        co2_path = _col(inputs["co2_price"]) + _col(econ["co2_step_eur_t"]) * (t - 1.0)
+    else:
+        co2_path = np.asarray(econ["co2_price_path"], dtype=float)
+        if co2_path.ndim == 0 or co2_path.shape[-1] < horizon:
+            raise ValueError(f"CO2-Preispfad muss mindestens {horizon} Jahreswerte enthalten "
+                             f"(erhalten: {co2_path.shape[-1] if co2_path.ndim else 0}).")
+        co2_path = co2_path[..., :horizon]
+
+    annual = (
+        _col(sav_el) * (1.0 + _col(econ["esc_el"])) ** (t - 1.0)
+        + _col(sav_heat) * (1.0 + _col(econ["esc_heat"])) ** (t - 1.0)
+        + _col(priced_t) * co2_path
+        + _col(feed_in) * (t <= econ["feed_in_years"])
+    )
+    if econ["include_umlage"]:
+        annual = annual + _col(evaluated["ann_umlage_total"])
+
+    # reinvestment at the end of each measure's lifetime, residual value at the horizon
+    capex_k = np.asarray(capex_k, dtype=float) * active
+    reinvest, last_install, residual_fraction = reinvestment_schedule(lifetime_y, horizon)
+    growth = 1.0 + _col(econ["capex_escalation"])
+    years = np.arange(horizon + 1, dtype=float)
+    flows = -(capex_k @ reinvest.astype(float)) * growth ** years
+    flows = flows + np.concatenate([np.zeros(np.shape(annual)[:-1] + (1,)), annual], axis=-1)
+    if econ["residual_value"]:
+        residual = (capex_k * growth ** last_install * residual_fraction).sum(axis=-1)
+        flows[..., -1] += residual
+    flows[..., 0] -= evaluated["capex_total"]
+    return flows
+
+
+def npv(flows: np.ndarray, rate) -> np.ndarray:
+    years = np.arange(flows.shape[-1], dtype=float)
+    return (flows * (1.0 + _col(rate)) ** -years).sum(axis=-1)
+
+
+# Vectorized IRR by bisection on [-0.99, 1.0]; NaN where NPV has no sign change
+def irr(flows: np.ndarray, iterations: int = 60) -> np.ndarray:
+    shape = flows.shape[:-1]
+    lo = np.full(shape, -0.99)
+    hi = np.full(shape, 1.0)
+    f_lo = npv(flows, lo)
+    f_hi = npv(flows, hi)
+    valid = np.sign(f_lo) != np.sign(f_hi)
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        f_mid = npv(flows, mid)
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+    return np.where(valid, 0.5 * (lo + hi), np.nan)
+
+
+# First (interpolated) year in which the cumulative discounted cash flow turns non-negative;
+# inf if it never does or if no year brings a positive flow (nothing invested, nothing saved)
+def discounted_payback(flows: np.ndarray, rate) -> np.ndarray:
+    years = np.arange(flows.shape[-1], dtype=float)
+    discounted = flows * (1.0 + _col(rate)) ** -years
+    cumulative = np.cumsum(discounted, axis=-1)
+    reached = cumulative >= 0.0
+    first = np.argmax(reached, axis=-1)
+    prev = np.take_along_axis(cumulative, np.maximum(first - 1, 0)[..., None], axis=-1)[..., 0]
+    step = np.take_along_axis(discounted, first[..., None], axis=-1)[..., 0]
+    frac = np.where(step > 0.0, -prev / np.where(step > 0.0, step, 1.0), 0.0)
+    payback = np.where(first > 0, first - 1 + frac, 0.0)
+    earns = (discounted > 0.0).any(axis=-1)
+    return np.where(reached.any(axis=-1) & earns, payback, np.inf)
+
+
+@memoize
+def lifecycle(inputs: dict, measures: dict, active=None, **economics) -> dict:
+    # inputs/measures/active as in model.evaluate_scenarios; selections (M, K) add a trailing case axis
+    econ = {**DEFAULT_ECONOMICS, **economics}
+    active = np.asarray(measures["active"] if active is None else active, dtype=bool)
+    evaluated = evaluate_scenarios(inputs, measures, active)
+    capex_k = measure_terms(inputs, measures)["capex"]
+    if active.ndim >= 2:
+        capex_k = capex_k[..., None, :]
+    flows = cash_flows(evaluated, _expand_inputs(inputs, active), capex_k, active, measures["lifetime_y"], **econ)
+    return {
+        "cash_flows": flows,
+        "npv_eur": npv(flows, econ["discount_rate"]),
+        "irr": irr(flows),
+        "discounted_payback_y": discounted_payback(flows, econ["discount_rate"]),
+    }
+
+
+def _expand_inputs(inputs: dict, active: np.ndarray) -> dict:
+    if active.ndim < 2:
+        return inputs
+    return {key: np.expand_dims(np.asarray(value), -1) for key, value in inputs.items()}
@@ -0,0 +1,269 @@
+# metering.py
+# ------------------------------
+# Smart-meter interval data -> baseline consumption
+# Streams (quarter-)hourly meter exports chunk by chunk into per-year hourly bins
+# (8784 bins per year, local wall time), so memory stays constant regardless of file
+# size. Timestamps with UTC offsets are converted to local time; in naive local time
+# the repeated October hour is summed and the missing March hour is filled like a gap.
+# Gaps: partially measured hours are scaled to the full hour, empty hours between
+# measured ones are interpolated. The result is cached as an uncompressed .npz (one array
+# per column) in a dedicated cache directory (ENERGYAUDIT_METER_CACHE, never next to the
+# export) and reloaded in milliseconds as long as path, file size, modification time and
+# reading options are unchanged. Uploaded exports (app) are kept there once per content hash.
+#
+#   python metering.py lastgang_strom.csv --kind energy
+#
+# Outputs feed the baseline: annual totals (e_el_kwh / e_heat_kwh), the normalized load
+# profile for hourly.py and the measured full-load hours (flh = annual / peak hour), which
+# makes derived["derived_heat_load"] the measured peak.
+# ------------------------------
+import argparse
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from hourly import HOURS
+
+TIMEZONE = "Europe/Berlin"
+BINS = HOURS + 24  # leap years
+DEFAULT_CHUNK_ROWS = 500_000
+CACHE_SUFFIX = ".meter.npz"
+CACHE_DIR = os.environ.get("ENERGYAUDIT_METER_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "energyaudit", "meter")
+KINDS = ("energy", "power", "counter")  # kWh per interval, mean kW, cumulative kWh reading
+
+
+# ------------------------------
+# Streaming ingestion
+# ------------------------------
+def _guess_columns(chunk: pd.DataFrame, timestamp_col, value_col):
+    if timestamp_col is None:
+        timestamp_col = chunk.columns[0]
+    if value_col is None:
+        value_col = next(c for c in chunk.columns if c != timestamp_col)
+    return timestamp_col, value_col
+
+
+def _parse_timestamps(raw: pd.Series) -> pd.Series:
+    text = raw.astype(str)
+    sample = text.iloc[0]
+    dayfirst = re.match(r"^\d{1,2}\.\d{1,2}\.\d{4}", sample) is not None
+    if re.search(r"(Z|[+-]\d{2}:?\d{2})$", sample):
+        ts = pd.to_datetime(text, utc=True, dayfirst=dayfirst)
+        return ts.dt.tz_convert(TIMEZONE).dt.tz_localize(None)
+    return pd.to_datetime(text, dayfirst=dayfirst)
+
+
+# Decimal separator of the file, decided on the first chunk that contains one (None: no
+# separator seen yet, integers only). "," is the German number format 1.234,5; values with
+# "." only are German as long as every one of them is a thousands grouping (1.234,
+# 12.345.678), any other ("0.25", "12.5", "1234.567") makes "." the decimal point.
+# rentroll reads its number columns the same way (one guess per column)
+THOUSANDS = r"-?[1-9]\d{0,2}(\.\d{3})+(,\d+)?"
+
+
+def decimal_mark(text: pd.Series):
+    if text.str.contains(",", regex=False).any():
+        return ","
+    dotted = text[text.str.contains(".", regex=False)]
+    if dotted.empty:
+        return None
+    return "," if dotted.str.fullmatch(THOUSANDS).all() else "."
+
+
+def parse_decimal(text: pd.Series, decimal) -> np.ndarray:
+    if decimal == ",":
+        text = text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    return pd.to_numeric(text, errors="coerce").to_numpy(dtype=float)
+
+
+def _sniff_sep(path: str) -> str:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        header = f.readline()
+    return max([";", "\t", ","], key=header.count)
+
+
+def ingest_meter(path: str, timestamp_col=None, value_col=None, kind: str = "energy", interval_min=None,
+                 label: str = "start", sep=None, decimal=None, chunksize: int = DEFAULT_CHUNK_ROWS) -> dict:
+    # decimal: "," or "." if known, None = guess from the values (decimal_mark)
+    if kind not in KINDS:
+        raise ValueError(f"Unbekannte Messgröße: {kind} (erlaubt: {', '.join(KINDS)})")
+    if decimal not in (None, ",", "."):
+        raise ValueError(f"Unbekanntes Dezimaltrennzeichen: {decimal!r} (erlaubt: ',' oder '.')")
+    sums, counts = {}, {}
+    last_value = None
+    reader = pd.read_csv(path, sep=sep or _sniff_sep(path), chunksize=chunksize, dtype=str, skipinitialspace=True)
+    for chunk in reader:
+        timestamp_col, value_col = _guess_columns(chunk, timestamp_col, value_col)
+        ts = _parse_timestamps(chunk[timestamp_col])
+        text = chunk[value_col].astype(str).str.strip()
+        decimal = decimal or decimal_mark(text)
+        values = parse_decimal(text, decimal)
+        if interval_min is None:
+            steps = ts.diff().dt.total_seconds().to_numpy()[1:] / 60.0
+            interval_min = float(np.median(steps[steps > 0])) if np.any(steps > 0) else 15.0
+        if kind == "power":
+            values = values * interval_min / 60.0
+        elif kind == "counter":
+            previous = np.r_[np.nan if last_value is None else last_value, values[:-1]]
+            last_value = values[-1]
+            values = values - previous
+            values[values < 0.0] = np.nan  # meter exchange / reset
+        if label == "end":
+            ts = ts - pd.Timedelta(minutes=interval_min)
+        ok = ts.notna().to_numpy() & np.isfinite(values)
+        ts, values = ts[ok], values[ok]
+        year = ts.dt.year.to_numpy()
+        hour = ((ts.dt.dayofyear - 1) * 24 + ts.dt.hour).to_numpy()
+        for y in np.unique(year):
+            sel = year == y
+            sums[y] = sums.get(y, 0.0) + np.bincount(hour[sel], weights=values[sel], minlength=BINS)
+            counts[y] = counts.get(y, 0) + np.bincount(hour[sel], minlength=BINS)
+    if not sums:
+        raise ValueError(f"{path}: keine gültigen Messwerte gefunden.")
+    return _close_gaps(sums, counts, interval_min)
+
+
+# Hour of year that does not exist in local time (02:00 on the last Sunday of March)
+def _spring_forward_hour(year: int) -> int:
+    last_sunday = pd.Timestamp(year=year, month=3, day=31)
+    last_sunday -= pd.Timedelta(days=(last_sunday.dayofweek + 1) % 7)
+    return (last_sunday.dayofyear - 1) * 24 + 2
+
+
+# Per-year hourly kWh with partial hours scaled and gaps between measured hours interpolated
+def _close_gaps(sums: dict, counts: dict, interval_min: float) -> dict:
+    years = np.array(sorted(sums))
+    expected = max(1.0, 60.0 / interval_min)
+    hourly = np.zeros((len(years), BINS))
+    measured = np.zeros(len(years), dtype=int)
+    filled = np.zeros(len(years), dtype=int)
+    hours_in_year = np.array([8784 if pd.Timestamp(year=int(y), month=12, day=31).dayofyear == 366 else HOURS for y in years])
+    for i, y in enumerate(years):
+        n = hours_in_year[i]
+        s, c = sums[y][:n], counts[y][:n].astype(float)
+        has = c > 0
+        values = np.where(has, s * np.maximum(expected / np.where(has, c, 1.0), 1.0), np.nan)
+        idx = np.flatnonzero(has)
+        gap = ~has & (np.arange(n) > idx.min()) & (np.arange(n) < idx.max())
+        skipped = _spring_forward_hour(int(y))
+        gap[skipped] = False
+        values[gap] = np.interp(np.flatnonzero(gap), idx, values[idx])
+        hourly[i, :n] = np.nan_to_num(values)
+        measured[i] = has.sum()
+        filled[i] = gap.sum() + (not has[skipped])  # the skipped hour counts as covered
+    return {
+        "years": years,
+        "hourly_kwh": hourly,
+        "measured_hours": measured,
+        "filled_hours": filled,
+        "hours_in_year": hours_in_year,
+        "interval_min": np.float64(interval_min),
+    }
+
+
+# ------------------------------
+# Columnar cache
+# ------------------------------
+def _cache_path(path: str, cache_dir: str) -> str:
+    name = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, name + CACHE_SUFFIX)
+
+
+def load_meter(path: str, use_cache: bool = True, cache_dir: str = CACHE_DIR, **options) -> dict:
+    # ingest_meter with an on-disk cache in cache_dir (invalidated by size/mtime/options)
+    stat = os.stat(path)
+    key = repr((os.path.abspath(path), stat.st_size, stat.st_mtime_ns, sorted(options.items())))
+    cache_path = _cache_path(path, cache_dir)
+    if use_cache and os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as cached:
+            if str(cached["key"]) == key:
+                return {name: cached[name] for name in cached.files if name != "key"}
+    meter = ingest_meter(path, **options)
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, "wb") as f:
+            np.savez(f, key=np.array(key), **meter)
+    return meter
+
+
+# Uploaded export (bytes) -> file in cache_dir/uploads, written once per content hash, so
+# load_meter can stream it and reuse its cache across reruns
+def store_upload(data: bytes, suffix: str = ".csv", cache_dir: str = CACHE_DIR) -> str:
+    folder = os.path.join(cache_dir, "uploads")
+    path = os.path.join(folder, hashlib.blake2b(data, digest_size=16).hexdigest() + suffix)
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+# ------------------------------
+# Baseline values
+# ------------------------------
+# Annual total, peak hour, measured full-load hours and the normalized 8760 h profile of
+# one year (default: the last complete year, otherwise the best covered one)
+def summarize_meter(meter: dict, year=None) -> dict:
+    years = meter["years"]
+    covered = (meter["measured_hours"] + meter["filled_hours"]) / meter["hours_in_year"]
+    if year is None:
+        complete = np.flatnonzero(covered >= 0.999)
+        i = int(complete[-1]) if len(complete) else int(np.argmax(covered))
+    else:
+        i = int(np.flatnonzero(years == year)[0])
+    n = int(meter["hours_in_year"][i])
+    hourly = meter["hourly_kwh"][i, :n]
+    if n > HOURS:
+        hourly = np.delete(hourly, np.s_[59 * 24:60 * 24])  # profile without 29 February
+    annual = float(meter["hourly_kwh"][i, :n].sum())
+    peak = float(hourly.max())
+    return {
+        "year": int(years[i]),
+        "annual_kwh": annual,
+        "peak_kw": peak,
+        "full_load_hours": annual / peak if peak > 0.0 else 0.0,
+        "coverage": float(covered[i]),
+        "measured_share": float(meter["measured_hours"][i] / n),
+        "profile": hourly / annual if annual > 0.0 else hourly,
+    }
+
+
+# Baseline inputs from electricity and/or heat meter exports (paths or None)
+def baseline_from_meters(el_path=None, heat_path=None, year=None, el_options=None, heat_options=None) -> dict:
+    out = {}
+    if el_path:
+        el = summarize_meter(load_meter(el_path, **(el_options or {})), year)
+        out.update({"e_el_kwh": el["annual_kwh"], "load_profile": el["profile"], "el_meter": el})
+    if heat_path:
+        heat = summarize_meter(load_meter(heat_path, **(heat_options or {})), year)
+        out.update({"e_heat_kwh": heat["annual_kwh"], "flh": heat["full_load_hours"], "heat_meter": heat})
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lastgang (Smart Meter) einlesen, cachen und Jahreswerte ausgeben.")
+    parser.add_argument("input", help="CSV-Export mit Zeitstempel- und Wertspalte")
+    parser.add_argument("--timestamp-col", default=None, help="Zeitstempel-Spalte (Standard: erste Spalte)")
+    parser.add_argument("--value-col", default=None, help="Wert-Spalte (Standard: zweite Spalte)")
+    parser.add_argument("--kind", choices=KINDS, default="energy", help="kWh je Intervall, Leistung [kW] oder Zählerstand")
+    parser.add_argument("--label", choices=["start", "end"], default="start", help="Zeitstempel am Intervallanfang oder -ende")
+    parser.add_argument("--decimal", choices=[",", "."], default=None, metavar="{\",\",\".\"}",
+                        help="Dezimaltrennzeichen (Standard: aus den Werten erkannt)")
+    parser.add_argument("--no-cache", action="store_true", help="Cache weder lesen noch schreiben")
+    args = parser.parse_args(argv)
+    options = {"timestamp_col": args.timestamp_col, "value_col": args.value_col, "kind": args.kind, "label": args.label,
+               "decimal": args.decimal}
+    meter = load_meter(args.input, use_cache=not args.no_cache, **options)
+    for year in meter["years"]:
+        s = summarize_meter(meter, year)
+        print(f"{s['year']}: {s['annual_kwh']:,.0f} kWh, Spitze {s['peak_kw']:,.1f} kW, "
+              f"VBZ {s['full_load_hours']:,.0f} h, Abdeckung {s['coverage']*100:.1f} % "
+              f"(gemessen {s['measured_share']*100:.1f} %)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# model.py
+# ------------------------------
+# Pure calculation model (no Streamlit): Baupreisindex, Emissionsfaktoren, measures
+# catalog, baseline KPIs and Umlage. Shared by the app, the engine callers and the
+# batch tools; all KPI functions accept scalars or numpy arrays (one entry per building).
+# ------------------------------
+import warnings
+
+import numpy as np
+
+from catalog import load_catalog
+from engine import KERNEL_COLUMN, MEASURE_COLUMNS, PARAM_COLUMNS, PERCENT_KEYS, measures_to_arrays, simulate_batch
+
+# ------------------------------
+# Helper: Baupreisindex (Destatis, 2021=100) - Instandhaltung Wohngebäude (ohne Schönheitsreparaturen)
+# Quelle: Destatis, Konjunkturindikator bpr210, Stand 10.07.2025
+# ------------------------------
+BAUPREISINDEX_INST = {
+    "2021": {"I": 95.1, "II": 98.7, "III": 102.0, "IV": 104.3},
+    "2022": {"I": 109.0, "II": 114.4, "III": 118.0, "IV": 121.3},
+    "2023": {"I": 124.8, "II": 126.7, "III": 127.7, "IV": 128.5},
+    "2024": {"I": 130.4, "II": 131.4, "III": 132.4, "IV": 133.1},
+    "2025": {"I": 135.2, "II": 136.4}
+}
+INDEX_BASE = 100.0  # 2021 Jahresdurchschnitt = 100
+
+# ------------------------------
+# Default Emissionsfaktoren (kg CO2/kWh) & CO2-Preis
+# Quellenhinweis im README (UBA/BMWK/BAFA)
+# ------------------------------
+DEFAULT_EF = {
+    "strom": 0.363,    # UBA Strommix 2024 ~ 363 g/kWh
+    "erdgas": 0.20088, # BMWK/BEHG-Richtwert
+    "heizoel": 0.2664, # BMWK/BAFA
+    "fernwaerme": 0.2  # Platzhalter, standortabhängig – bitte anpassen
+}
+DEFAULT_CO2_PRICE_EUR_T = 55.0  # 2025 (BEHG) – kann angepasst werden
+
+# ------------------------------
+# Measures library (editable in-app)
+# Loaded from measures.json (or ENERGYAUDIT_CATALOG), see catalog.py: one effect kernel
+# per measure plus its parameters. capex_unit at index=100 (Jahresdurchschnitt 2021),
+# scaled by selected Destatis-Index; savings are default expectations, user can override
+# per measure
+# ------------------------------
+CATALOG = load_catalog()
+
+# Utility: get index value
+def get_index_value(year: str, quarter: str) -> float:
+    try:
+        return BAUPREISINDEX_INST[year][quarter]
+    except KeyError:
+        # fallback to closest available
+        y = max(BAUPREISINDEX_INST.keys())
+        q = list(BAUPREISINDEX_INST[y].keys())[-1]
+        warnings.warn(f"Baupreisindex {year}/{quarter} nicht vorhanden – verwende {y}/{q}.", stacklevel=2)
+        return BAUPREISINDEX_INST[y][q]
+
+
+# Annual cost index for planning years: mean of the published quarters, beyond the table
+# extrapolated from the latest quarter with the trend of the last four quarters (or `growth`)
+def index_for_year(year: int, growth=None) -> float:
+    quarters = [(y, q, v) for y in sorted(BAUPREISINDEX_INST) for q, v in BAUPREISINDEX_INST[y].items()]
+    if str(year) in BAUPREISINDEX_INST and len(BAUPREISINDEX_INST[str(year)]) == 4:
+        return float(np.mean(list(BAUPREISINDEX_INST[str(year)].values())))
+    last_year, last_q, last_value = quarters[-1]
+    if growth is None:
+        growth = last_value / quarters[-5][2] - 1.0
+    # years between the latest quarter and the middle of the target year
+    q_pos = ["I", "II", "III", "IV"].index(last_q)
+    years_ahead = (int(year) + 0.375) - (int(last_year) + q_pos * 0.25)
+    return float(last_value * (1.0 + growth) ** max(years_ahead, 0.0))
+
+
+
+# ------------------------------
+# Building inputs: defaults (as in the sidebar) and derived quantities
+# ------------------------------
+DEFAULT_INPUTS = {
+    "area_m2": 2500.0,
+    "units": 40,
+    "window_ratio": 0.25,
+    "e_el_kwh": 120000.0,
+    "e_heat_kwh": 450000.0,
+    "carrier": "Erdgas",
+    "p_el": 0.32,
+    "p_heat": 0.12,
+    "ef_el": DEFAULT_EF["strom"],
+    "co2_price": DEFAULT_CO2_PRICE_EUR_T,
+    "apply_co2_el": False,
+    "apply_co2_heat": True,
+    "pv_kwp": 100.0,
+    "pv_yield": 950.0,
+    "pv_sc": 0.6,
+    "pv_fit": 0.08,
+    "umlage_pct_general": 0.08,
+    "umlage_pct_heating": 0.10,
+    "cap_modernisierung_eur": 3.0,
+    "cap_low_rent_eur": 2.0,
+    "cap_heating_special_eur": 0.5,
+    "avg_rent_eur_m2": 9.0,
+    "flh": 2000,
+}
+CARRIER_EF_KEY = {"Erdgas": "erdgas", "Heizöl": "heizoel", "Fernwärme": "fernwaerme"}
+
+# default_qty_from -> key in the derived quantities dict
+QTY_SOURCES = {
+    "area": "area",
+    "units": "units",
+    "common_area": "common_area",
+    "window_ratio": "window_area_m2",
+    "pv_kwp": "pv_kwp",
+    "derived_heat_load": "derived_heat_load",
+}
+
+
+# Derived quantities (scalars or arrays)
+def derive_quantities(area_m2, units, common_area_m2, window_ratio, pv_kwp, pv_yield, e_heat_kwh, flh) -> dict:
+    # Approximate peak heat load from annual heat energy (full-load hours heuristic)
+    return {
+        "area": area_m2,
+        "units": units,
+        "common_area": common_area_m2,
+        "window_ratio": window_ratio,
+        "window_area_m2": area_m2 * window_ratio,
+        "pv_kwp": pv_kwp,
+        "pv_specific_yield": pv_yield,
+        "derived_heat_load": e_heat_kwh / np.maximum(1, flh),
+    }
+
+
+# Build editable measures dataframe (column-wise from the catalog arrays); the PV defaults
+# apply where the catalog gives no value, kernel parameter columns only for kernels in use
+def build_measures_df(derived: dict, pv_yield: float, pv_sc: float, pv_fit: float, catalog=None) -> "pd.DataFrame":
+    import pandas as pd  # imported on first use, see engine.measures_to_arrays
+    catalog = CATALOG if catalog is None else catalog
+    k = len(catalog["code"])
+    fallback = {"pv_yield": pv_yield, "pv_sc": pv_sc, "pv_fit": pv_fit}
+    columns = {
+        "Aktiv": np.zeros(k, dtype=bool),
+        "Code": catalog["code"],
+        "Maßnahme": catalog["name"],
+        "Kategorie": catalog["category"],
+        "Einheit": catalog["unit"],
+        KERNEL_COLUMN: catalog["kernel"],
+        "Menge": np.array([float(derived.get(QTY_SOURCES[src], 0.0)) for src in catalog["qty_from"].tolist()]),
+        "Capex/Einheit @Index100 [€]": catalog["capex_unit_2021"],
+        "Lebensdauer [a]": catalog["lifetime_y"],
+    }
+    param_columns = {**MEASURE_COLUMNS, **PARAM_COLUMNS}
+    for col, key in param_columns.items():
+        if key in catalog["params"]:
+            values = np.where(np.isnan(catalog["params"][key]), fallback.get(key, 0.0), catalog["params"][key])
+            columns[col] = values * 100.0 if key in PERCENT_KEYS else values
+    return pd.DataFrame(columns)
+
+
+# Default catalog as engine arrays for many buildings at once: quantities (N, K) from
+# the derived arrays, all other parameters (K,) as in build_measures_df
+def default_measure_arrays(derived: dict, catalog=None) -> dict:
+    catalog = CATALOG if catalog is None else catalog
+    table = build_measures_df({}, DEFAULT_INPUTS["pv_yield"], DEFAULT_INPUTS["pv_sc"], DEFAULT_INPUTS["pv_fit"], catalog)
+    arrays = measures_to_arrays(table)
+    qty = [np.asarray(derived[QTY_SOURCES[src]], dtype=float) for src in catalog["qty_from"].tolist()]
+    arrays["qty"] = np.stack(np.broadcast_arrays(*qty), axis=-1)
+    return arrays
+
+
+# ------------------------------
+# Baseline KPIs (scalars or arrays)
+# ------------------------------
+def baseline_kpis(e_el_kwh, e_heat_kwh, p_el, p_heat, ef_el, ef_heat, co2_price, apply_co2_el, apply_co2_heat) -> dict:
+    co2_el_t = e_el_kwh * ef_el / 1000.0
+    co2_heat_t = e_heat_kwh * ef_heat / 1000.0
+    cost_el = e_el_kwh * p_el
+    cost_heat = e_heat_kwh * p_heat
+    co2_cost_baseline = np.where(apply_co2_el, co2_el_t * co2_price, 0.0) + np.where(apply_co2_heat, co2_heat_t * co2_price, 0.0)
+    return {
+        "Energie Strom [kWh/a]": e_el_kwh,
+        "Energie Heizung [kWh/a]": e_heat_kwh,
+        "Kosten Strom [€/a]": cost_el,
+        "Kosten Heizung [€/a]": cost_heat,
+        "Emissionen Strom [tCO2/a]": co2_el_t,
+        "Emissionen Heizung [tCO2/a]": co2_heat_t,
+        "CO2-Kosten [€/a]": co2_cost_baseline,
+        "Gesamtkosten [€/a]": cost_el + cost_heat + co2_cost_baseline
+    }
+
+
+# ------------------------------
+# Umlage – vereinfachte Abbildung §559 / §559e (Kappungsgrenzen je 6 Jahre)
+# ------------------------------
+def umlage(ann_capex_general, ann_capex_heating, rentable_area_m2, avg_rent_eur_m2,
+           cap_modernisierung_eur, cap_low_rent_eur, cap_heating_special_eur) -> dict:
+    cap_limit = np.where(avg_rent_eur_m2 < 7.0, cap_low_rent_eur, cap_modernisierung_eur)
+    # jährliche Obergrenze pro m²: Cap / 6
+    annual_cap_per_m2 = cap_limit / 6.0
+    annual_cap_heating_per_m2 = cap_heating_special_eur / 6.0
+    area = np.maximum(1.0, rentable_area_m2)
+    ann_umlage_general = np.minimum(ann_capex_general / area, annual_cap_per_m2) * rentable_area_m2
+    ann_umlage_heating = np.minimum(ann_capex_heating / area, annual_cap_heating_per_m2) * rentable_area_m2
+    return {
+        "annual_cap_per_m2": annual_cap_per_m2,
+        "annual_cap_heating_per_m2": annual_cap_heating_per_m2,
+        "ann_umlage_general": ann_umlage_general,
+        "ann_umlage_heating": ann_umlage_heating,
+        "ann_umlage_total": ann_umlage_general + ann_umlage_heating,
+    }
+
+
+# Summary KPIs of a scenario: savings vs. baseline and simplified landlord payback
+def scenario_kpis(baseline: dict, results: dict, umlage_res: dict) -> dict:
+    cost_after_total = results["cost_el_after"] + results["cost_heat_after"] + results["co2_cost_after"]
+    savings_eur_pa = baseline["Gesamtkosten [€/a]"] - cost_after_total
+    co2_savings_t = (baseline["Emissionen Strom [tCO2/a]"] + baseline["Emissionen Heizung [tCO2/a]"]) - (results["co2_el_after_t"] + results["co2_heat_after_t"])
+    landlord_net_savings = savings_eur_pa + umlage_res["ann_umlage_total"]
+    simple_payback_y = np.where(
+        landlord_net_savings > 0,
+        results["capex_total"] / np.maximum(1e-9, landlord_net_savings),
+        np.inf,
+    )
+    return {
+        "cost_after_total": cost_after_total,
+        "savings_eur_pa": savings_eur_pa,
+        "co2_savings_t": co2_savings_t,
+        "landlord_net_savings": landlord_net_savings,
+        "simple_payback_y": simple_payback_y,
+    }
+
+
+# ------------------------------
+# Full scenario evaluation: baseline, engine results, Umlage and summary KPIs
+# inputs: engine BUILDING_KEYS plus UMLAGE_KEYS (scalars or case arrays)
+# active: as in engine.simulate_batch; case inputs get a trailing axis for (M, K) selections
+# ------------------------------
+UMLAGE_KEYS = ("rentable_area_m2", "avg_rent_eur_m2", "cap_modernisierung_eur", "cap_low_rent_eur", "cap_heating_special_eur")
+
+
+def evaluate_scenarios(inputs: dict, measures: dict, active=None) -> dict:
+    results = simulate_batch(inputs, measures, active)
+    expand = (lambda v: np.expand_dims(v, -1)) if active is not None and np.ndim(active) >= 2 else np.asarray
+    baseline = baseline_kpis(
+        inputs["e_el_kwh"], inputs["e_heat_kwh"], inputs["p_el"], inputs["p_heat"], inputs["ef_el"],
+        inputs["ef_heat"], inputs["co2_price"], inputs["apply_co2_el"], inputs["apply_co2_heat"],
+    )
+    baseline = {key: expand(value) for key, value in baseline.items()}
+    umlage_res = umlage(
+        results["ann_capex_general"], results["ann_capex_heating"],
+        *(expand(inputs[key]) for key in UMLAGE_KEYS),
+    )
+    kpis = scenario_kpis(baseline, results, umlage_res)
+    shape = results["capex_total"].shape
+    return {key: np.broadcast_to(value, shape) for part in (baseline, results, umlage_res, kpis) for key, value in part.items()}
+
+
+# Single building as in the app's simulate(): measures table (tab 2) -> engine totals as floats
+def simulate(inputs: dict, measures_df) -> dict:
+    totals = simulate_batch(inputs, measures_to_arrays(measures_df))
+    return {key: float(value) for key, value in totals.items()}
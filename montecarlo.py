@@ -0,0 +1,147 @@
+# montecarlo.py
+# ------------------------------
+# Monte-Carlo uncertainty mode
+# Draws uncertain inputs (prices, CO2 price, Baupreisindex factor, per-measure savings
+# and heat-pump SCOP) in vectorized chunks; every sample is one engine case, so a chunk
+# of 20k samples is a single simulate_batch call. Chunks run on a process pool, the
+# engine temporaries are bounded by the chunk size; only the few result vectors per
+# sample are kept for the percentiles, and only the summary is cached (run_monte_carlo).
+#
+# distributions: {"p_el": ("triangular", 0.28, 0.32, 0.40),
+#                 "co2_price": ("normal", 55.0, 10.0),
+#                 "roof_ins.heat_pct": ("uniform", 0.05, 0.10),   # measure code . engine key
+#                 "heat_pump_aw.hp_scop": ("triangular", 2.5, 3.0, 3.5)}
+# Supported: normal (mean, sd), lognormal (mean, sigma of log; arithmetic mean, the median
+# is mean * exp(-sigma^2 / 2)), uniform (low, high), triangular (low, mode, high), fixed
+# (value). Values are in engine units (fractions). Draws are clipped to the physical range
+# of their key (shares 0..1, SCOP >= 1, everything else >= 0), so a normal savings or
+# price draw never turns negative.
+# ------------------------------
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cache import memoize
+from engine import PERCENT_KEYS, measure_terms
+from model import evaluate_scenarios
+
+DEFAULT_CHUNK = 20000
+MIN_SCOP = 1.0
+METRICS = {
+    "savings_eur_pa": "Einsparung p.a. [€]",
+    "co2_savings_t": "CO₂-Einsparung [t/a]",
+    "simple_payback_y": "Amortisation [a]",
+}
+
+
+def sample(dist: tuple, size: int, rng: np.random.Generator) -> np.ndarray:
+    kind, *params = dist
+    if kind == "normal":
+        return rng.normal(params[0], params[1], size)
+    if kind == "lognormal":
+        return params[0] * rng.lognormal(-0.5 * params[1] ** 2, params[1], size)
+    if kind == "uniform":
+        return rng.uniform(params[0], params[1], size)
+    if kind == "triangular":
+        low, mode, high = params
+        return rng.triangular(low, mode, high, size) if high > low else np.full(size, float(mode))
+    if kind == "fixed":
+        return np.full(size, float(params[0]))
+    raise ValueError(f"Unbekannte Verteilung: {kind}")
+
+
+# Physical range of an input or measure key ("p_el", "roof_ins.heat_pct", ...)
+def physical_range(name: str) -> tuple:
+    key = name.split(".", 1)[-1]
+    if key in PERCENT_KEYS:
+        return 0.0, 1.0
+    if key == "hp_scop":
+        return MIN_SCOP, np.inf
+    return 0.0, np.inf
+
+
+# One chunk of samples: sampled inputs -> savings, CO2 reduction, payback, package lifetime
+def _run_chunk(inputs: dict, measures: dict, active: np.ndarray, distributions: dict, size: int, seed) -> dict:
+    rng = np.random.default_rng(seed)
+    inputs = dict(inputs)
+    measures = dict(measures)
+    code = list(measures["code"])
+    for name, dist in distributions.items():
+        values = np.clip(sample(dist, size, rng), *physical_range(name))
+        if "." in name:
+            measure_code, key = name.split(".", 1)
+            column = np.array(np.broadcast_to(measures[key], (size, len(code))), dtype=float)
+            column[:, code.index(measure_code)] = values
+            measures[key] = column
+        else:
+            inputs[name] = values
+    # measures sampled per case need the other inputs broadcast to the sample axis
+    inputs = {key: np.broadcast_to(value, (size,)) for key, value in inputs.items()}
+    evaluated = evaluate_scenarios(inputs, measures, active)
+    # capex-weighted lifetime of the active package
+    capex = measure_terms(inputs, measures)["capex"] * active
+    lifetime = (capex * np.asarray(measures["lifetime_y"])).sum(axis=-1) / np.maximum(capex.sum(axis=-1), 1e-9)
+    out = {key: evaluated[key].astype(float) for key in METRICS}
+    out["lifetime_y"] = lifetime
+    return out
+
+
+# Per-sample results {metric: (n_samples,)}, not cached (1e6 samples are ~32 MB)
+def sample_outcomes(inputs: dict, measures: dict, distributions: dict, n_samples: int = 100000, active=None,
+                    chunk: int = DEFAULT_CHUNK, seed: int = 0, workers=None) -> dict:
+    active = np.asarray(measures["active"] if active is None else active, dtype=bool)
+    sizes = [min(chunk, n_samples - start) for start in range(0, n_samples, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = min(workers or os.cpu_count() or 1, len(sizes))
+    args = [(inputs, measures, active, distributions, size, s) for size, s in zip(sizes, seeds)]
+    if workers == 1:
+        parts = [_run_chunk(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_run_chunk, *zip(*args)))
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+# Percentiles and exceedance probability; only this summary is kept in the result cache
+@memoize
+def run_monte_carlo(inputs: dict, measures: dict, distributions: dict, n_samples: int = 100000, active=None,
+                    chunk: int = DEFAULT_CHUNK, seed: int = 0, workers=None) -> dict:
+    return summarize(sample_outcomes(inputs, measures, distributions, n_samples, active, chunk, seed, workers))
+
+
+def summarize(samples: dict) -> dict:
+    rows = []
+    for key, label in METRICS.items():
+        values = samples[key]
+        p10, p50, p90 = np.percentile(values, [10, 50, 90], method="nearest")
+        finite = values[np.isfinite(values)]
+        mean = finite.mean() if len(finite) else np.inf
+        rows.append({"Kennzahl": label, "P10": p10, "P50": p50, "P90": p90, "Mittelwert": mean})
+    payback = samples["simple_payback_y"]
+    return {
+        "summary": pd.DataFrame(rows),
+        "p_payback_exceeds_lifetime": float(np.mean(payback > samples["lifetime_y"])),
+        "n_samples": len(payback),
+    }
+
+
+# Symmetric triangular spreads around the current point estimates (as used in the app):
+# spreads are relative, e.g. {"p_el": 0.2} -> triangular(0.8 p_el, p_el, 1.2 p_el);
+# "*.heat_pct" applies to every active measure with a non-zero value of that key
+def triangular_spreads(inputs: dict, measures: dict, active, spreads: dict) -> dict:
+    code = list(measures["code"])
+    modes = {}
+    for name, spread in spreads.items():
+        if spread <= 0:
+            continue
+        if "." not in name:
+            modes[name] = (float(inputs[name]), spread)
+            continue
+        measure_code, key = name.split(".", 1)
+        values = np.broadcast_to(measures[key], (len(code),))
+        for i in range(len(code)):
+            if active[i] and values[i] != 0.0 and measure_code in ("*", code[i]):
+                modes[f"{code[i]}.{key}"] = (float(values[i]), spread)
+    return {name: ("triangular", mode * (1.0 - spread), mode, mode * (1.0 + spread)) for name, (mode, spread) in modes.items()}
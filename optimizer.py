@@ -0,0 +1,171 @@
+# optimizer.py
+# ------------------------------
+# Measure-package optimizer: Pareto frontier over CAPEX, annual savings, CO2 reduction
+# and simplified payback. Small catalogs (<= MAX_ENUMERATE candidates) are enumerated
+# completely in one batched engine call; larger catalogs are built up measure by
+# measure and pruned with the budget bound and state dominance (see _pruned_selections).
+# ------------------------------
+import numpy as np
+import pandas as pd
+
+from cache import memoize
+from engine import KERNELS, kernels_of, measure_terms
+from model import evaluate_scenarios, umlage
+
+MAX_ENUMERATE = 16  # 2^16 packages per building still evaluate in one call
+UMLAGE_INPUTS = ("rentable_area_m2", "avg_rent_eur_m2", "cap_modernisierung_eur", "cap_low_rent_eur", "cap_heating_special_eur")
+
+# objective -> sense (+1 minimize, -1 maximize)
+OBJECTIVES = {
+    "capex_total": 1.0,
+    "savings_eur_pa": -1.0,
+    "co2_savings_t": -1.0,
+    "simple_payback_y": 1.0,
+}
+
+
+# All 2^k activation sets as a bool matrix (2^k, k); row i activates the bits of i
+def enumerate_selections(k: int) -> np.ndarray:
+    return ((np.arange(2 ** k)[:, None] >> np.arange(k)) & 1).astype(bool)
+
+
+# Non-dominated rows of objectives (M, J), all objectives minimized. Sweep over the
+# lexicographically sorted unique rows: each kept point removes everything it dominates,
+# so the cost is O(M x front size) instead of O(M^2)
+def pareto_mask(objectives: np.ndarray) -> np.ndarray:
+    unique, inverse = np.unique(np.asarray(objectives, dtype=float), axis=0, return_inverse=True)
+    remaining = np.arange(len(unique))
+    points = unique
+    i = 0
+    while i < len(points):
+        survivors = (points < points[i]).any(axis=1)
+        survivors[i] = True
+        remaining, points = remaining[survivors], points[survivors]
+        i = int(survivors[:i].sum()) + 1
+    keep = np.zeros(len(unique), dtype=bool)
+    keep[remaining] = True
+    return keep[inverse.ravel()]
+
+
+# State of a partial package (sums over its measures). Adding the same measures to two
+# packages preserves dominance in this state, so dominated packages can be dropped early:
+# costs and emissions after are monotone in capex, the log-factors, the WRG extra
+# electricity, the solar heat and the PV yields (for non-negative prices and emission factors).
+# The payback also depends on the Umlage, i.e. on the general (§559) and heating (§559e)
+# capex with their own caps: those two sums are kept as well (UMLAGE_STATE columns).
+UMLAGE_STATE = 7  # columns of ann_capex_general, ann_capex_heating
+
+
+def _state_columns(terms: dict) -> np.ndarray:
+    return np.stack([
+        terms["capex"],
+        np.maximum(terms["log_heat_keep"], -50.0) - 50.0 * terms["heat_full"],
+        np.maximum(terms["log_el_keep"], -50.0) - 50.0 * terms["el_full"],
+        terms["extra_el_kwh"],
+        -terms["heat_offset_kwh"],
+        -terms["pv_self_kwh"],
+        -terms["pv_feed_eur"],
+        terms["ann_capex_general"],
+        terms["ann_capex_heating"],
+    ], axis=-1)
+
+
+# Columns compared for dominance (all minimized): the Umlage of each pool, capped as in
+# model.umlage. min(a, cap) >= min(b, cap) implies min(a + x, cap) >= min(b + x, cap), so a
+# package with less capex, better effects and at least the same capped Umlage keeps a
+# payback at least as short after any extension; beyond the cap more capex gains nothing.
+def _dominance_columns(states: np.ndarray, inputs: dict) -> np.ndarray:
+    capped = umlage(states[:, UMLAGE_STATE], states[:, UMLAGE_STATE + 1], *(inputs[key] for key in UMLAGE_INPUTS))
+    return np.column_stack([states[:, :UMLAGE_STATE], -capped["ann_umlage_general"], -capped["ann_umlage_heating"]])
+
+
+def _pruned_selections(terms: dict, is_switch: np.ndarray, candidates: np.ndarray, budget, inputs: dict) -> np.ndarray:
+    k = len(is_switch)
+    columns = _state_columns(terms)
+    selections = np.zeros((1, k), dtype=bool)
+    states = np.zeros((1, columns.shape[1]))
+    for j in np.flatnonzero(candidates):
+        added = selections.copy()
+        added[:, j] = True
+        selections = np.concatenate([selections, added])
+        states = np.concatenate([states, states + columns[j]])
+        if budget is not None:
+            within = states[:, 0] <= budget
+            selections, states = selections[within], states[within]
+        # packages are only comparable with the same switch rows (heat pump, heat network act after the factors)
+        compared = _dominance_columns(states, inputs)
+        keep = np.zeros(len(selections), dtype=bool)
+        switch_key = selections[:, is_switch] @ (1 << np.arange(is_switch.sum()))
+        for group in np.unique(switch_key):
+            rows = np.flatnonzero(switch_key == group)
+            rows = rows[np.unique(compared[rows], axis=0, return_index=True)[1]]  # identical states once
+            keep[rows[pareto_mask(compared[rows])]] = True
+        selections, states = selections[keep], states[keep]
+    return selections
+
+
+# Candidate packages of one building: full enumeration or pruned expansion
+def candidate_selections(inputs: dict, measures: dict, candidates=None, budget=None,
+                         max_enumerate: int = MAX_ENUMERATE) -> np.ndarray:
+    code = np.asarray(measures["code"])
+    k = len(code)
+    candidates = np.ones(k, dtype=bool) if candidates is None else np.asarray(candidates, dtype=bool)
+    if candidates.sum() <= max_enumerate:
+        selections = np.zeros((2 ** int(candidates.sum()), k), dtype=bool)
+        selections[:, candidates] = enumerate_selections(int(candidates.sum()))
+        return selections
+    is_switch = np.isin(kernels_of(measures), [name for name, spec in KERNELS.items() if spec["switch"] is not None])
+    return _pruned_selections(measure_terms(inputs, measures), is_switch, candidates, budget, inputs)
+
+
+# Pareto-optimal packages for one building (scalar inputs); returns one row per package
+# with the objectives and the activation mask, sorted by CAPEX
+@memoize
+def pareto_packages(inputs: dict, measures: dict, candidates=None, budget=None,
+                    max_enumerate: int = MAX_ENUMERATE) -> pd.DataFrame:
+    code = np.asarray(measures["code"])
+    selections = candidate_selections(inputs, measures, candidates, budget, max_enumerate)
+    evaluated = evaluate_scenarios(inputs, measures, selections)
+    feasible = np.ones(len(selections), dtype=bool) if budget is None else evaluated["capex_total"] <= budget
+    objectives = np.stack([evaluated[key] * sense for key, sense in OBJECTIVES.items()], axis=-1)
+    front = np.flatnonzero(feasible)[pareto_mask(objectives[feasible])]
+    df = pd.DataFrame({
+        "Maßnahmen": [", ".join(code[row]) for row in selections[front]],
+        "Anzahl": selections[front].sum(axis=1),
+        **{key: evaluated[key][front] for key in OBJECTIVES},
+        "ann_umlage_total": evaluated["ann_umlage_total"][front],
+    })
+    df["mask"] = list(selections[front])
+    return df.sort_values(["capex_total", "savings_eur_pa"], ascending=[True, False]).reset_index(drop=True)
+
+
+# Best package per building for many buildings at once (inputs of shape (N,)):
+# all 2^k candidate packages are evaluated in blocks of buildings, the best feasible
+# one by `objective` is returned as activation mask (N, K) plus its objective value
+@memoize
+def best_packages(inputs: dict, measures: dict, objective: str = "co2_savings_t", budget=None,
+                  candidates=None, max_scenarios: int = 2 ** 20):
+    code = np.asarray(measures["code"])
+    k = len(code)
+    candidates = np.ones(k, dtype=bool) if candidates is None else np.asarray(candidates, dtype=bool)
+    if candidates.sum() > MAX_ENUMERATE:
+        raise ValueError(f"best_packages enumeriert höchstens {MAX_ENUMERATE} Kandidaten.")
+    selections = np.zeros((2 ** int(candidates.sum()), k), dtype=bool)
+    selections[:, candidates] = enumerate_selections(int(candidates.sum()))
+    n = len(np.asarray(inputs["e_el_kwh"]))
+    limit = None if budget is None else np.broadcast_to(np.asarray(budget, dtype=float), (n,))
+    sense = OBJECTIVES[objective]
+    best = np.zeros(n, dtype=int)
+    value = np.empty(n)
+    step = max(1, max_scenarios // len(selections))
+    for start in range(0, n, step):
+        part = slice(start, start + step)
+        block_inputs = {key: (v[part] if np.ndim(v) else v) for key, v in inputs.items()}
+        block_measures = {key: (v[part] if np.ndim(v) == 2 and key != "code" else v) for key, v in measures.items()}
+        evaluated = evaluate_scenarios(block_inputs, block_measures, selections)
+        score = evaluated[objective] * sense
+        if limit is not None:
+            score = np.where(evaluated["capex_total"] <= limit[part][:, None], score, np.inf)
+        best[part] = np.argmin(score, axis=-1)
+        value[part] = np.take_along_axis(evaluated[objective], best[part][:, None], axis=-1)[:, 0]
+    return selections[best], value
@@ -0,0 +1,83 @@
+# overlay.py
+# ------------------------------
+# Shared measures tables with per-session edit overlays
+# - base table: build_measures_df through the process-wide result cache, i.e. built once
+#   per distinct building inputs / catalog and shared read-only by all sessions (callers
+#   get shallow copy-on-write views, see cache._copy)
+# - overlay: {code: {column: value}} with only the cells a session changed; it is all a
+#   session keeps of the measures table, the full table is materialized per rerun
+# - uploaded catalogs are kept once per content hash in the same result cache (bounded,
+#   LRU), sessions keep the hash; an evicted catalog raises instead of silently becoming
+#   the default catalog, so the app can tell the session to upload it again
+# Overlays are keyed by measure code and column, so they survive a rebuilt base table
+# (e.g. after a sidebar change the quantities follow the building, edited cells stay).
+# ------------------------------
+import numpy as np
+import pandas as pd
+
+from cache import CACHE, CODE_VERSION, cached_call, canonical_key
+from model import CATALOG, build_measures_df
+
+
+def register_catalog(catalog: dict) -> str:
+    key = canonical_key(CODE_VERSION, "catalog", catalog)
+    CACHE.put(key, catalog)
+    return key
+
+
+def catalog_for(key) -> dict:
+    if not key:
+        return CATALOG
+    catalog = CACHE.get(key)
+    if catalog is None:
+        raise ValueError("Der hochgeladene Maßnahmenkatalog ist nicht mehr im Speicher – bitte erneut hochladen.")
+    return catalog
+
+
+# Shared default table for the building (read-only; edits go into the overlay) and its content key
+def base_table(derived: dict, pv_yield: float, pv_sc: float, pv_fit: float, catalog_key=None):
+    key = canonical_key("base_table", derived, pv_yield, pv_sc, pv_fit, catalog_key)
+    return key, cached_call(build_measures_df, derived, pv_yield, pv_sc, pv_fit, catalog_for(catalog_key))
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# Cells of `table` that differ from `base` (rows matched by code; NaN counts as a change)
+def overlay_from_table(base: pd.DataFrame, table: pd.DataFrame) -> dict:
+    codes = base["Code"].tolist()
+    aligned = table.drop_duplicates("Code").set_index("Code").reindex(codes)
+    present = aligned.index.isin(table["Code"])
+    overlay = {}
+    for col in base.columns.drop("Code"):
+        if col not in aligned.columns:
+            continue
+        old = base[col].to_numpy()
+        new = aligned[col].to_numpy()
+        changed = present & ~((old == new) | (pd.isna(old) & pd.isna(new)))
+        for i in np.flatnonzero(changed):
+            overlay.setdefault(codes[i], {})[col] = _plain(new[i])
+    return overlay
+
+
+# Base table with the overlay applied (codes or columns missing in the base are ignored)
+def apply_overlay(base: pd.DataFrame, overlay: dict) -> pd.DataFrame:
+    table = base.copy()
+    if not overlay:
+        return table
+    rows = {code: i for i, code in enumerate(base["Code"].tolist())}
+    for col in base.columns:
+        cells = [(rows[code], edits[col]) for code, edits in overlay.items() if code in rows and col in edits]
+        if cells:
+            values = table[col].to_numpy(copy=True)
+            if values.dtype != object and not all(np.can_cast(np.asarray(v).dtype, values.dtype, "same_kind") for _, v in cells):
+                values = values.astype(object)
+            for i, value in cells:
+                values[i] = value
+            table[col] = values
+    return table
+
+
+def overlay_cells(overlay: dict) -> int:
+    return sum(len(edits) for edits in overlay.values())
@@ -0,0 +1,439 @@
+# portfolio.py
+# ------------------------------
+# Portfolio batch runner (headless, no Streamlit)
+# Streams a building file (CSV or Parquet, one row per building) through the model in
+# chunks, evaluates baseline KPIs, the simulate() results and the Umlage for every
+# building with the vectorized engine and appends the results to the output file.
+# Chunks are spread over a process pool; at most 2 chunks per worker are in flight.
+#
+#   python portfolio.py buildings.csv results.csv --workers 8 --chunksize 5000
+#
+# Columns (missing ones fall back to the sidebar defaults in model.DEFAULT_INPUTS):
+#   building_id, area_m2, units, common_area_m2, window_ratio [0..1], e_el_kwh, e_heat_kwh,
+#   carrier (Erdgas/Heizöl/Fernwärme), p_el, p_heat, ef_el, ef_heat, co2_price,
+#   apply_co2_el, apply_co2_heat, index_year, index_quarter, pv_kwp, pv_yield, pv_sc [0..1],
+#   pv_fit, flh, rentable_area_m2, avg_rent_eur_m2, umlage_pct_general, umlage_pct_heating,
+#   cap_modernisierung_eur, cap_low_rent_eur, cap_heating_special_eur,
+#   measures ("roof_ins;heat_pump_aw" or "all"), budget_eur (with --optimize),
+#   meter_el / meter_heat (paths to smart-meter exports; override e_el_kwh / e_heat_kwh and flh)
+# ------------------------------
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cache import CACHE, CODE_VERSION, canonical_key, configure
+from engine import kernel_mask
+from model import (
+    BAUPREISINDEX_INST, INDEX_BASE, DEFAULT_EF, DEFAULT_INPUTS, CARRIER_EF_KEY, CATALOG,
+    get_index_value, derive_quantities, default_measure_arrays, evaluate_scenarios,
+)
+from metering import baseline_from_meters
+from optimizer import best_packages
+from lifecycle import DEFAULT_ECONOMICS, lifecycle
+from profiling import Profiler, activate, current, run_profiled, span
+from scenario_store import RESULT_COLUMNS, ScenarioStore, encode_scenarios
+
+DEFAULT_CHUNKSIZE = 5000
+ROW_HASH_KEY = "energyaudit.row2"  # 16 characters: hash key of the second row hash (128-bit cache keys)
+MEASURE_CODES = CATALOG["code"].tolist()
+TEXT_COLUMNS = ("building_id", "measures")  # result columns; all others are float64
+
+
+# ------------------------------
+# Input
+# ------------------------------
+def _is_parquet(path: str) -> bool:
+    return str(path).lower().endswith((".parquet", ".pq"))
+
+
+def read_chunks(path: str, chunksize: int = DEFAULT_CHUNKSIZE):
+    if _is_parquet(path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError("Parquet-Dateien benötigen 'pyarrow' (pip install pyarrow).") from exc
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize))
+    else:
+        chunks = iter(pd.read_csv(path, chunksize=chunksize))
+    while True:
+        with span("read_chunk"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+# Numeric column with per-row fallback for missing columns and empty cells
+def _column(chunk: pd.DataFrame, name: str, default) -> np.ndarray:
+    default = np.broadcast_to(np.asarray(default, dtype=float), (len(chunk),))
+    if name not in chunk.columns:
+        return default
+    values = pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype=float)
+    return np.where(np.isnan(values), default, values)
+
+
+# index_year as read from CSV may be float ("2021.0" with a blank cell in the column) and
+# index_quarter "II", "Q2" or 2; empty cells fall back to the latest quarter
+def _index_factor(chunk: pd.DataFrame) -> np.ndarray:
+    year_default = max(BAUPREISINDEX_INST.keys())
+    quarter_default = list(BAUPREISINDEX_INST[year_default].keys())[-1]
+    if "index_year" in chunk.columns:
+        years = pd.to_numeric(chunk["index_year"], errors="coerce").round().astype("Int64")
+        years = years.astype(str).where(years.notna(), year_default)
+    else:
+        years = pd.Series(year_default, index=chunk.index)
+    if "index_quarter" in chunk.columns:
+        quarters = chunk["index_quarter"].astype("string").str.strip().str.upper().str.removeprefix("Q")
+        quarters = quarters.replace({"1": "I", "2": "II", "3": "III", "4": "IV", "1.0": "I", "2.0": "II", "3.0": "III", "4.0": "IV"})
+        quarters = quarters.fillna(quarter_default).replace("", quarter_default).astype(str)
+    else:
+        quarters = pd.Series(quarter_default, index=chunk.index)
+    # few distinct (year, quarter) pairs per portfolio: look each up once (unknown ones warn)
+    pairs = pd.Series(list(zip(years, quarters)), index=chunk.index)
+    lookup = {pair: get_index_value(*pair) / INDEX_BASE for pair in pairs.unique()}
+    return pairs.map(lookup).to_numpy(dtype=float)
+
+
+# Codes of --measures or of the measures column; unknown ones are an error (as in service.py),
+# a typo must not silently drop a measure from the package
+def check_codes(codes, where: str = "--measures"):
+    unknown = sorted(set(codes) - set(MEASURE_CODES))
+    if unknown:
+        raise ValueError(f"{where}: unbekannte Maßnahmen {', '.join(unknown)} (Codes: {', '.join(MEASURE_CODES)}).")
+
+
+def _active_mask(chunk: pd.DataFrame, measures) -> np.ndarray:
+    if "measures" in chunk.columns:
+        spec = chunk["measures"].fillna("").astype(str).str.replace(" ", "")
+        use_all = spec.str.lower().eq("all").to_numpy()
+        tokens = spec.where(~use_all, "").str.split(";").tolist()
+        rows = np.repeat(np.arange(len(chunk)), [len(t) for t in tokens])
+        codes = np.array([code for t in tokens for code in t], dtype=object)
+        listed = codes != ""
+        known = np.isin(codes, MEASURE_CODES)
+        if (listed & ~known).any():
+            ids = chunk["building_id"] if "building_id" in chunk.columns else chunk.index.to_series()
+            bad = np.unique(rows[listed & ~known])
+            where = f"Spalte 'measures' (Gebäude {', '.join(map(str, ids.iloc[bad[:5]]))}{' …' if len(bad) > 5 else ''})"
+            check_codes(codes[listed], where)
+        position = {code: j for j, code in enumerate(MEASURE_CODES)}
+        active = np.zeros((len(chunk), len(MEASURE_CODES)), dtype=bool)
+        active[rows[known], [position[code] for code in codes[known]]] = True
+        return active | use_all[:, None]
+    selected = MEASURE_CODES if measures is None else list(measures)
+    return np.broadcast_to(np.isin(MEASURE_CODES, selected), (len(chunk), len(MEASURE_CODES)))
+
+
+def building_inputs(chunk: pd.DataFrame) -> dict:
+    # Vectorized equivalent of the sidebar: all inputs as arrays of shape (N,)
+    d = DEFAULT_INPUTS
+    carrier = chunk["carrier"].fillna(d["carrier"]).astype(str) if "carrier" in chunk.columns else pd.Series(d["carrier"], index=chunk.index)
+    ef_heat_default = carrier.map(lambda c: DEFAULT_EF[CARRIER_EF_KEY.get(c, "erdgas")]).to_numpy(dtype=float)
+    p_heat_default = np.where(carrier.eq("Heizöl").to_numpy(), 0.11, d["p_heat"])
+    area = _column(chunk, "area_m2", d["area_m2"])
+    inputs = {
+        "area_m2": area,
+        "units": _column(chunk, "units", d["units"]),
+        "common_area_m2": _column(chunk, "common_area_m2", np.maximum(0.0, area * 0.1)),
+        "window_ratio": _column(chunk, "window_ratio", d["window_ratio"]),
+        "e_el_kwh": _column(chunk, "e_el_kwh", d["e_el_kwh"]),
+        "e_heat_kwh": _column(chunk, "e_heat_kwh", d["e_heat_kwh"]),
+        "p_el": _column(chunk, "p_el", d["p_el"]),
+        "p_heat": _column(chunk, "p_heat", p_heat_default),
+        "ef_el": _column(chunk, "ef_el", d["ef_el"]),
+        "ef_heat": _column(chunk, "ef_heat", ef_heat_default),
+        "co2_price": _column(chunk, "co2_price", d["co2_price"]),
+        "apply_co2_el": _column(chunk, "apply_co2_el", d["apply_co2_el"]) != 0.0,
+        "apply_co2_heat": _column(chunk, "apply_co2_heat", d["apply_co2_heat"]) != 0.0,
+        "index_factor": _index_factor(chunk),
+        "pv_kwp": _column(chunk, "pv_kwp", d["pv_kwp"]),
+        "pv_yield": _column(chunk, "pv_yield", d["pv_yield"]),
+        "pv_sc": _column(chunk, "pv_sc", d["pv_sc"]),
+        "pv_fit": _column(chunk, "pv_fit", d["pv_fit"]),
+        "flh": _column(chunk, "flh", d["flh"]),
+        "rentable_area_m2": _column(chunk, "rentable_area_m2", area * 0.9),
+        "avg_rent_eur_m2": _column(chunk, "avg_rent_eur_m2", d["avg_rent_eur_m2"]),
+        "umlage_pct_general": _column(chunk, "umlage_pct_general", d["umlage_pct_general"]),
+        "umlage_pct_heating": _column(chunk, "umlage_pct_heating", d["umlage_pct_heating"]),
+        "cap_modernisierung_eur": _column(chunk, "cap_modernisierung_eur", d["cap_modernisierung_eur"]),
+        "cap_low_rent_eur": _column(chunk, "cap_low_rent_eur", d["cap_low_rent_eur"]),
+        "cap_heating_special_eur": _column(chunk, "cap_heating_special_eur", d["cap_heating_special_eur"]),
+    }
+    if "meter_el" in chunk.columns or "meter_heat" in chunk.columns:
+        _apply_meters(chunk, inputs)
+    return inputs
+
+
+# Measured baseline from smart-meter exports (cached per file, see metering.py)
+def _apply_meters(chunk: pd.DataFrame, inputs: dict):
+    el_paths = chunk["meter_el"] if "meter_el" in chunk.columns else pd.Series(None, index=chunk.index)
+    heat_paths = chunk["meter_heat"] if "meter_heat" in chunk.columns else pd.Series(None, index=chunk.index)
+    for key in ("e_el_kwh", "e_heat_kwh", "flh"):
+        inputs[key] = inputs[key].copy()
+    for i, (el_path, heat_path) in enumerate(zip(el_paths, heat_paths)):
+        el_path = el_path if isinstance(el_path, str) and el_path else None
+        heat_path = heat_path if isinstance(heat_path, str) and heat_path else None
+        if el_path or heat_path:
+            for key, value in baseline_from_meters(el_path, heat_path).items():
+                if key in inputs:
+                    inputs[key][i] = value
+
+
+# Default measures table per building; the building's PV parameters apply to the PV rows
+def building_measures(inputs: dict) -> dict:
+    derived = derive_quantities(
+        inputs["area_m2"], inputs["units"], inputs["common_area_m2"], inputs["window_ratio"],
+        inputs["pv_kwp"], inputs["pv_yield"], inputs["e_heat_kwh"], inputs["flh"],
+    )
+    measures = default_measure_arrays(derived)
+    is_pv = kernel_mask(measures, "pv")
+    for key in ("pv_yield", "pv_sc", "pv_fit"):
+        measures[key] = np.where(is_pv, inputs[key][:, None], measures[key])
+    return measures
+
+
+# ------------------------------
+# Evaluation of one chunk (runs in the worker processes)
+# ------------------------------
+def _evaluate(chunk: pd.DataFrame, measures, optimize, budget, economics):
+    with span("building_inputs", rows=len(chunk)):
+        inputs = building_inputs(chunk)
+        measure_arrays = building_measures(inputs)
+    if optimize is None:
+        active = _active_mask(chunk, measures)
+        per_row = {f"active:{code}": active[:, j] for j, code in enumerate(MEASURE_CODES)}
+    else:
+        active = _column(chunk, "budget_eur", np.inf if budget is None else budget)
+        per_row = {"budget_eur": active}
+    with span("cache_lookup"):
+        keys = _row_keys(inputs, per_row, (measures, optimize, economics))
+        entries = [CACHE.get(key) for key in keys]
+    todo = np.array([entry is None for entry in entries], dtype=bool)
+    if todo.any():
+        rows = np.flatnonzero(todo)
+        fresh = _evaluate_rows({key: value[rows] for key, value in inputs.items()}, _take_measures(measure_arrays, rows), active[rows], measures, optimize, economics)
+        for i, entry in zip(rows.tolist(), fresh):
+            CACHE.put(keys[i], entry)
+            entries[i] = entry
+    active = np.stack([entry[0] for entry in entries])
+    names = entries[0][1].split("\t")
+    values = np.stack([entry[2] for entry in entries])
+    ids = chunk["building_id"].to_numpy() if "building_id" in chunk.columns else chunk.index.to_numpy()
+    columns = {"building_id": ids, "measures": [";".join(np.compress(row, MEASURE_CODES)) for row in active]}
+    columns.update(zip(names, values.T))
+    return pd.DataFrame(columns), inputs, measure_arrays, active
+
+
+# Result rows of the buildings not in the cache, one (active, column names, values) entry per
+# building; `selection` is the active mask (N, K) or, with `optimize`, the budget (N,)
+def _evaluate_rows(inputs: dict, measure_arrays: dict, selection: np.ndarray, measures, optimize, economics) -> list:
+    if optimize is None:
+        active = selection
+    else:
+        # best package per building among the --measures candidates (budget column or CLI value)
+        candidates = np.isin(MEASURE_CODES, MEASURE_CODES if measures is None else list(measures))
+        with span("best_packages", objective=optimize):
+            active, _ = best_packages.uncached(inputs, measure_arrays, optimize, selection, candidates)
+    with span("evaluate_scenarios"):
+        evaluated = evaluate_scenarios(inputs, measure_arrays, active[:, None, :])
+    columns = {key: value[:, 0] for key, value in evaluated.items()}
+    if economics is not None:
+        with span("lifecycle"):
+            lc = lifecycle.uncached(inputs, measure_arrays, active[:, None, :], **economics)
+        columns.update({key: lc[key][:, 0] for key in ("npv_eur", "irr", "discounted_payback_y")})
+    values = np.stack([np.asarray(value, dtype=float) for value in columns.values()], axis=-1)
+    names = "\t".join(columns)  # one string: sized and copied by the cache in O(1)
+    return [(row_active, names, row_values) for row_active, row_values in zip(active, values)]
+
+
+# Per-building cache keys: a result row depends only on the building's inputs, its measures
+# (or budget) and the run options. The rows are hashed column-wise by pandas (two 64-bit
+# hashes per row), salted with the code version and the options; repeated buildings and
+# repeated runs are served from CACHE and only the missing rows go through the engine
+def _row_keys(inputs: dict, per_row: dict, options) -> list:
+    salt = canonical_key(CODE_VERSION, "portfolio_row", options)
+    frame = pd.DataFrame({**inputs, **per_row})
+    first = pd.util.hash_pandas_object(frame, index=False).to_numpy().tolist()
+    second = pd.util.hash_pandas_object(frame, index=False, hash_key=ROW_HASH_KEY).to_numpy().tolist()
+    return [f"{salt}-{a:016x}{b:016x}" for a, b in zip(first, second)]
+
+
+# Rows of the per-building measure arrays (N, K); catalog arrays (K,) are shared
+def _take_measures(measure_arrays: dict, rows: np.ndarray) -> dict:
+    return {key: value[rows] if np.ndim(value) == 2 else value for key, value in measure_arrays.items()}
+
+
+def evaluate_chunk(chunk: pd.DataFrame, measures=None, optimize=None, budget=None, economics=None) -> pd.DataFrame:
+    return _evaluate(chunk, measures, optimize, budget, economics)[0]
+
+
+# Results plus the encoded scenarios for ScenarioStore.put_records (see scenario_store.py)
+def evaluate_chunk_records(chunk: pd.DataFrame, measures=None, optimize=None, budget=None, economics=None):
+    df, inputs, measure_arrays, active = _evaluate(chunk, measures, optimize, budget, economics)
+    with span("encode_scenarios"):
+        hashes, payload, codes = encode_scenarios(inputs, measure_arrays, active)
+    results = {key: df[key].to_numpy() for key in RESULT_COLUMNS}
+    return df, (df["building_id"].astype(str).tolist(), hashes, payload, codes, results)
+
+
+# ------------------------------
+# Output
+# ------------------------------
+# CSV chunks are serialized in the worker (header line + body), so the parent process
+# only appends text; Parquet chunks travel as DataFrames. With records=True the encoded
+# scenarios for the store come along: (part, records); with profile=True the worker's
+# spans: (..., events)
+def _process_chunk(chunk: pd.DataFrame, measures, optimize, budget, economics, as_csv: bool, profile: bool = False,
+                   records: bool = False):
+    if profile:
+        return run_profiled(_process_chunk, chunk, measures, optimize, budget, economics, as_csv, False, records)
+    with span("evaluate_chunk", rows=len(chunk)):
+        if records:
+            df, scenario_records = evaluate_chunk_records(chunk, measures, optimize, budget, economics)
+        else:
+            df = evaluate_chunk(chunk, measures, optimize, budget, economics)
+    with span("serialize"):
+        part = (df.to_csv(index=False), len(df)) if as_csv else df
+    return (part, scenario_records) if records else part
+
+
+class ResultWriter:
+    # Appends result chunks to CSV or Parquet without keeping earlier chunks in memory
+    def __init__(self, path: str):
+        self.path = path
+        self.as_csv = not _is_parquet(path)
+        self.rows = 0
+        self._file = open(path, "w", encoding="utf-8", newline="") if self.as_csv else None
+        self._parquet = None
+        self._schema = None
+
+    def write(self, part):
+        with span("write"):
+            self._write(part)
+
+    def _write(self, part):
+        if self.as_csv:
+            text, rows = part
+            if self.rows > 0:
+                text = text.split("\n", 1)[1]  # header only once
+            self._file.write(text)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            part = part.assign(building_id=part["building_id"].astype("string"))
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            if self._parquet is None:
+                # schema fixed by column name, not inferred per chunk: integer ids, all-blank
+                # (null) or all-integer columns of a later chunk still fit the file
+                self._schema = pa.schema([(name, pa.string() if name in TEXT_COLUMNS else pa.float64())
+                                          for name in table.column_names])
+                self._parquet = pq.ParquetWriter(self.path, self._schema)
+            self._parquet.write_table(table.cast(self._schema))
+            rows = len(part)
+        self.rows += rows
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_portfolio(input_path: str, output_path: str, workers=None, chunksize: int = DEFAULT_CHUNKSIZE, measures=None,
+                  optimize=None, budget=None, economics=None, store=None, tag: str = "") -> int:
+    # store: ScenarioStore receiving every chunk's scenarios and results (one transaction per chunk)
+    workers = workers or os.cpu_count() or 1
+    profiler = current()
+    if measures is not None:
+        check_codes(measures)
+
+    def collect(part, from_worker: bool):
+        # spans of the workers are merged into the caller's profiler (see profiling.py)
+        if from_worker and profiler is not None:
+            part, events = part
+            profiler.add_events(events)
+        if store is not None:
+            part, records = part
+            with span("store", rows=len(records[1])):
+                store.put_records(*records, tag=tag)
+        return part
+
+    with ResultWriter(output_path) as writer:
+        if workers == 1:
+            for chunk in read_chunks(input_path, chunksize):
+                part = _process_chunk(chunk, measures, optimize, budget, economics, writer.as_csv, records=store is not None)
+                writer.write(collect(part, False))
+            return writer.rows
+        # results are written in input order; the window bounds memory to 2 chunks per worker
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in read_chunks(input_path, chunksize):
+                pending.append(pool.submit(_process_chunk, chunk, measures, optimize, budget, economics, writer.as_csv,
+                                           profiler is not None, store is not None))
+                if len(pending) >= 2 * workers:
+                    writer.write(collect(pending.popleft().result(), True))
+            while pending:
+                writer.write(collect(pending.popleft().result(), True))
+        return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Portfolio-Batchlauf: Basis-KPIs, Szenario und Umlage je Gebäude.")
+    parser.add_argument("input", help="Gebäudedatei (.csv oder .parquet), eine Zeile je Gebäude")
+    parser.add_argument("output", help="Ergebnisdatei (.csv oder .parquet)")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Gebäude je Block")
+    parser.add_argument("--measures", default=None,
+                        help="Maßnahmen-Codes, kommagetrennt (Standard: Spalte 'measures', sonst alle)")
+    parser.add_argument("--optimize", choices=["co2_savings_t", "savings_eur_pa", "simple_payback_y"], default=None,
+                        help="bestes Paket je Gebäude aus den --measures-Kandidaten (Standard: alle) statt fester Auswahl")
+    parser.add_argument("--budget", type=float, default=None, help="CAPEX-Budget je Gebäude [€] (Spalte 'budget_eur' hat Vorrang)")
+    parser.add_argument("--horizon", type=int, default=0,
+                        help="Lebenszyklus-Auswertung (NPV/IRR) über so viele Jahre, 0 = aus")
+    parser.add_argument("--discount-rate", type=float, default=DEFAULT_ECONOMICS["discount_rate"], help="Kalkulationszins (z. B. 0.04)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Ergebnis-Cache auf Platte (je Gebäude; Wiederholungsläufe überspringen bekannte Gebäude)")
+    parser.add_argument("--store", default=None, help="Szenarien und Ergebnisse zusätzlich in diese SQLite-Datei schreiben")
+    parser.add_argument("--tag", default="", help="Kennzeichnung der Szenarien im Speicher (z. B. Lauf- oder Projektname)")
+    parser.add_argument("--profile", default=None, help="Zeitmessung je Schritt als Chrome-Trace (JSON) in diese Datei schreiben")
+    args = parser.parse_args(argv)
+    if args.cache_dir:
+        configure(disk_dir=args.cache_dir)
+    measures = None if args.measures is None else [c.strip() for c in args.measures.split(",") if c.strip()]
+    if measures is not None:
+        try:
+            check_codes(measures)
+        except ValueError as exc:
+            parser.error(str(exc))
+    economics = {"horizon": args.horizon, "discount_rate": args.discount_rate} if args.horizon > 0 else None
+    store = ScenarioStore(args.store) if args.store else None
+    profiler = Profiler("portfolio") if args.profile else None
+    previous = activate(profiler)
+    try:
+        with span("run_portfolio"):
+            rows = run_portfolio(args.input, args.output, args.workers, args.chunksize, measures, args.optimize, args.budget,
+                                 economics, store, args.tag)
+    finally:
+        activate(previous)
+        if store is not None:
+            store.close()
+    print(f"{rows} Gebäude berechnet → {args.output}")
+    if profiler is not None:
+        profiler.export(args.profile)
+        for row in profiler.summary():
+            print(f"  {row['name']:<20}{row['calls']:>6}x {row['total_ms']:>10.1f} ms (max {row['max_ms']:.1f} ms)")
+        print(f"Trace → {args.profile} (chrome://tracing oder ui.perfetto.dev)")
+
+
+if __name__ == "__main__":
+    main()
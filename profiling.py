@@ -0,0 +1,198 @@
+# profiling.py
+# ------------------------------
+# Timing spans and memory snapshots for Streamlit reruns and headless batch runs
+# Code is instrumented with `with span("simulate"):`, @profiled or sequential stage()
+# marks; the events go to the Profiler activated for the current thread (one per
+# Streamlit session / per batch run). Without an active profiler a hook costs one
+# thread-local lookup, so the instrumentation stays in place.
+# - spans: wall time, nested by time per thread (Chrome-trace "X" events)
+# - memory snapshots: deep size in bytes per key of a mapping, e.g. st.session_state
+#   (Chrome-trace counter events)
+# - worker processes record into their own profiler and hand the events back
+#   (run_profiled), so one trace shows the parent and all workers
+# - per-session footprint: every Streamlit session reports the deep size of its state
+#   and the time to pickle it (record_session); sessions_summary() aggregates the server
+# Export: Chrome trace JSON, viewable in chrome://tracing or https://ui.perfetto.dev
+# ------------------------------
+import contextlib
+import functools
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+
+_local = threading.local()
+_sessions_lock = threading.Lock()
+_sessions = {}  # session id -> last footprint
+SESSION_TTL_S = 1800.0  # sessions without a rerun for this long no longer count
+
+
+# Deep size in bytes: DataFrames incl. object columns, arrays by buffer, containers recursively
+def deep_sizeof(value, _seen=None) -> int:
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if hasattr(value, "memory_usage") and hasattr(value, "columns"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, "nbytes") and hasattr(value, "dtype"):
+        return int(value.nbytes) + sys.getsizeof(value, 0) * (value.base is None)
+    size = sys.getsizeof(value, 64)
+    if isinstance(value, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, seen) for v in value)
+    return size
+
+
+# ------------------------------
+# Profiler
+# ------------------------------
+class Profiler:
+    def __init__(self, name: str = "energyaudit"):
+        self.name = name
+        self.events = []
+        self._stage = None
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args):
+        ts = time.time_ns() // 1000
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._add_span(name, ts, (time.perf_counter_ns() - start) / 1000.0, args)
+
+    def _add_span(self, name: str, ts: int, dur_us: float, args: dict):
+        self.events.append({"name": name, "ph": "X", "ts": ts, "dur": dur_us, "pid": os.getpid(),
+                            "tid": threading.get_ident(), "args": args})
+
+    # Sequential top-level stages without re-indenting a script: stage("b") closes stage "a"
+    def stage(self, name=None):
+        now_ts, now = time.time_ns() // 1000, time.perf_counter_ns()
+        if self._stage is not None:
+            prev_name, ts, start = self._stage
+            self._add_span(prev_name, ts, (now - start) / 1000.0, {"stage": True})
+        self._stage = None if name is None else (name, now_ts, now)
+
+    def snapshot(self, name: str, mapping) -> dict:
+        sizes = {str(key): deep_sizeof(mapping[key]) for key in list(mapping.keys())}
+        self.events.append({"name": f"memory:{name}", "ph": "C", "ts": time.time_ns() // 1000, "pid": os.getpid(),
+                            "tid": threading.get_ident(), "args": sizes})
+        return sizes
+
+    def add_events(self, events):
+        self.events.extend(events)
+
+    # Aggregate per span name, most expensive first (stage spans included)
+    def summary(self) -> list:
+        rows = {}
+        for event in self.events:
+            if event["ph"] != "X":
+                continue
+            row = rows.setdefault(event["name"], {"name": event["name"], "calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            row["calls"] += 1
+            row["total_ms"] += event["dur"] / 1000.0
+            row["max_ms"] = max(row["max_ms"], event["dur"] / 1000.0)
+        for row in rows.values():
+            row["mean_ms"] = row["total_ms"] / row["calls"]
+        return sorted(rows.values(), key=lambda r: -r["total_ms"])
+
+    def chrome_trace(self) -> dict:
+        names = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"{self.name} ({pid})"}}
+                 for pid in sorted({event["pid"] for event in self.events})]
+        return {"traceEvents": names + self.events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, default=str)
+
+
+# ------------------------------
+# Hooks (no-ops without an active profiler)
+# ------------------------------
+def activate(profiler):
+    # profiler for the current thread (None = off); returns the previous one
+    previous = getattr(_local, "profiler", None)
+    _local.profiler = profiler
+    return previous
+
+
+def current():
+    return getattr(_local, "profiler", None)
+
+
+def span(name: str, **args):
+    profiler = getattr(_local, "profiler", None)
+    return contextlib.nullcontext() if profiler is None else profiler.span(name, **args)
+
+
+def stage(name=None):
+    profiler = getattr(_local, "profiler", None)
+    if profiler is not None:
+        profiler.stage(name)
+
+
+def profiled(name=None):
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "profiler", None) is None:
+                return fn(*args, **kwargs)
+            with _local.profiler.span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# For worker processes: fn(*args) under a fresh profiler -> (result, events)
+def run_profiled(fn, *args, **kwargs):
+    profiler = Profiler()
+    previous = activate(profiler)
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        activate(previous)
+    return result, profiler.events
+
+
+# ------------------------------
+# Per-session footprint (all sessions of this server process)
+# ------------------------------
+# Deep size of a session's state and the time / size to pickle it; keys that do not
+# pickle (e.g. uploaded files) are skipped and counted
+def record_session(session_id: str, state) -> dict:
+    keys = list(state.keys())
+    size = sum(deep_sizeof(state[key]) for key in keys)
+    pickled, skipped = 0, 0
+    start = time.perf_counter()
+    for key in keys:
+        try:
+            pickled += len(pickle.dumps(state[key], protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            skipped += 1
+    row = {"bytes": size, "pickle_ms": (time.perf_counter() - start) * 1000.0, "pickle_bytes": pickled,
+           "keys": len(keys), "unpicklable": skipped, "seen": time.time()}
+    with _sessions_lock:
+        _sessions[session_id] = row
+        for stale in [sid for sid, r in _sessions.items() if row["seen"] - r["seen"] > SESSION_TTL_S]:
+            del _sessions[stale]
+    return row
+
+
+def sessions_summary() -> dict:
+    with _sessions_lock:
+        rows = list(_sessions.values())
+    n = len(rows)
+    total = sum(r["bytes"] for r in rows)
+    return {
+        "sessions": n,
+        "total_bytes": total,
+        "mean_bytes": total / n if n else 0.0,
+        "max_bytes": max((r["bytes"] for r in rows), default=0),
+        "mean_pickle_ms": sum(r["pickle_ms"] for r in rows) / n if n else 0.0,
+    }
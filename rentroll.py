@@ -0,0 +1,227 @@
+# rentroll.py
+# ------------------------------
+# Unit-level Umlage (§559 / §559e BGB) from a rent roll (Mieterliste)
+# Replaces the building-level simplification in model.umlage (one average rent, one
+# area, cap / 6 per year) for buildings with a rent roll:
+# - the annual Umlage of each measure step is distributed by living area; per unit it is
+#   a monthly rent increase in €/m²
+# - Kappungsgrenze per unit: cap_low_rent_eur if the unit's rent before the increase is
+#   below 7 €/m², otherwise cap_modernisierung_eur; heating measures (§559e) have their
+#   own cap_heating_special_eur (as in model.umlage, the two pools are kept separate)
+# - caps apply to the sum of increases within any 6 years: earlier modernization
+#   increases from the rent roll and the staged steps (e.g. from the Sanierungsfahrplan)
+#   use up the cap until they leave the rolling window
+# Steps are processed in time order; every step is one array operation over all units,
+# so 50k units x 10 steps take milliseconds.
+#
+# Rent roll columns (CSV/Parquet, one row per unit):
+#   unit_id, building_id (optional), area_m2, rent_eur_m2 (current net cold rent),
+#   increase_<i>_date, increase_<i>_eur_m2, increase_<i>_kind ("559" or "559e", optional)
+# ------------------------------
+import argparse
+import re
+
+import numpy as np
+import pandas as pd
+
+from metering import decimal_mark, parse_decimal
+
+LOW_RENT_THRESHOLD = 7.0  # €/m² monthly rent before the increase (§559 Abs. 3a)
+WINDOW_YEARS = 6.0
+INCREASE_COLUMN = re.compile(r"^increase_(\d+)_(date|eur_m2|kind)$")
+
+
+# ------------------------------
+# Input
+# ------------------------------
+def _numeric(series: pd.Series) -> np.ndarray:
+    if series.dtype == object or pd.api.types.is_string_dtype(series):
+        text = series.astype(str).str.strip()
+        return parse_decimal(text, decimal_mark(text))  # 1.234,5 / 1.234 / 1234.5 as in metering
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+
+
+# Dates (datetime-like, "31.12.2020", "2020-12-31" or years) -> decimal years
+def decimal_years(values) -> np.ndarray:
+    series = pd.Series(values)
+    numeric = pd.to_numeric(series, errors="coerce")
+    if numeric.notna().sum() == series.notna().sum():
+        return numeric.to_numpy(dtype=float)
+    text = series.astype(str)
+    dayfirst = bool(text.str.match(r"^\d{1,2}\.\d{1,2}\.\d{4}").any())
+    ts = pd.to_datetime(series, errors="coerce", dayfirst=dayfirst)
+    days = np.where(ts.dt.is_leap_year, 366.0, 365.0)
+    return (ts.dt.year + (ts.dt.dayofyear - 1) / days).to_numpy(dtype=float)
+
+
+def read_rent_roll(path, by_building: bool = True) -> dict:
+    # by_building=False: all units belong to one building (single-building app view)
+    name = getattr(path, "name", str(path))  # paths or uploaded files
+    df = pd.read_parquet(path) if name.endswith(".parquet") else pd.read_csv(path, sep=None, engine="python", dtype=str)
+    if not by_building:
+        df = df.drop(columns="building_id", errors="ignore")
+    return rent_roll_from_frame(df, name)
+
+
+def rent_roll_from_frame(df: pd.DataFrame, name: str = "Mieterliste") -> dict:
+    missing = [c for c in ("area_m2", "rent_eur_m2") if c not in df.columns]
+    if missing:
+        raise ValueError(f"{name}: Spalte(n) {', '.join(missing)} fehlen.")
+    n = len(df)
+    building = df["building_id"].astype(str) if "building_id" in df.columns else pd.Series("", index=df.index)
+    building_index, buildings = pd.factorize(building)
+    slots = sorted({int(m.group(1)) for m in map(INCREASE_COLUMN.match, df.columns) if m})
+    prior_year = np.full((n, len(slots)), np.nan)
+    prior_eur_m2 = np.zeros((n, len(slots)))
+    prior_heating = np.zeros((n, len(slots)), dtype=bool)
+    for j, i in enumerate(slots):
+        if f"increase_{i}_date" in df.columns:
+            prior_year[:, j] = decimal_years(df[f"increase_{i}_date"])
+        if f"increase_{i}_eur_m2" in df.columns:
+            prior_eur_m2[:, j] = np.nan_to_num(_numeric(df[f"increase_{i}_eur_m2"]))
+        if f"increase_{i}_kind" in df.columns:
+            prior_heating[:, j] = df[f"increase_{i}_kind"].astype(str).str.strip().str.lower().eq("559e").to_numpy()
+    area = np.nan_to_num(_numeric(df["area_m2"]))
+    if (area <= 0.0).any():
+        raise ValueError(f"{name}: {int((area <= 0.0).sum())} Einheiten ohne Wohnfläche.")
+    return {
+        "unit_id": (df["unit_id"].astype(str) if "unit_id" in df.columns else pd.Series(np.arange(n).astype(str))).to_numpy(),
+        "building_index": building_index,
+        "buildings": np.asarray(buildings),
+        "area_m2": area,
+        "rent_eur_m2": np.nan_to_num(_numeric(df["rent_eur_m2"])),
+        "prior_year": prior_year,
+        "prior_eur_m2": prior_eur_m2,
+        "prior_heating": prior_heating,
+    }
+
+
+# ------------------------------
+# Umlage over staged measures
+# ------------------------------
+# Staged steps from a Sanierungsfahrplan (roadmap.plan_roadmap): year, annual Umlage
+# requested for general measures and for the heat pump (§559e)
+def steps_from_plan(plan: pd.DataFrame, umlage_pct_general: float, umlage_pct_heating: float):
+    heating = plan["davon Heizung [€]"].to_numpy(dtype=float)
+    general = plan["CAPEX [€]"].to_numpy(dtype=float) - heating
+    return plan["Jahr"].to_numpy(dtype=float), general * umlage_pct_general, heating * umlage_pct_heating
+
+
+def rent_roll_umlage(roll: dict, step_years, ann_general, ann_heating, cap_modernisierung_eur=3.0, cap_low_rent_eur=2.0,
+                     cap_heating_special_eur=0.5, low_rent_threshold: float = LOW_RENT_THRESHOLD,
+                     window_years: float = WINDOW_YEARS) -> dict:
+    # step_years (S,) decimal years; ann_general / ann_heating: requested annual Umlage [€/a]
+    # per step, (S,) (same for every building) or (S, B) for the roll's buildings
+    # caps: scalars or per unit (U,), in €/m² monthly rent within window_years
+    years = np.atleast_1d(np.asarray(step_years, dtype=float))
+    order = np.argsort(years, kind="stable")
+    years = years[order]
+    s, b = len(years), roll["building_index"]
+    n_buildings = len(roll["buildings"])
+    area = roll["area_m2"]
+    building_area = np.bincount(b, weights=area, minlength=n_buildings)
+
+    def per_m2_month(ann):
+        ann = np.asarray(ann, dtype=float).reshape(s, -1)[order]
+        return (np.broadcast_to(ann, (s, n_buildings)) / np.maximum(building_area, 1e-9) / 12.0)[:, b]
+
+    requested = {"general": per_m2_month(ann_general), "heating": per_m2_month(ann_heating)}
+    granted = {pool: np.zeros_like(value) for pool, value in requested.items()}
+    cap_low = np.asarray(cap_low_rent_eur, dtype=float)
+    cap_normal = np.asarray(cap_modernisierung_eur, dtype=float)
+    cap_heating = np.broadcast_to(np.asarray(cap_heating_special_eur, dtype=float), area.shape)
+    rent = roll["rent_eur_m2"].astype(float)
+    cap_general = np.zeros_like(requested["general"])
+    prior = {"general": np.where(roll["prior_heating"], 0.0, roll["prior_eur_m2"]),
+             "heating": np.where(roll["prior_heating"], roll["prior_eur_m2"], 0.0)}
+    for k in range(s):
+        start = years[k] - window_years
+        prior_in = (roll["prior_year"] > start) & (roll["prior_year"] <= years[k])  # NaN dates: outside
+        steps_in = years[:k] > start
+        cap_general[k] = np.where(rent < low_rent_threshold, cap_low, cap_normal)
+        for pool, cap in (("general", cap_general[k]), ("heating", cap_heating)):
+            used = (prior[pool] * prior_in).sum(axis=1) + granted[pool][:k][steps_in].sum(axis=0)
+            granted[pool][k] = np.clip(np.minimum(requested[pool][k], cap - used), 0.0, None)
+        rent = rent + granted["general"][k] + granted["heating"][k]
+
+    def per_building(per_m2):
+        return np.stack([np.bincount(b, weights=row * area * 12.0, minlength=n_buildings) for row in per_m2])
+
+    ann_general_res = per_building(granted["general"])
+    ann_heating_res = per_building(granted["heating"])
+    capped = (granted["general"] < requested["general"] - 1e-12) | (granted["heating"] < requested["heating"] - 1e-12)
+    return {
+        "years": years,
+        "requested_general_eur_m2": requested["general"],
+        "granted_general_eur_m2": granted["general"],
+        "requested_heating_eur_m2": requested["heating"],
+        "granted_heating_eur_m2": granted["heating"],
+        "cap_general_eur_m2": cap_general,
+        "rent_after_eur_m2": rent,
+        "ann_umlage_general": ann_general_res,
+        "ann_umlage_heating": ann_heating_res,
+        "ann_umlage_total": ann_general_res + ann_heating_res,
+        "capped_units": np.stack([np.bincount(b, weights=row, minlength=n_buildings) for row in capped.astype(float)]),
+    }
+
+
+# Per-unit table of one building (default: first) for display/export
+def unit_table(roll: dict, result: dict, building: int = 0) -> pd.DataFrame:
+    sel = roll["building_index"] == building
+    general = result["granted_general_eur_m2"][:, sel].sum(axis=0)
+    heating = result["granted_heating_eur_m2"][:, sel].sum(axis=0)
+    requested = (result["requested_general_eur_m2"] + result["requested_heating_eur_m2"])[:, sel].sum(axis=0)
+    return pd.DataFrame({
+        "Einheit": roll["unit_id"][sel],
+        "Fläche [m²]": roll["area_m2"][sel],
+        "Miete vorher [€/m²]": roll["rent_eur_m2"][sel],
+        "Erhöhung §559 [€/m²]": general,
+        "Erhöhung §559e [€/m²]": heating,
+        "Gekappt [€/m²]": requested - general - heating,
+        "Miete nachher [€/m²]": result["rent_after_eur_m2"][sel],
+        "Umlage [€/a]": (general + heating) * roll["area_m2"][sel] * 12.0,
+    })
+
+
+# ------------------------------
+# Portfolio: unit-level Umlage for a portfolio.py result file
+# ------------------------------
+# One step in `year` with the buildings' ann_capex_general / ann_capex_heating;
+# buildings of the roll missing in the results get no increase
+def portfolio_umlage(roll: dict, results: pd.DataFrame, year: float, **caps) -> pd.DataFrame:
+    capex = results.assign(building_id=results["building_id"].astype(str)).drop_duplicates("building_id", keep="last")
+    capex = capex.set_index("building_id").reindex(roll["buildings"].astype(str))
+    general = np.nan_to_num(capex["ann_capex_general"].to_numpy(dtype=float))
+    heating = np.nan_to_num(capex["ann_capex_heating"].to_numpy(dtype=float))
+    res = rent_roll_umlage(roll, [year], general[None, :], heating[None, :], **caps)
+    n_units = np.bincount(roll["building_index"], minlength=len(roll["buildings"]))
+    return pd.DataFrame({
+        "building_id": roll["buildings"],
+        "units": n_units,
+        "ann_umlage_general_units": res["ann_umlage_general"][0],
+        "ann_umlage_heating_units": res["ann_umlage_heating"][0],
+        "ann_umlage_total_units": res["ann_umlage_total"][0],
+        "capped_units": res["capped_units"][0].astype(int),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Umlage je Wohneinheit (Mieterliste) für ein Portfolio-Ergebnis.")
+    parser.add_argument("rent_roll", help="Mieterliste (.csv oder .parquet), eine Zeile je Einheit")
+    parser.add_argument("results", help="Ergebnisdatei von portfolio.py (.csv oder .parquet)")
+    parser.add_argument("output", help="Umlage je Gebäude (.csv)")
+    parser.add_argument("--year", type=float, required=True, help="Jahr der Mieterhöhung (z. B. 2026 oder 2026.5)")
+    parser.add_argument("--cap-modernisierung", type=float, default=3.0, help="Kappungsgrenze in 6 Jahren [€/m²·Monat]")
+    parser.add_argument("--cap-low-rent", type=float, default=2.0, help="Kappungsgrenze bei Miete < 7 €/m² [€/m²·Monat]")
+    parser.add_argument("--cap-heating", type=float, default=0.5, help="Kappungsgrenze §559e [€/m²·Monat]")
+    args = parser.parse_args(argv)
+    roll = read_rent_roll(args.rent_roll)
+    results = pd.read_parquet(args.results) if args.results.endswith(".parquet") else pd.read_csv(args.results)
+    out = portfolio_umlage(roll, results, args.year, cap_modernisierung_eur=args.cap_modernisierung,
+                           cap_low_rent_eur=args.cap_low_rent, cap_heating_special_eur=args.cap_heating)
+    out.to_csv(args.output, index=False)
+    print(f"{len(roll['area_m2'])} Einheiten in {len(out)} Gebäuden, {int(out['capped_units'].sum())} gekappt → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
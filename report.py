@@ -0,0 +1,478 @@
+# report.py
+# ------------------------------
+# Portfolio reports: the results view of tab 3 per building as static HTML and XLSX
+# For every building the tab-3 content (metrics, Vorher/Nachher table, energy bar chart,
+# waterfall, Umlage table) is rendered from the portfolio results file, i.e. without
+# simulating again; without --results the chunks go through portfolio.evaluate_chunk
+# (result cache). Chunks are rendered on a process pool and written as they finish:
+# - html/<id>.html per building (Plotly loaded once from html/plotly.min.js)
+# - xlsx/<id>.xlsx per building (needs 'xlsxwriter')
+# - portfolio.xlsx (Übersicht + one row per building) and index.html (portfolio summary)
+# Memory stays bounded by 2 chunks per worker; the portfolio files are streamed too.
+# Figures are not built with plotly.express per building: each process builds the two
+# figures once and only swaps the values (about 300x faster than px.bar / go.Waterfall).
+#
+#   python portfolio.py buildings.csv results.csv
+#   python report.py buildings.csv reports/ --results results.csv --workers 8
+#
+# The table / figure builders below are also used by the app (tab 3).
+# ------------------------------
+import argparse
+import functools
+import html
+import os
+import re
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from portfolio import building_inputs, evaluate_chunk, read_chunks
+from profiling import span
+
+DEFAULT_CHUNKSIZE = 100
+FORMATS = ("html", "xlsx")
+# columns of the portfolio overview (result key -> label)
+SUMMARY_COLUMNS = {
+    "building_id": "Gebäude",
+    "measures": "Maßnahmen",
+    "capex_total": "CAPEX [€]",
+    "Gesamtkosten [€/a]": "Kosten vorher [€/a]",
+    "cost_after_total": "Kosten nachher [€/a]",
+    "savings_eur_pa": "Einsparung [€/a]",
+    "co2_savings_t": "CO₂-Einsparung [t/a]",
+    "ann_umlage_total": "Umlage [€/a]",
+    "simple_payback_y": "Amortisation [a]",
+}
+TOTAL_KEYS = ("capex_total", "Gesamtkosten [€/a]", "cost_after_total", "savings_eur_pa", "co2_savings_t",
+              "ann_umlage_total", "landlord_net_savings")
+
+
+# ------------------------------
+# Tab-3 tables and figures from one result record (keys as in model.evaluate_scenarios)
+# ------------------------------
+def comparison_table(r) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Kategorie": ["Stromkosten", "Heizkosten", "CO₂-Kosten", "Gesamt"],
+        "Vorher [€/a]": [r["Kosten Strom [€/a]"], r["Kosten Heizung [€/a]"], r["CO2-Kosten [€/a]"], r["Gesamtkosten [€/a]"]],
+        "Nachher [€/a]": [r["cost_el_after"], r["cost_heat_after"], r["co2_cost_after"], r["cost_after_total"]]
+    })
+
+
+def energy_table(r) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Energie": ["Strom", "Heizung"],
+        "Vorher": [r["Energie Strom [kWh/a]"], r["Energie Heizung [kWh/a]"]],
+        "Nachher": [r["el_after"], r["heat_after"]]
+    })
+
+
+def waterfall_table(r) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Stufe": ["Baseline-Kosten", "– Einsparungen Energie/CO₂", "+ Umlage (Mieter)", "Gesamt Nachher"],
+        "Wert": [r["Gesamtkosten [€/a]"], -r["savings_eur_pa"], r["ann_umlage_total"], r["cost_after_total"]]
+    })
+
+
+def umlage_table(r, rentable_area_m2: float) -> pd.DataFrame:
+    area = max(1.0, rentable_area_m2)
+    return pd.DataFrame({
+        "Komponente": ["Umlage allg.", "Umlage Heizung", "Umlage gesamt"],
+        "€/a": [r["ann_umlage_general"], r["ann_umlage_heating"], r["ann_umlage_total"]],
+        "€/m²·a": [r["ann_umlage_general"]/area, r["ann_umlage_heating"]/area, r["ann_umlage_total"]/area]
+    })
+
+
+def energy_figure(df_energy: pd.DataFrame):
+    import plotly.express as px
+    return px.bar(df_energy, x="Energie", y=["Vorher", "Nachher"], barmode="group", title="Energieverbrauch [kWh/a]")
+
+
+def waterfall_figure(wf: pd.DataFrame):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Waterfall(
+        name="Kostenwirkung",
+        orientation="v",
+        measure=["absolute", "relative", "relative", "total"],
+        x=wf["Stufe"],
+        y=wf["Wert"],
+        connector={"line": {"color": "rgb(63, 63, 63)"}}
+    ))
+    fig.update_layout(title="Kostenwirkung p.a.", waterfallgap=0.3)
+    return fig
+
+
+# Both figures as plain dicts, built once per process; reports only replace the values
+@functools.lru_cache(maxsize=None)
+def _figure_templates() -> dict:
+    zeros = {"Energie Strom [kWh/a]": 0.0, "Energie Heizung [kWh/a]": 0.0, "el_after": 0.0,
+             "heat_after": 0.0, "Gesamtkosten [€/a]": 0.0, "savings_eur_pa": 0.0, "ann_umlage_total": 0.0,
+             "cost_after_total": 0.0}
+    energy = energy_figure(energy_table(zeros)).to_plotly_json()
+    waterfall = waterfall_figure(waterfall_table(zeros)).to_plotly_json()
+    for fig in (energy, waterfall):
+        for trace in fig["data"]:
+            trace["x"] = [str(x) for x in trace["x"]]
+    return {"energy": energy, "waterfall": waterfall}
+
+
+def report_figures(df_energy: pd.DataFrame, wf: pd.DataFrame) -> dict:
+    templates = _figure_templates()
+    energy = {"data": [dict(trace) for trace in templates["energy"]["data"]], "layout": templates["energy"]["layout"]}
+    for trace, column in zip(energy["data"], ("Vorher", "Nachher")):
+        trace["y"] = [float(v) for v in df_energy[column]]
+    waterfall = {"data": [dict(templates["waterfall"]["data"][0], y=[float(v) for v in wf["Wert"]])],
+                 "layout": templates["waterfall"]["layout"]}
+    return {"energy": energy, "waterfall": waterfall}
+
+
+# ------------------------------
+# Formatting
+# ------------------------------
+def _de(value, digits: int = 0) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "–"
+    if isinstance(value, (float, np.floating)) and np.isinf(value):
+        return "∞"
+    if not isinstance(value, (int, float, np.integer, np.floating)):
+        return str(value)
+    return f"{value:,.{digits}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _html_table(df: pd.DataFrame, digits: int = 0) -> str:
+    return df.to_html(index=False, border=0, classes="table", formatters={
+        col: functools.partial(_de, digits=digits) for col in df.columns if pd.api.types.is_numeric_dtype(df[col])})
+
+
+def safe_name(building_id, position: int) -> str:
+    name = re.sub(r"[^\w.-]+", "_", str(building_id)).strip("._")
+    return name or f"gebaeude_{position}"
+
+
+# File names of a chunk, unique over the whole run: ids that map to a name already used
+# ("B 1" and "B/1", duplicate ids, names differing only in case) get their position appended.
+# `used` (lower-case names) is kept by the parent process across chunks.
+def unique_names(building_ids, start: int, used: set) -> list:
+    names = []
+    for i, building_id in enumerate(building_ids):
+        name = safe_name(building_id, start + i)
+        if name.lower() in used:
+            base = name = f"{name}_{start + i}"
+            n = 1
+            while name.lower() in used:
+                name, n = f"{base}_{n}", n + 1
+        used.add(name.lower())
+        names.append(name)
+    return names
+
+
+def metrics_table(r) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Kennzahl": ["CAPEX gesamt [€]", "Einsparung p.a. [€]", "CO₂-Einsparung [t/a]", "Amortisation (vereinfachte) [a]"],
+        "Wert": [r["capex_total"], r["savings_eur_pa"], r["co2_savings_t"], r["simple_payback_y"]],
+    })
+
+
+def building_tables(r, inputs: dict) -> dict:
+    return {
+        "Kennzahlen": metrics_table(r),
+        "Vorher-Nachher": comparison_table(r),
+        "Energie": energy_table(r),
+        "Waterfall": waterfall_table(r),
+        "Umlage": umlage_table(r, inputs["rentable_area_m2"]),
+    }
+
+
+# ------------------------------
+# One building: HTML and XLSX
+# ------------------------------
+PAGE_STYLE = ("body{font-family:sans-serif;max-width:1000px;margin:2em auto;color:#222}"
+              ".table{border-collapse:collapse;margin:.5em 0 1.5em}.table td,.table th{padding:4px 10px;"
+              "border-bottom:1px solid #ddd;text-align:right}.table td:first-child,.table th:first-child{text-align:left}"
+              ".metrics{display:flex;gap:2em}.metrics div{font-size:1.4em}.metrics small{display:block;font-size:.6em;color:#666}")
+
+
+def building_html(r, inputs: dict, tables: dict) -> str:
+    import plotly.io as pio
+    figures = report_figures(tables["Energie"], tables["Waterfall"])
+    metrics = "".join(f"<div><small>{html.escape(k)}</small>{_de(v, 2 if 'CO₂' in k or 'Amortisation' in k else 0)}</div>"
+                      for k, v in zip(tables["Kennzahlen"]["Kennzahl"], tables["Kennzahlen"]["Wert"]))
+    title = html.escape(f"Energieaudit – {r['building_id']}")
+    return "\n".join([
+        f"<!DOCTYPE html><html lang='de'><head><meta charset='utf-8'><title>{title}</title>",
+        f"<style>{PAGE_STYLE}</style><script src='plotly.min.js'></script></head><body>",
+        f"<h1>{title}</h1><p>Maßnahmen: {html.escape(str(r['measures']) or '–')}</p>",
+        f"<div class='metrics'>{metrics}</div>",
+        "<h2>Kosten &amp; Emissionen – Vorher/Nachher</h2>", _html_table(tables["Vorher-Nachher"]),
+        "<h2>Strom- und Heizenergie – Vorher/Nachher [kWh/a]</h2>",
+        pio.to_html(figures["energy"], include_plotlyjs=False, full_html=False, validate=False),
+        "<h2>Waterfall: Jährliche Netto-Wirkung [€]</h2>",
+        pio.to_html(figures["waterfall"], include_plotlyjs=False, full_html=False, validate=False),
+        "<h2>Detail: Umlage (vereinfachtes Modell)</h2>",
+        f"<p>Allg. Umlage (§559, {inputs['umlage_pct_general']*100:.1f}% p.a.) begrenzt auf {r['annual_cap_per_m2']:.2f} €/m²·a, "
+        f"Heizung (§559e, {inputs['umlage_pct_heating']*100:.1f}% p.a.) begrenzt auf {r['annual_cap_heating_per_m2']:.2f} €/m²·a.</p>",
+        _html_table(tables["Umlage"], 2),
+        "</body></html>",
+    ])
+
+
+def _xlsxwriter():
+    try:
+        import xlsxwriter
+    except ImportError as exc:
+        raise ImportError("XLSX-Berichte benötigen 'xlsxwriter' (pip install xlsxwriter).") from exc
+    return xlsxwriter
+
+
+def _write_sheet(workbook, name: str, df: pd.DataFrame, formats: dict):
+    sheet = workbook.add_worksheet(name)
+    sheet.write_row(0, 0, list(df.columns), formats["header"])
+    for i, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        for j, value in enumerate(row):
+            if isinstance(value, (float, np.floating)) and not np.isfinite(value):
+                sheet.write_string(i, j, "∞" if np.isinf(value) else "–")
+            else:
+                sheet.write(i, j, value, formats["number"] if isinstance(value, (int, float, np.number)) else None)
+    sheet.set_column(0, 0, 30)
+    sheet.set_column(1, len(df.columns) - 1, 16)
+    return sheet
+
+
+def building_xlsx(path: str, r, tables: dict):
+    workbook = _xlsxwriter().Workbook(path, {"in_memory": True})  # small file: no temp files per sheet
+    formats = {"header": workbook.add_format({"bold": True}), "number": workbook.add_format({"num_format": "#,##0.00"})}
+    for name, df in tables.items():
+        sheet = _write_sheet(workbook, name, df, formats)
+        if name == "Energie":
+            chart = workbook.add_chart({"type": "column"})
+            for j, column in enumerate(("Vorher", "Nachher"), start=1):
+                chart.add_series({"name": column, "categories": [name, 1, 0, len(df), 0], "values": [name, 1, j, len(df), j]})
+            chart.set_title({"name": "Energieverbrauch [kWh/a]"})
+            sheet.insert_chart("E2", chart)
+    workbook.close()
+
+
+# ------------------------------
+# One chunk (runs in the worker processes)
+# ------------------------------
+# Result records of the chunk: from the results file (same row order as the buildings file,
+# as written by portfolio.py) or evaluated now; cost_after_total / landlord_net_savings are
+# derived when missing
+def _chunk_results(chunk: pd.DataFrame, results) -> pd.DataFrame:
+    if results is None:
+        results = evaluate_chunk(chunk)
+    elif "building_id" in chunk.columns and len(results) == len(chunk) and not (
+            results["building_id"].astype(str).to_numpy() == chunk["building_id"].astype(str).to_numpy()).all():
+        raise ValueError("Ergebnisdatei passt nicht zur Gebäudedatei (building_id / Reihenfolge abweichend).")
+    elif len(results) != len(chunk):
+        raise ValueError("Ergebnisdatei und Gebäudedatei haben unterschiedlich viele Zeilen.")
+    results = results.reset_index(drop=True)
+    if "cost_after_total" not in results.columns:
+        results["cost_after_total"] = results["cost_el_after"] + results["cost_heat_after"] + results["co2_cost_after"]
+    if "landlord_net_savings" not in results.columns:
+        results["landlord_net_savings"] = results["savings_eur_pa"] + results["ann_umlage_total"]
+    results["measures"] = results["measures"].fillna("").astype(str)
+    return results
+
+
+# names: file names from unique_names (parent process); without, unique within the chunk
+def render_chunk(chunk: pd.DataFrame, results, out_dir: str, formats=FORMATS, start: int = 0, names=None) -> pd.DataFrame:
+    with span("chunk_results", rows=len(chunk)):
+        results = _chunk_results(chunk, results)
+        inputs = building_inputs(chunk)
+    if names is None:
+        names = unique_names(results["building_id"], start, set())
+    for i, (r, name) in enumerate(zip(results.to_dict("records"), names)):
+        b = {key: value[i] for key, value in inputs.items()}
+        tables = building_tables(r, b)
+        if "html" in formats:
+            with span("html"):
+                with open(os.path.join(out_dir, "html", name + ".html"), "w", encoding="utf-8") as f:
+                    f.write(building_html(r, b, tables))
+        if "xlsx" in formats:
+            with span("xlsx"):
+                building_xlsx(os.path.join(out_dir, "xlsx", name + ".xlsx"), r, tables)
+    summary = results[[key for key in SUMMARY_COLUMNS if key in results.columns] + ["landlord_net_savings"]].copy()
+    summary["file"] = names
+    return summary
+
+
+# ------------------------------
+# Portfolio summary (streamed: index.html rows and portfolio.xlsx rows as chunks arrive)
+# ------------------------------
+class PortfolioSummary:
+    def __init__(self, out_dir: str, formats=FORMATS):
+        self.out_dir = out_dir
+        self.formats = formats
+        self.totals = dict.fromkeys(TOTAL_KEYS, 0.0)
+        self.buildings = 0
+        self._rows = open(os.path.join(out_dir, "index.rows.tmp"), "w", encoding="utf-8")
+        self._workbook = None
+        if "xlsx" in formats:
+            # constant_memory: every row is flushed to disk once the next one is written
+            self._workbook = _xlsxwriter().Workbook(os.path.join(out_dir, "portfolio.xlsx"), {"constant_memory": True})
+            self._bold = self._workbook.add_format({"bold": True})
+            self._number = self._workbook.add_format({"num_format": "#,##0.00"})
+            self._overview = self._workbook.add_worksheet("Übersicht")
+            self._sheet = self._workbook.add_worksheet("Gebäude")
+            self._sheet.write_row(0, 0, list(SUMMARY_COLUMNS.values()) + ["Bericht"], self._bold)
+            self._sheet.set_column(0, 1, 24)
+            self._sheet.set_column(2, len(SUMMARY_COLUMNS), 16)
+
+    def add(self, summary: pd.DataFrame):
+        for key in TOTAL_KEYS:
+            if key in summary.columns:
+                self.totals[key] += float(summary[key].sum())
+        lines = []
+        for row in summary.to_dict("records"):
+            self.buildings += 1
+            cells = "".join(f"<td>{html.escape(_de(row.get(key), 2 if key in ('co2_savings_t', 'simple_payback_y') else 0))}</td>"
+                            for key in SUMMARY_COLUMNS)
+            link = f"<a href='html/{row['file']}.html'>HTML</a>" if "html" in self.formats else ""
+            if "xlsx" in self.formats:
+                link += f" <a href='xlsx/{row['file']}.xlsx'>XLSX</a>"
+            lines.append(f"<tr>{cells}<td>{link}</td></tr>")
+            if self._workbook is not None:
+                for j, key in enumerate(SUMMARY_COLUMNS):
+                    value = row.get(key)
+                    if isinstance(value, (float, np.floating)):
+                        if np.isfinite(value):
+                            self._sheet.write_number(self.buildings, j, value, self._number)
+                        else:
+                            self._sheet.write_string(self.buildings, j, "∞" if np.isinf(value) else "–")
+                    else:
+                        self._sheet.write_string(self.buildings, j, "" if value is None else str(value))
+                self._sheet.write_url(self.buildings, len(SUMMARY_COLUMNS), f"external:xlsx/{row['file']}.xlsx", string=row["file"])
+        self._rows.write("\n".join(lines) + "\n")
+
+    def overview(self) -> pd.DataFrame:
+        t = self.totals
+        payback = t["capex_total"] / t["landlord_net_savings"] if t["landlord_net_savings"] > 0 else np.inf
+        return pd.DataFrame({
+            "Kennzahl": ["Gebäude", "CAPEX gesamt [€]", "Kosten vorher [€/a]", "Kosten nachher [€/a]", "Einsparung [€/a]",
+                         "CO₂-Einsparung [t/a]", "Umlage [€/a]", "Amortisation Portfolio (vereinfachte) [a]"],
+            "Wert": [float(self.buildings), t["capex_total"], t["Gesamtkosten [€/a]"], t["cost_after_total"],
+                     t["savings_eur_pa"], t["co2_savings_t"], t["ann_umlage_total"], payback],
+        })
+
+    def close(self):
+        self._rows.close()
+        overview = self.overview()
+        rows_path = os.path.join(self.out_dir, "index.rows.tmp")
+        with open(os.path.join(self.out_dir, "index.html"), "w", encoding="utf-8") as f:
+            f.write("<!DOCTYPE html><html lang='de'><head><meta charset='utf-8'><title>Energieaudit – Portfolio</title>"
+                    f"<style>{PAGE_STYLE} body{{max-width:1400px}}</style></head><body><h1>Energieaudit – Portfolio</h1>\n")
+            digits = [0, 0, 0, 0, 0, 1, 0, 1]
+            f.write(_html_table(overview.assign(Wert=[_de(v, d) for v, d in zip(overview["Wert"], digits)])) + "\n<h2>Gebäude</h2><table class='table'><tr>")
+            f.write("".join(f"<th>{html.escape(label)}</th>" for label in SUMMARY_COLUMNS.values()) + "<th>Bericht</th></tr>\n")
+            with open(rows_path, encoding="utf-8") as rows:
+                shutil.copyfileobj(rows, f)
+            f.write("</table></body></html>\n")
+        os.remove(rows_path)
+        if self._workbook is not None:
+            self._overview.set_column(0, 0, 40)
+            self._overview.set_column(1, 1, 18)
+            self._overview.write_row(0, 0, ["Kennzahl", "Wert"], self._bold)
+            for i, (label, value) in enumerate(zip(overview["Kennzahl"], overview["Wert"]), start=1):
+                self._overview.write_string(i, 0, label)
+                if np.isfinite(value):
+                    self._overview.write_number(i, 1, value, self._number)
+                else:
+                    self._overview.write_string(i, 1, "∞")
+            self._workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ------------------------------
+# Portfolio run
+# ------------------------------
+def _prepare(out_dir: str, formats):
+    os.makedirs(out_dir, exist_ok=True)
+    if "html" in formats:
+        os.makedirs(os.path.join(out_dir, "html"), exist_ok=True)
+        from plotly.offline import get_plotlyjs
+        with open(os.path.join(out_dir, "html", "plotly.min.js"), "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+    if "xlsx" in formats:
+        _xlsxwriter()
+        os.makedirs(os.path.join(out_dir, "xlsx"), exist_ok=True)
+
+
+# Next chunk of the results file; it has to cover the buildings file row for row
+def _next_results(result_chunks, start: int):
+    if result_chunks is None:
+        return None
+    results = next(result_chunks, None)
+    if results is None:
+        raise ValueError(f"Ergebnisdatei hat weniger Zeilen als die Gebäudedatei (endet nach {start} Gebäuden).")
+    return results
+
+
+# Building ids of a chunk as evaluate_chunk / the results file report them
+def _building_ids(chunk: pd.DataFrame, results):
+    if results is not None and "building_id" in results.columns:
+        return results["building_id"].to_numpy()
+    return chunk["building_id"].to_numpy() if "building_id" in chunk.columns else chunk.index.to_numpy()
+
+
+def run_reports(buildings_path: str, out_dir: str, results_path=None, workers=None, chunksize: int = DEFAULT_CHUNKSIZE,
+                formats=FORMATS) -> int:
+    workers = workers or os.cpu_count() or 1
+    formats = tuple(formats)
+    _prepare(out_dir, formats)
+    chunks = read_chunks(buildings_path, chunksize)
+    result_chunks = read_chunks(results_path, chunksize) if results_path else None
+    start = 0
+    used = set()  # file names (lower case) of the whole run, see unique_names
+    with PortfolioSummary(out_dir, formats) as summary:
+        if workers == 1:
+            for chunk in chunks:
+                results = _next_results(result_chunks, start)
+                names = unique_names(_building_ids(chunk, results), start, used)
+                summary.add(render_chunk(chunk, results, out_dir, formats, start, names))
+                start += len(chunk)
+        else:
+            # summaries are added in input order; the window bounds memory to 2 chunks per worker
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    results = _next_results(result_chunks, start)
+                    names = unique_names(_building_ids(chunk, results), start, used)
+                    pending.append(pool.submit(render_chunk, chunk, results, out_dir, formats, start, names))
+                    start += len(chunk)
+                    if len(pending) >= 2 * workers:
+                        summary.add(pending.popleft().result())
+                while pending:
+                    summary.add(pending.popleft().result())
+        if result_chunks is not None and next(result_chunks, None) is not None:
+            raise ValueError(f"Ergebnisdatei hat mehr Zeilen als die Gebäudedatei ({start} Gebäude).")
+        return summary.buildings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Berichte (HTML/XLSX) je Gebäude und Portfolio-Übersicht.")
+    parser.add_argument("buildings", help="Gebäudedatei (.csv oder .parquet) wie für portfolio.py")
+    parser.add_argument("out_dir", help="Ausgabeordner")
+    parser.add_argument("--results", default=None,
+                        help="Ergebnisdatei von portfolio.py (gleiche Reihenfolge); ohne wird je Block gerechnet")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Gebäude je Block")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="html, xlsx oder beides (kommagetrennt)")
+    args = parser.parse_args(argv)
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = sorted(set(formats) - set(FORMATS))
+    if unknown or not formats:
+        parser.error(f"--formats: erlaubt sind {', '.join(FORMATS)}")
+    n = run_reports(args.buildings, args.out_dir, args.results, args.workers, args.chunksize, formats)
+    print(f"{n} Gebäudeberichte → {args.out_dir} (index.html" + (", portfolio.xlsx)" if "xlsx" in formats else ")"))
+
+
+if __name__ == "__main__":
+    main()
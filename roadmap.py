@@ -0,0 +1,141 @@
+# roadmap.py
+# ------------------------------
+# Phased renovation roadmap (Sanierungsfahrplan)
+# Assigns measures to planning years under a per-year budget and maximizes the
+# cumulative CO2 reduction or the NPV. All subsets of the candidate measures are
+# evaluated once (subset-result table); a dynamic program over (year, installed set)
+# then walks all transitions S -> T (S subset of T, 3^a pairs) as array operations.
+# Sequencing: envelope measures (category "Hülle") may not follow the heat pump, and the
+# heat pump is sized on the load left after the measures installed up to its year.
+# Investment costs use BAUPREISINDEX_INST and the extrapolated index for future years.
+# ------------------------------
+import numpy as np
+import pandas as pd
+
+from cache import memoize
+from engine import kernel_mask, measure_terms
+from model import CATALOG, UMLAGE_KEYS, evaluate_scenarios, index_for_year, umlage
+from optimizer import enumerate_selections
+
+MAX_CANDIDATES = 13  # 3^13 = 1.6M transitions per year
+ENVELOPE_CATEGORY = "Hülle"
+
+
+# Envelope rows of the measures at hand: their category (measures_to_arrays, column
+# "Kategorie"); arrays without categories fall back to the default catalog's codes
+def envelope_mask(measures: dict) -> np.ndarray:
+    if "category" in measures:
+        return np.asarray(measures["category"]).astype(str) == ENVELOPE_CATEGORY
+    default = dict(zip(CATALOG["code"].tolist(), CATALOG["category"].tolist()))
+    return np.array([default.get(code) == ENVELOPE_CATEGORY for code in np.asarray(measures["code"]).tolist()], dtype=bool)
+
+
+def _transitions(a: int):
+    # all pairs S subset of T as bitmasks, sorted by T; built one measure at a time
+    # (out / new in T / already in S) so only the two index arrays are ever held
+    s_idx = np.zeros(1, dtype=np.int32)
+    t_idx = np.zeros(1, dtype=np.int32)
+    for i in range(a):
+        bit = 1 << i
+        s_idx = np.concatenate([s_idx, s_idx, s_idx | bit])
+        t_idx = np.concatenate([t_idx, t_idx | bit, t_idx | bit])
+    order = np.argsort(t_idx, kind="stable")
+    return s_idx[order], t_idx[order]
+
+
+@memoize
+def plan_roadmap(inputs: dict, measures: dict, start_year: int, budgets, objective: str = "co2",
+                 horizon: int = 20, discount_rate: float = 0.04, candidates=None, index_growth=None) -> dict:
+    # inputs/measures: one building (scalar inputs); budgets: € per planning year (list/array)
+    # objective: "co2" (cumulative tCO2 over the horizon) or "npv" (discounted landlord net savings - capex)
+    code = np.asarray(measures["code"])
+    budgets = np.asarray(budgets, dtype=float)
+    years = len(budgets)
+    cand = np.flatnonzero(np.ones(len(code), dtype=bool) if candidates is None else np.asarray(candidates, dtype=bool))
+    a = len(cand)
+    if a > MAX_CANDIDATES:
+        raise ValueError(f"Fahrplan-Optimierung für höchstens {MAX_CANDIDATES} Maßnahmen – bitte Kandidaten einschränken.")
+    horizon = max(horizon, years)
+
+    # subset-result table
+    bits = enumerate_selections(a)
+    selections = np.zeros((2 ** a, len(code)), dtype=bool)
+    selections[:, cand] = bits
+    evaluated = evaluate_scenarios(inputs, measures, selections)
+
+    # capex and Umlage base at index 100 per measure; heat pump rows scaled by the remaining
+    # heat factor of T. A transition S -> T adds the rows in T \ S, priced with the index of
+    # its year; the Umlage of a state is capped on the sum along the best path to it.
+    terms = measure_terms({**inputs, "index_factor": 1.0}, measures)
+    is_hp = kernel_mask(measures, "heat_pump")[cand]
+    is_env = envelope_mask(measures)[cand]
+    keep_log = bits @ np.where(is_hp, 0.0, terms["log_heat_keep"][cand])
+    heat_full = bits @ np.where(is_hp, 0.0, terms["heat_full"][cand])
+    sizing = np.where(heat_full > 0, 0.0, np.exp(keep_log))
+    base = {key: (bits @ np.where(is_hp, 0.0, terms[key][cand]), bits @ np.where(is_hp, terms[key][cand], 0.0))
+            for key in ("capex", "ann_capex_general", "ann_capex_heating")}
+    umlage_args = [inputs[key] for key in UMLAGE_KEYS]
+
+    s_idx, t_idx = _transitions(a)
+    new_idx = t_idx & ~s_idx
+    hp_bits = int((is_hp * (1 << np.arange(a))).sum())
+    env_bits = int((is_env * (1 << np.arange(a))).sum())
+    sequence_ok = ~(((s_idx & hp_bits) != 0) & ((new_idx & env_bits) != 0))
+    segment_start = np.flatnonzero(np.r_[True, t_idx[1:] != t_idx[:-1]])
+    segment_len = np.diff(np.r_[segment_start, len(t_idx)])
+    added = {key: (other[new_idx], sizing[t_idx] * hp[new_idx]) for key, (other, hp) in base.items()}
+
+    def state_value(states, ann_general, ann_heating):
+        if objective == "co2":
+            return evaluated["co2_savings_t"][states]
+        return evaluated["savings_eur_pa"][states] + umlage(ann_general, ann_heating, *umlage_args)["ann_umlage_total"]
+
+    weight = np.ones(horizon + 1) if objective == "co2" else (1.0 + discount_rate) ** -np.arange(horizon + 1)
+    best = np.full(2 ** a, -np.inf)
+    best[0] = 0.0
+    ann_general = np.zeros(2 ** a)
+    ann_heating = np.zeros(2 ** a)
+    choice = []
+    for y in range(years):
+        index_y = index_for_year(start_year + y, index_growth) / 100.0
+        cost = (added["capex"][0] + added["capex"][1]) * index_y
+        cost_hp = added["capex"][1] * index_y
+        general = ann_general[s_idx] + (added["ann_capex_general"][0] + added["ann_capex_general"][1]) * index_y
+        heating = ann_heating[s_idx] + (added["ann_capex_heating"][0] + added["ann_capex_heating"][1]) * index_y
+        feasible = sequence_ok & (cost <= budgets[y] + 1e-6)
+        candidate = best[s_idx] + weight[y + 1] * state_value(t_idx, general, heating)
+        if objective != "co2":
+            candidate = candidate - weight[y] * cost  # invested at the start of the year
+        candidate = np.where(feasible, candidate, -np.inf)
+        best = np.maximum.reduceat(candidate, segment_start)
+        # first transition reaching the segment maximum
+        hit = np.flatnonzero(candidate == np.repeat(best, segment_len))
+        first = np.full(2 ** a, -1)
+        first[t_idx[hit[::-1]]] = hit[::-1]
+        ann_general = general[first]
+        ann_heating = heating[first]
+        choice.append((first, cost, cost_hp, general, heating))
+
+    # after the last planning year the final set keeps working until the horizon
+    total = best + weight[years + 1:].sum() * state_value(np.arange(2 ** a), ann_general, ann_heating)
+    final = int(np.argmax(total))
+
+    rows = []
+    state = final
+    for y in range(years - 1, -1, -1):
+        first, cost, cost_hp, general, heating = choice[y]
+        pair = first[state]
+        new = state & ~s_idx[pair]
+        ann_umlage = umlage(general[pair], heating[pair], *umlage_args)["ann_umlage_total"]
+        rows.append({
+            "Jahr": start_year + y,
+            "Neue Maßnahmen": ", ".join(code[cand][(new >> np.arange(a)) & 1 == 1]),
+            "CAPEX [€]": float(cost[pair]),
+            "davon Heizung [€]": float(cost_hp[pair]),
+            "Budget [€]": float(budgets[y]),
+            "CO₂-Einsparung [t/a]": float(evaluated["co2_savings_t"][state]),
+            "Einsparung inkl. Umlage [€/a]": float(evaluated["savings_eur_pa"][state] + ann_umlage),
+        })
+        state = int(s_idx[pair])
+    plan = pd.DataFrame(rows[::-1])
+    return {"plan": plan, "objective": float(total[final]), "final_selection": selections[final]}
@@ -0,0 +1,259 @@
+# scenario_store.py
+# ------------------------------
+# Persistent scenario store (SQLite, standard library only)
+# A scenario = building inputs + measures table (engine arrays) + computed results.
+# Inputs are encoded as one float64 row (fixed key order, see encode_scenarios); the
+# content hash over the layout (encoding version, catalog codes, kernels, parameter keys)
+# + that row identifies the scenario, so identical input sets are stored once and their
+# results are never recomputed. Saved entries (building, tag, name, timestamp) only
+# reference the hash.
+#   inputs    hash -> codes (layout), payload (float64 row)
+#   results   hash -> one REAL column per result key (evaluate_scenarios)
+#   scenarios id, building, created, tag, name, hash   (indexed by building, tag, date)
+# Listing/comparing reads the results columns with one indexed join (hundreds of
+# scenarios in a few ms); portfolio runs write whole chunks in one transaction.
+# ------------------------------
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from engine import BUILDING_KEYS, KERNEL_COLUMN, MEASURE_COLUMNS, PARAM_COLUMNS, PARAM_DEFAULTS, PERCENT_KEYS, kernels_of
+from model import UMLAGE_KEYS, evaluate_scenarios
+
+# next to the other per-user data (metering cache), not in the working directory
+DEFAULT_PATH = os.environ.get("ENERGYAUDIT_STORE") or os.path.join(os.path.expanduser("~"), ".cache", "energyaudit", "scenarios.sqlite")
+INPUT_KEYS = tuple(sorted(set(BUILDING_KEYS) | set(UMLAGE_KEYS)))
+MEASURE_KEYS = ("active",) + tuple(MEASURE_COLUMNS.values())
+# 1: codes + MEASURE_KEYS; 2: layout "2|codes|kernels|param keys", kernel parameters after MEASURE_KEYS
+ENCODING_VERSION = 2
+SCHEMA_VERSION = 2  # PRAGMA user_version; version-1 rows stay readable (decode_payload)
+RESULT_COLUMNS = (
+    "Energie Strom [kWh/a]", "Energie Heizung [kWh/a]", "Kosten Strom [€/a]", "Kosten Heizung [€/a]",
+    "Emissionen Strom [tCO2/a]", "Emissionen Heizung [tCO2/a]", "CO2-Kosten [€/a]", "Gesamtkosten [€/a]",
+    "capex_total", "ann_capex_general", "ann_capex_heating",
+    "el_after", "heat_after", "hp_el_kwh", "pv_self_kwh", "pv_feed_kwh",
+    "cost_el_after", "cost_heat_after", "co2_el_after_t", "co2_heat_after_t", "co2_cost_after",
+    "annual_cap_per_m2", "annual_cap_heating_per_m2", "ann_umlage_general", "ann_umlage_heating", "ann_umlage_total",
+    "cost_after_total", "savings_eur_pa", "co2_savings_t", "landlord_net_savings", "simple_payback_y",
+)
+SQL_VARIABLES = 900  # parameters per IN (...) query
+RESULT_SELECT = ", ".join(f'r."{c}"' for c in RESULT_COLUMNS)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS inputs (hash TEXT PRIMARY KEY, codes TEXT NOT NULL, payload BLOB NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS results (hash TEXT PRIMARY KEY, {", ".join(f'"{c}" REAL' for c in RESULT_COLUMNS)}) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    building TEXT NOT NULL,
+    created TEXT NOT NULL,
+    tag TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT '',
+    hash TEXT NOT NULL,
+    UNIQUE (building, tag, hash)
+);
+CREATE INDEX IF NOT EXISTS scenarios_building ON scenarios (building, created);
+CREATE INDEX IF NOT EXISTS scenarios_tag ON scenarios (tag, created);
+CREATE INDEX IF NOT EXISTS scenarios_created ON scenarios (created);
+"""
+
+
+# ------------------------------
+# Canonical encoding and hash
+# ------------------------------
+# inputs: INPUT_KEYS (scalars or (N,)), measures: engine arrays ((K,) or (N, K)),
+# active: selection (default measures["active"]) -> hashes (N,), payload (N, P), layout.
+# Every registered kernel parameter is encoded (missing ones as PARAM_DEFAULTS), so equal
+# calculations hash equally whether or not the table carries the parameter columns.
+def encode_scenarios(inputs: dict, measures: dict, active=None):
+    code = np.asarray(measures["code"]).astype(str)
+    k = len(code)
+    params = tuple(PARAM_COLUMNS.values())
+    layout = "|".join((str(ENCODING_VERSION), ";".join(code), ";".join(kernels_of(measures).astype(str)), ";".join(params)))
+    building = {key: np.asarray(inputs[key], dtype=float) for key in INPUT_KEYS}
+    per_measure = {key: np.asarray(measures[key], dtype=float) for key in MEASURE_KEYS[1:]}
+    per_measure.update({key: np.asarray(measures.get(key, PARAM_DEFAULTS[key]), dtype=float) for key in params})
+    per_measure["active"] = np.asarray(measures["active"] if active is None else active, dtype=float)
+    shape = np.broadcast_shapes(*(v.shape for v in building.values()), *(v.shape[:-1] for v in per_measure.values() if v.ndim))
+    n = int(np.prod(shape))
+    payload = np.concatenate(
+        [np.broadcast_to(building[key].reshape(-1, 1), (n, 1)) for key in INPUT_KEYS]
+        + [np.broadcast_to(per_measure[key].reshape(-1, k) if per_measure[key].ndim else per_measure[key], (n, k))
+           for key in MEASURE_KEYS + params],
+        axis=1,
+    ) + 0.0  # -0.0 -> 0.0
+    prefix = layout.encode()
+    hashes = [hashlib.blake2b(prefix + row.tobytes(), digest_size=16).hexdigest() for row in payload]
+    return hashes, payload, layout
+
+
+def decode_payload(payload: bytes, layout: str):
+    # payload row -> (inputs dict of floats, measures dict of (K,) arrays); a layout without
+    # version is encoding 1 (codes only: built-in kernels, no parameters)
+    parts = layout.split("|") if "|" in layout else ["1", layout, "", ""]
+    code = np.array(parts[1].split(";"))
+    params = tuple(key for key in parts[3].split(";") if key)
+    k = len(code)
+    row = np.frombuffer(payload, dtype=float)
+    inputs = {key: float(value) for key, value in zip(INPUT_KEYS, row)}
+    keys = MEASURE_KEYS + params
+    rest = row[len(INPUT_KEYS):].reshape(len(keys), k)
+    measures = {"code": code, "active": rest[0] > 0.5}
+    measures["kernel"] = np.array(parts[2].split(";")) if parts[2] else kernels_of(measures)
+    measures.update({key: rest[i + 1].copy() for i, key in enumerate(keys[1:])})
+    return inputs, measures
+
+
+# Stored measures -> measures table as in tab 2, on top of `template` (text columns, row order)
+def measures_table(template, measures: dict):
+    import pandas as pd
+    df = template.copy()
+    position = {code: i for i, code in enumerate(measures["code"])}
+    rows = [position.get(code) for code in df["Code"]]
+    known = np.array([r is not None for r in rows])
+    index = np.array([r or 0 for r in rows])
+    df["Aktiv"] = np.where(known, np.asarray(measures["active"])[index], df["Aktiv"].astype(bool))
+    for column, key in MEASURE_COLUMNS.items():
+        values = np.asarray(measures[key], dtype=float)[index]
+        if key in PERCENT_KEYS:
+            values = np.round(values * 100.0, 10)
+        df[column] = np.where(known, values, df[column]).astype(df[column].dtype)
+    for column, key in PARAM_COLUMNS.items():
+        if column in df.columns and key in measures:
+            values = np.asarray(measures[key], dtype=float)[index]
+            df[column] = np.where(known, values, pd.to_numeric(df[column], errors="coerce"))
+    if KERNEL_COLUMN in df.columns:
+        df[KERNEL_COLUMN] = np.where(known, np.asarray(measures["kernel"]).astype(str)[index], df[KERNEL_COLUMN].astype(str))
+    return df
+
+
+def _take(value, index, shape: tuple) -> np.ndarray:
+    return np.broadcast_to(np.asarray(value), shape)[index]
+
+
+# ------------------------------
+# Store
+# ------------------------------
+class ScenarioStore:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def known(self, hashes) -> set:
+        # hashes that already have stored results
+        found = set()
+        hashes = list(dict.fromkeys(hashes))
+        for start in range(0, len(hashes), SQL_VARIABLES):
+            part = hashes[start:start + SQL_VARIABLES]
+            rows = self.conn.execute(f"SELECT hash FROM results WHERE hash IN ({','.join('?' * len(part))})", part)
+            found.update(h for (h,) in rows)
+        return found
+
+    def put_records(self, building_ids, hashes, payload, layout: str, results: dict, tag: str = "", name: str = ""):
+        # bulk insert of encoded scenarios with their results (one transaction); hashes that
+        # are already stored keep their inputs/results, entries are unique per (building, tag, hash)
+        n = len(hashes)
+        created = time.strftime("%Y-%m-%dT%H:%M:%S")
+        columns = [np.broadcast_to(np.asarray(results[c], dtype=float), (n,)).tolist() for c in RESULT_COLUMNS]
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO inputs VALUES (?, ?, ?)",
+                                  ((h, layout, row.tobytes()) for h, row in zip(hashes, payload)))
+            self.conn.executemany(f"INSERT OR IGNORE INTO results VALUES ({','.join('?' * (len(RESULT_COLUMNS) + 1))})",
+                                  zip(hashes, *columns))
+            self.conn.executemany("INSERT OR IGNORE INTO scenarios (building, created, tag, name, hash) VALUES (?, ?, ?, ?, ?)",
+                                  ((str(b), created, tag or "", name or "", h) for b, h in zip(building_ids, hashes)))
+
+    def save(self, building_ids, inputs: dict, measures: dict, active=None, results=None, tag: str = "", name: str = "") -> list:
+        # Save N scenarios (one building id each); without `results` only hashes that are not
+        # stored yet are evaluated (evaluate_scenarios), known ones are just referenced
+        building_ids = [building_ids] if isinstance(building_ids, str) else list(building_ids)
+        hashes, payload, layout = encode_scenarios(inputs, measures, active)
+        n = len(hashes)
+        if len(building_ids) != n:
+            raise ValueError(f"{len(building_ids)} Gebäude-IDs für {n} Szenarien.")
+        if results is None:
+            known = self.known(hashes)
+            index = np.array([i for i, h in enumerate(hashes) if h not in known], dtype=int)
+            results = {c: np.full(n, np.nan) for c in RESULT_COLUMNS}  # known hashes: ignored on insert
+            if len(index):
+                k = len(np.asarray(measures["code"]))
+                evaluated = evaluate_scenarios(
+                    {key: _take(inputs[key], index, (n,)) for key in INPUT_KEYS},
+                    {key: (value if key in ("code", "kernel", "category") else _take(value, index, (n, k))) for key, value in measures.items()},
+                    _take(measures["active"] if active is None else active, index, (n, k))[:, None, :],
+                )
+                for c in RESULT_COLUMNS:
+                    results[c][index] = evaluated[c][:, 0]
+        self.put_records(building_ids, hashes, payload, layout, results, tag, name)
+        return hashes
+
+    def find(self, building=None, tag=None, since=None, until=None, limit=None):
+        # Saved scenarios with their results, newest first (building/tag: value or list)
+        import pandas as pd
+        where, params = [], []
+        for column, value in (("building", building), ("tag", tag)):
+            if value is not None:
+                values = [value] if isinstance(value, str) else list(value)
+                where.append(f"s.{column} IN ({','.join('?' * len(values))})")
+                params += values
+        if since is not None:
+            where.append("s.created >= ?")
+            params.append(str(since))
+        if until is not None:
+            where.append("s.created <= ?")
+            params.append(str(until))
+        sql = (f"SELECT s.id, s.building, s.created, s.tag, s.name, s.hash, {RESULT_SELECT} "
+               f"FROM scenarios s JOIN results r ON r.hash = s.hash"
+               + (f" WHERE {' AND '.join(where)}" if where else "")
+               + " ORDER BY s.created DESC, s.id DESC" + (f" LIMIT {int(limit)}" if limit else ""))
+        rows = self.conn.execute(sql, params).fetchall()
+        meta = list(zip(*rows)) if rows else [()] * 6
+        values = np.array([row[6:] for row in rows], dtype=float).reshape(len(rows), len(RESULT_COLUMNS))
+        columns = dict(zip(("id", "building", "created", "tag", "name", "hash"), meta))
+        columns.update(zip(RESULT_COLUMNS, values.T))
+        return pd.DataFrame(columns)
+
+    def load(self, scenario_hash: str):
+        # (inputs, measures) of a stored hash
+        row = self.conn.execute("SELECT payload, codes FROM inputs WHERE hash = ?", (scenario_hash,)).fetchone()
+        if row is None:
+            raise KeyError(f"Szenario {scenario_hash} nicht gespeichert.")
+        return decode_payload(row[0], row[1])
+
+    def delete(self, ids):
+        # remove saved entries; inputs/results without any entry are dropped as well
+        ids = [int(i) for i in ids]
+        with self.conn:
+            self.conn.executemany("DELETE FROM scenarios WHERE id = ?", ((i,) for i in ids))
+            self.conn.execute("DELETE FROM results WHERE hash NOT IN (SELECT hash FROM scenarios)")
+            self.conn.execute("DELETE FROM inputs WHERE hash NOT IN (SELECT hash FROM scenarios)")
+
+
+# Side-by-side comparison of saved scenarios (rows of find()): one column per scenario,
+# differences to the reference scenario (position) in the Δ columns
+def compare(frame, columns=RESULT_COLUMNS, reference: int = 0):
+    import pandas as pd
+    labels = [f"{b} · {n or h[:8]}" for b, n, h in zip(frame["building"], frame["name"], frame["hash"])]
+    values = frame[list(columns)].to_numpy(dtype=float).T
+    others = [j for j in range(len(labels)) if j != reference]
+    delta = values[:, others] - values[:, [reference]]
+    return pd.DataFrame(np.concatenate([values, delta], axis=1), index=list(columns),
+                        columns=labels + [f"Δ {labels[j]}" for j in others])
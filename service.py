@@ -0,0 +1,434 @@
+# service.py
+# ------------------------------
+# Local HTTP/JSON calculation service (stdlib only, no Streamlit)
+# ERP/CRM systems post buildings with their measure selection and get baseline KPIs, the
+# simulate() results and the Umlage back, computed by the same vectorized path as the
+# portfolio runner (portfolio.evaluate_chunk).
+# - concurrent requests are collected into micro-batches (up to --max-batch buildings or
+#   --max-wait-ms after the first one) and evaluated as one chunk
+# - batches run on a worker pool (processes, as in portfolio.py); at most 2 batches per
+#   worker are in flight, further requests wait in the queue
+# - every response carries its latency (queue / compute / total); GET /metrics returns
+#   percentiles over the last requests, throughput and batch sizes
+#
+#   python service.py --port 8765 --workers 4
+#   curl -s localhost:8765/simulate -d '{"building_id": "B1", "area_m2": 1800, "measures": ["roof_ins", "pv_system"]}'
+#   python service.py --selftest 5000 --concurrency 64      # load test against an in-process server
+#
+# Endpoints:
+#   POST /simulate   one building (object) or {"buildings": [...]}; fields as the columns of
+#                    portfolio.py (missing ones use the sidebar defaults), "measures" as list
+#                    of codes, "a;b" or "all" (default)
+#   GET  /measures   measure catalog (code, name, kernel)
+#   GET  /metrics    latency and throughput
+#   GET  /health
+# ------------------------------
+import argparse
+import json
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from engine import kernels_of
+from lifecycle import DEFAULT_ECONOMICS
+from model import BAUPREISINDEX_INST, CARRIER_EF_KEY, CATALOG
+from portfolio import MEASURE_CODES, evaluate_chunk
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 256        # buildings per batch
+DEFAULT_MAX_WAIT_MS = 5.0      # wait for further requests after the first one of a batch
+MAX_BUILDINGS = 10_000         # per request
+MAX_BODY_BYTES = 16 * 1024 * 1024
+METRICS_WINDOW = 10_000        # requests kept for the percentiles
+
+NUMERIC_FIELDS = (
+    "area_m2", "units", "common_area_m2", "window_ratio", "e_el_kwh", "e_heat_kwh", "p_el", "p_heat", "ef_el",
+    "ef_heat", "co2_price", "apply_co2_el", "apply_co2_heat", "pv_kwp", "pv_yield", "pv_sc", "pv_fit", "flh",
+    "rentable_area_m2", "avg_rent_eur_m2", "umlage_pct_general", "umlage_pct_heating", "cap_modernisierung_eur",
+    "cap_low_rent_eur", "cap_heating_special_eur",
+)
+TEXT_FIELDS = ("building_id", "carrier", "index_year", "index_quarter", "measures")
+# meter_el / meter_heat (file paths) are not accepted: the service does not read files of the host
+
+
+class RequestError(ValueError):
+    pass
+
+
+# ------------------------------
+# Payload -> portfolio row
+# ------------------------------
+def _row(building, i: int) -> dict:
+    if not isinstance(building, dict):
+        raise RequestError(f"Gebäude {i + 1}: JSON-Objekt erwartet.")
+    unknown = sorted(set(building) - set(NUMERIC_FIELDS) - set(TEXT_FIELDS))
+    if unknown:
+        raise RequestError(f"Gebäude {i + 1}: unbekannte Felder {', '.join(unknown)}.")
+    row = {"building_id": str(building.get("building_id", i))}
+    for field in NUMERIC_FIELDS:
+        value = building.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise RequestError(f"Gebäude {i + 1}: '{field}' muss eine Zahl sein.")
+        row[field] = float(value)
+    carrier = building.get("carrier")
+    if carrier is not None:
+        if carrier not in CARRIER_EF_KEY:
+            raise RequestError(f"Gebäude {i + 1}: 'carrier' muss eines von {', '.join(CARRIER_EF_KEY)} sein.")
+        row["carrier"] = carrier
+    # index keys as in BAUPREISINDEX_INST ("2024", "IV"); unknown ones fall back to the latest quarter
+    year = str(building.get("index_year", max(BAUPREISINDEX_INST)))
+    row["index_year"] = year
+    row["index_quarter"] = str(building.get("index_quarter", list(BAUPREISINDEX_INST.get(year, BAUPREISINDEX_INST[max(BAUPREISINDEX_INST)]))[-1]))
+    measures = building.get("measures", "all")
+    codes = measures.replace(" ", "").split(";") if isinstance(measures, str) else measures
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        raise RequestError(f"Gebäude {i + 1}: 'measures' als Liste von Codes, 'a;b' oder 'all' angeben.")
+    codes = [code for code in codes if code]
+    if codes != ["all"]:
+        unknown = sorted(set(codes) - set(MEASURE_CODES))
+        if unknown:
+            raise RequestError(f"Gebäude {i + 1}: unbekannte Maßnahmen {', '.join(unknown)}.")
+    row["measures"] = ";".join(codes)
+    return row
+
+
+def parse_request(payload) -> list:
+    buildings = payload.get("buildings") if isinstance(payload, dict) and "buildings" in payload else [payload]
+    if not isinstance(buildings, list) or not buildings:
+        raise RequestError("'buildings' muss eine nicht leere Liste sein.")
+    if len(buildings) > MAX_BUILDINGS:
+        raise RequestError(f"höchstens {MAX_BUILDINGS} Gebäude je Anfrage.")
+    return [_row(building, i) for i, building in enumerate(buildings)]
+
+
+def _json_value(value):
+    if isinstance(value, (float, np.floating)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# ------------------------------
+# Evaluation of one batch (runs in the worker processes)
+# ------------------------------
+def evaluate_rows(rows: list, economics=None):
+    start = time.perf_counter()
+    df = evaluate_chunk(pd.DataFrame.from_records(rows), economics=economics)
+    records = [{key: _json_value(value) for key, value in record.items()} for record in df.to_dict("records")]
+    return records, (time.perf_counter() - start) * 1000.0
+
+
+# ------------------------------
+# Latency metrics (all requests of this server)
+# ------------------------------
+class Metrics:
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._requests = deque(maxlen=window)  # (finished, queue_ms, compute_ms, total_ms, buildings)
+        self._batches = deque(maxlen=window)   # buildings per batch
+        self.started = time.time()
+        self.counts = {"requests": 0, "buildings": 0, "batches": 0, "errors": 0}
+
+    def request(self, queue_ms: float, compute_ms: float, total_ms: float, buildings: int):
+        with self._lock:
+            self._requests.append((time.time(), queue_ms, compute_ms, total_ms, buildings))
+            self.counts["requests"] += 1
+            self.counts["buildings"] += buildings
+
+    def batch(self, buildings: int):
+        with self._lock:
+            self._batches.append(buildings)
+            self.counts["batches"] += 1
+
+    def error(self):
+        with self._lock:
+            self.counts["errors"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            requests = np.array(self._requests, dtype=float).reshape(-1, 5)
+            batches = np.array(self._batches, dtype=float)
+            counts = dict(self.counts)
+        out = {**counts, "uptime_s": time.time() - self.started, "window": len(requests)}
+        if len(requests):
+            for i, name in ((1, "queue_ms"), (2, "compute_ms"), (3, "total_ms")):
+                p50, p95, p99 = np.percentile(requests[:, i], [50.0, 95.0, 99.0])
+                out[name] = {"p50": p50, "p95": p95, "p99": p99, "max": requests[:, i].max()}
+            # throughput over the last minute of the window
+            recent = requests[requests[:, 0] >= time.time() - 60.0]
+            span_s = max(time.time() - recent[0, 0], 1e-3) if len(recent) else 1.0
+            out["requests_per_s"] = len(recent) / span_s if len(recent) > 1 else 0.0
+            out["buildings_per_s"] = recent[:, 4].sum() / span_s if len(recent) > 1 else 0.0
+        if len(batches):
+            out["batch_size"] = {"mean": batches.mean(), "max": batches.max()}
+        return json.loads(json.dumps(out, default=float))
+
+
+# ------------------------------
+# Micro-batching
+# ------------------------------
+class MicroBatcher:
+    # Collects submitted rows into batches and evaluates them on the pool; submit() returns
+    # a Future with (records, timing) for the caller's rows
+    def __init__(self, workers=None, max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 economics=None, metrics=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.economics = economics
+        self.metrics = metrics or Metrics()
+        # one process per worker; with a single worker a thread avoids the pickling round trip
+        self.pool = ProcessPoolExecutor(self.workers) if self.workers > 1 else ThreadPoolExecutor(1)
+        self._in_flight = threading.BoundedSemaphore(2 * self.workers)
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._dispatch, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows: list) -> Future:
+        if self._closed:
+            raise RuntimeError("Dienst wird beendet.")
+        future = Future()
+        self._queue.put((rows, future, time.perf_counter()))
+        return future
+
+    def _collect(self) -> list:
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch, size = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait_s
+        while size < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0.0))
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # stop after this batch
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _dispatch(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            self._in_flight.acquire()
+            started = time.perf_counter()
+            rows = [row for item_rows, _, _ in batch for row in item_rows]
+            self.metrics.batch(len(rows))
+            try:
+                task = self.pool.submit(evaluate_rows, rows, self.economics)
+            except RuntimeError as exc:  # pool shut down
+                self._in_flight.release()
+                self._fail(batch, exc)
+                continue
+            task.add_done_callback(lambda done, batch=batch, started=started: self._finish(done, batch, started))
+
+    def _finish(self, done: Future, batch: list, started: float):
+        self._in_flight.release()
+        try:
+            records, compute_ms = done.result()
+        except Exception as exc:
+            self._fail(batch, exc)
+            return
+        finished = time.perf_counter()
+        offset = 0
+        for rows, future, submitted in batch:
+            timing = {
+                "queue_ms": (started - submitted) * 1000.0,
+                "compute_ms": compute_ms,
+                "total_ms": (finished - submitted) * 1000.0,
+                "batch_size": len(records),
+            }
+            future.set_result((records[offset:offset + len(rows)], timing))
+            offset += len(rows)
+
+    def _fail(self, batch: list, exc: Exception):
+        for _, future, _ in batch:
+            self.metrics.error()
+            future.set_exception(exc)
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self.pool.shutdown(wait=True)
+
+
+# ------------------------------
+# HTTP
+# ------------------------------
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: clients reuse their connection
+    server_version = "energyaudit"
+    batcher = None
+    verbose = False
+
+    def _send(self, status: int, body: dict, timing=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if timing is not None:
+            self.send_header("Server-Timing", ", ".join(f"{key[:-3]};dur={timing[key]:.2f}" for key in ("queue_ms", "compute_ms", "total_ms")))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "workers": self.batcher.workers})
+        elif self.path == "/metrics":
+            self._send(200, self.batcher.metrics.snapshot())
+        elif self.path == "/measures":
+            kernels = kernels_of(CATALOG).tolist()
+            self._send(200, {"measures": [{"code": code, "name": name, "kernel": kernel}
+                                          for code, name, kernel in zip(MEASURE_CODES, CATALOG["name"].tolist(), kernels)]})
+        else:
+            self._send(404, {"error": f"unbekannter Pfad {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/simulate":
+            self._send(404, {"error": f"unbekannter Pfad {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send(413, {"error": f"Anfrage größer als {MAX_BODY_BYTES // (1024 * 1024)} MB."})
+            return
+        try:
+            rows = parse_request(json.loads(self.rfile.read(length) or b"null"))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self.batcher.metrics.error()
+            self._send(400, {"error": "ungültiges JSON."})
+            return
+        except RequestError as exc:
+            self.batcher.metrics.error()
+            self._send(400, {"error": str(exc)})
+            return
+        try:
+            results, timing = self.batcher.submit(rows).result()
+        except Exception as exc:
+            self._send(500, {"error": f"Berechnung fehlgeschlagen: {exc}"})
+            return
+        self.batcher.metrics.request(timing["queue_ms"], timing["compute_ms"], timing["total_ms"], len(rows))
+        self._send(200, {"results": results, "timing": timing}, timing)
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog for bursts of new connections
+
+
+def make_server(host: str = "127.0.0.1", port: int = DEFAULT_PORT, batcher=None, verbose: bool = False) -> ServiceServer:
+    handler = type("Handler", (ServiceHandler,), {"batcher": batcher or MicroBatcher(), "verbose": verbose})
+    return ServiceServer((host, port), handler)
+
+
+# ------------------------------
+# Load test (client side)
+# ------------------------------
+def _random_payloads(n: int, seed: int = 0) -> list:
+    from benchmark import synthetic_portfolio
+    df = synthetic_portfolio(n, seed)
+    return [{key: _json_value(value) for key, value in record.items()} for record in df.to_dict("records")]
+
+
+def load_test(host: str, port: int, n_requests: int, concurrency: int = 32) -> dict:
+    import http.client
+    payloads = [json.dumps(p).encode("utf-8") for p in _random_payloads(n_requests)]
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+
+    def client():
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        own = []
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/simulate", payloads[i], {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()  # reconnects on the next request
+                ok = False
+            if not ok:
+                with lock:
+                    errors[0] += 1
+                continue
+            own.append((time.perf_counter() - start) * 1000.0)
+        conn.close()
+        with lock:
+            latencies.extend(own)
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50.0, 95.0, 99.0])
+    return {"requests": n_requests, "errors": errors[0], "seconds": elapsed, "requests_per_s": n_requests / elapsed,
+            "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokaler Rechendienst (HTTP/JSON) für Basis-KPIs, Szenario und Umlage.")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresse (Standard: nur lokal)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Gebäude je Batch")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="Wartezeit auf weitere Anfragen nach der ersten eines Batches")
+    parser.add_argument("--horizon", type=int, default=0, help="Lebenszyklus-Auswertung (NPV/IRR) über so viele Jahre, 0 = aus")
+    parser.add_argument("--discount-rate", type=float, default=DEFAULT_ECONOMICS["discount_rate"], help="Kalkulationszins (z. B. 0.04)")
+    parser.add_argument("--selftest", type=int, default=0, metavar="N",
+                        help="Lasttest: N Anfragen an einen Dienst in diesem Prozess senden und beenden")
+    parser.add_argument("--concurrency", type=int, default=32, help="parallele Clients im Lasttest")
+    parser.add_argument("--verbose", action="store_true", help="jede Anfrage protokollieren")
+    args = parser.parse_args(argv)
+    economics = {"horizon": args.horizon, "discount_rate": args.discount_rate} if args.horizon > 0 else None
+    batcher = MicroBatcher(args.workers, args.max_batch, args.max_wait_ms, economics)
+    server = make_server(args.host, 0 if args.selftest else args.port, batcher, args.verbose)
+    host, port = server.server_address[:2]
+    try:
+        if args.selftest:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            result = load_test(host, port, args.selftest, args.concurrency)
+            print(f"{result['requests']} Anfragen in {result['seconds']:.2f} s → {result['requests_per_s']:.0f}/s, "
+                  f"Latenz p50 {result['p50_ms']:.1f} ms / p95 {result['p95_ms']:.1f} ms / p99 {result['p99_ms']:.1f} ms, "
+                  f"{result['errors']} Fehler")
+            print(json.dumps(batcher.metrics.snapshot(), indent=1))
+            return
+        print(f"Rechendienst auf http://{host}:{port} ({batcher.workers} Worker, Batch ≤ {args.max_batch} Gebäude / "
+              f"{args.max_wait_ms:g} ms) – Strg+C beendet")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# sweep.py
+# ------------------------------
+# Parameter sweeps and break-even solver
+# N-dimensional grids over numeric inputs, evaluated in one vectorized call: every grid
+# point is one engine case, axis i of the grid is axis i of the results (a 200 x 200 grid
+# of prices is one simulate_batch call with 40k cases).
+#
+# axes: {"p_heat": np.linspace(0.06, 0.24, 200),          # building input
+#        "co2_price": np.linspace(0.0, 250.0, 200),
+#        "heat_pump_aw.hp_scop": [2.5, 3.0, 3.5],         # measure code . engine key
+#        "*.heat_pct": [0.8, 1.0, 1.2]}                   # factor on every measure's value
+# Values are in engine units (fractions), as in montecarlo.py.
+#
+# break_even() finds, per point of the remaining axes, the value of one parameter where a
+# metric crosses a target (payback = 10 a, NPV = 0, ...) by vectorized bisection; the
+# metric has to be monotonic in that parameter within [low, high].
+# ------------------------------
+import math
+
+import numpy as np
+
+from engine import measure_terms
+from lifecycle import DEFAULT_ECONOMICS, cash_flows, discounted_payback, npv
+from model import evaluate_scenarios
+
+METRICS = {
+    "simple_payback_y": "Amortisation (vereinfachte) [a]",
+    "savings_eur_pa": "Einsparung p.a. [€]",
+    "co2_savings_t": "CO₂-Einsparung [t/a]",
+    "landlord_net_savings": "Netto-Vorteil Vermieter p.a. [€]",
+    "npv_eur": "Kapitalwert (NPV) [€]",
+    "discounted_payback_y": "Amortisation (dynamisch) [a]",
+}
+LIFECYCLE_METRICS = ("npv_eur", "discounted_payback_y")
+
+
+# Inputs / measures with parameter `name` set to `values` (already shaped to the case shape)
+def _with_parameter(inputs: dict, measures: dict, name: str, values: np.ndarray):
+    if "." not in name:
+        inputs[name] = values
+        return
+    code, key = name.split(".", 1)
+    codes = list(measures["code"])
+    current = np.asarray(measures[key], dtype=float)
+    column = np.array(np.broadcast_to(current, np.broadcast_shapes(current.shape, values.shape + (len(codes),))), dtype=float)
+    if code == "*":
+        column *= values[..., None]
+    else:
+        column[..., codes.index(code)] = values
+    measures[key] = column
+
+
+def _cases(inputs: dict, measures: dict, parameters: dict):
+    # parameters: name -> values broadcastable to the case shape
+    inputs = dict(inputs)
+    measures = dict(measures)
+    for name, values in parameters.items():
+        _with_parameter(inputs, measures, name, np.asarray(values, dtype=float))
+    shape = np.broadcast_shapes(*(np.shape(values) for values in parameters.values()))
+    inputs = {key: np.broadcast_to(value, shape) if np.ndim(value) <= len(shape) else value for key, value in inputs.items()}
+    return inputs, measures
+
+
+def evaluate_metrics(inputs: dict, measures: dict, parameters: dict, active=None, metrics=("simple_payback_y",),
+                     **economics) -> dict:
+    active = np.asarray(measures["active"] if active is None else active, dtype=bool)
+    inputs, measures = _cases(inputs, measures, parameters)
+    evaluated = evaluate_scenarios(inputs, measures, active)
+    out = {key: evaluated[key] for key in metrics if key not in LIFECYCLE_METRICS}
+    if any(key in LIFECYCLE_METRICS for key in metrics):
+        econ = {**DEFAULT_ECONOMICS, **economics}
+        flows = cash_flows(evaluated, inputs, measure_terms(inputs, measures)["capex"], active, measures["lifetime_y"], **econ)
+        if "npv_eur" in metrics:
+            out["npv_eur"] = npv(flows, econ["discount_rate"])
+        if "discounted_payback_y" in metrics:
+            out["discounted_payback_y"] = discounted_payback(flows, econ["discount_rate"])
+    return out
+
+
+# Full grid: results of shape (len(axis 1), len(axis 2), ...) per metric
+def sweep(inputs: dict, measures: dict, axes: dict, active=None, metrics=("simple_payback_y",), **economics) -> dict:
+    n = len(axes)
+    grid = {name: np.reshape(np.asarray(values, dtype=float), [-1 if i == j else 1 for j in range(n)])
+            for i, (name, values) in enumerate(axes.items())}
+    return evaluate_metrics(inputs, measures, grid, active, metrics, **economics)
+
+
+# Value of `name` in [low, high] where `metric` equals `target`, for every point of `axes`
+# (scalar without axes); NaN where the metric does not cross the target within the bounds
+def break_even(inputs: dict, measures: dict, name: str, low: float, high: float, target: float = 0.0,
+               metric: str = "npv_eur", axes=None, active=None, xtol: float = 1e-6, **economics) -> np.ndarray:
+    axes = axes or {}
+    n = len(axes)
+    grid = {key: np.reshape(np.asarray(values, dtype=float), [-1 if i == j else 1 for j in range(n)])
+            for i, (key, values) in enumerate(axes.items())}
+    shape = np.broadcast_shapes(*(np.shape(values) for values in grid.values())) if grid else ()
+
+    def f(x):
+        return evaluate_metrics(inputs, measures, {**grid, name: x}, active, (metric,), **economics)[metric] - target
+
+    lo = np.full(shape, float(low))
+    hi = np.full(shape, float(high))
+    f_lo = f(lo)
+    valid = np.sign(f_lo) != np.sign(f(hi))
+    iterations = max(1, math.ceil(math.log2(max(abs(high - low), xtol) / xtol)))
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        f_mid = f(mid)
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+    return np.where(valid, 0.5 * (lo + hi), np.nan)
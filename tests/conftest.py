@@ -0,0 +1,50 @@
+# conftest.py
+# ------------------------------
+# Shared fixtures: the flat modules of the repository root on sys.path, one building as
+# portfolio.building_inputs reads it, its measures table as in tab 2 (model.build_measures_df)
+# and the extended catalog of benchmark.py (solar thermal, facade PV as a second PV row,
+# heat network)
+# ------------------------------
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import extended_catalog  # noqa: E402
+from engine import measures_to_arrays  # noqa: E402
+from model import build_measures_df, derive_quantities  # noqa: E402
+from portfolio import building_inputs  # noqa: E402
+
+BUILDING = {"building_id": "B1", "area_m2": 2500.0, "units": 40, "e_el_kwh": 120000.0, "e_heat_kwh": 450000.0,
+            "pv_kwp": 60.0, "co2_price": 55.0, "apply_co2_heat": True}
+
+
+def measures_table(building: dict, catalog=None) -> pd.DataFrame:
+    derived = derive_quantities(building["area_m2"], building["units"], building["common_area_m2"], building["window_ratio"],
+                                building["pv_kwp"], building["pv_yield"], building["e_heat_kwh"], building["flh"])
+    return build_measures_df(derived, building["pv_yield"], building["pv_sc"], building["pv_fit"], catalog)
+
+
+@pytest.fixture
+def building() -> dict:
+    inputs = building_inputs(pd.DataFrame([BUILDING]))
+    return {key: value[0].item() if isinstance(value, np.ndarray) else value for key, value in inputs.items()}
+
+
+@pytest.fixture
+def catalog() -> dict:
+    return extended_catalog()
+
+
+@pytest.fixture
+def measures_df(building, catalog) -> pd.DataFrame:
+    return measures_table(building, catalog)
+
+
+@pytest.fixture
+def measures(measures_df) -> dict:
+    return measures_to_arrays(measures_df)
@@ -0,0 +1,32 @@
+# test_app.py
+# ------------------------------
+# First paint of the Streamlit app (AppTest): no exception, and plotly.express is only
+# loaded once the results view is shown (Streamlit itself already imports plotly.graph_objects)
+# ------------------------------
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = """
+import sys
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app_corrected_fully_cleaned.py", default_timeout=120)
+at.run()
+assert not at.exception, at.exception
+print("plotly.express" in sys.modules)
+at.radio(key="view").set_value("3) Ergebnisse & Szenarien")
+at.run()
+assert not at.exception, at.exception
+print("plotly.express" in sys.modules)
+"""
+
+
+def test_plotly_only_for_the_results_view():
+    out = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.split() == ["False", "True"]
@@ -0,0 +1,56 @@
+# test_attribution.py
+# ------------------------------
+# Shapley values from the subset table (efficiency, additive game), leave-one-out deltas
+# and the permutation estimate against the exact values
+# ------------------------------
+import numpy as np
+import pytest
+
+import attribution
+from attribution import VALUES, attribute, shapley_from_table
+from model import evaluate_scenarios
+
+ACTIVE = ("roof_ins", "windows_triple", "heat_pump_aw", "pv_system", "led_lighting")
+
+
+@pytest.fixture
+def active(measures):
+    return np.isin(measures["code"], ACTIVE)
+
+
+def test_additive_game_gives_the_own_values():
+    own = np.array([3.0, -1.0, 5.0])
+    bits = (np.arange(8)[:, None] >> np.arange(3)) & 1
+    shapley, loo = shapley_from_table((bits @ own)[:, None], 3)
+    np.testing.assert_allclose(shapley[:, 0], own)
+    np.testing.assert_allclose(loo[:, 0], own)
+
+
+def test_shapley_values_add_up_to_the_package(building, measures, active):
+    df = attribute.uncached(building, measures, active)
+    assert set(df["Code"]) == set(ACTIVE)
+    package = evaluate_scenarios(building, measures, active)
+    for key, unit in VALUES.items():
+        assert df[f"Shapley [{unit}]"].sum() == pytest.approx(float(package[key]), rel=1e-9)
+
+
+def test_leave_one_out_matches_direct_evaluation(building, measures, active):
+    df = attribute.uncached(building, measures, active).set_index("Code")
+    full = float(evaluate_scenarios(building, measures, active)["savings_eur_pa"])
+    for code in ACTIVE:
+        without = active & (measures["code"] != code)
+        delta = full - float(evaluate_scenarios(building, measures, without)["savings_eur_pa"])
+        assert df.loc[code, "Leave-one-out [€/a]"] == pytest.approx(delta, rel=1e-9, abs=1e-6)
+
+
+def test_sampled_estimate_is_close_to_exact(building, measures, active, monkeypatch):
+    exact = attribute.uncached(building, measures, active)
+    monkeypatch.setattr(attribution, "MAX_EXACT", 2)
+    sampled = attribute.uncached(building, measures, active, seed=1)
+    scale = exact["Shapley [€/a]"].abs().sum()
+    np.testing.assert_allclose(sampled["Shapley [€/a]"], exact["Shapley [€/a]"], atol=0.02 * scale)
+    np.testing.assert_allclose(sampled["Leave-one-out [€/a]"], exact["Leave-one-out [€/a]"], rtol=1e-9)
+
+
+def test_no_active_measures(building, measures):
+    assert attribute.uncached(building, measures, np.zeros(len(measures["code"]), dtype=bool)).empty
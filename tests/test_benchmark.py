@@ -0,0 +1,54 @@
+# test_benchmark.py
+# ------------------------------
+# Equivalence check against the row-by-row reference (incl. savings of 100 %) and the
+# regression comparison of benchmark runs
+# ------------------------------
+import numpy as np
+import pytest
+
+from benchmark import CO2_KEYS, EURO_KEYS, check_equivalence, compare, reference_simulate
+from engine import CODE_LED
+from model import CATALOG, simulate
+
+
+def test_equivalence_check_passes():
+    report = check_equivalence(300, seed=3)
+    assert report["passed"], report["max_abs_diff"]
+    assert report["cases"] == 300
+
+
+@pytest.mark.parametrize("column, codes", [
+    ("Einsparung Heizung [%]", ("roof_ins",)),
+    ("Einsparung Heizung [%]", ("roof_ins", "wall_wdvs")),
+    ("Einsparung Strom [%]", ("pump_vfd",)),
+])
+def test_full_savings_match_reference(building, measures_df, column, codes):
+    # 100 % (the editor's maximum) zeroes the factor: engine heat_full / el_full vs. 1 - 1.0
+    df = measures_df[measures_df["Code"].isin(CATALOG["code"])].copy()
+    df["Aktiv"] = df["Code"].isin(codes + ("windows_triple", "heat_pump_aw"))
+    df.loc[df["Code"].isin(codes), column] = 100.0
+    reference = reference_simulate(building, df)
+    result = simulate(building, df)
+    for key in EURO_KEYS + CO2_KEYS + ("el_after", "heat_after"):
+        assert result[key] == pytest.approx(reference[key], rel=1e-9, abs=1e-6), key
+    if column == "Einsparung Heizung [%]":
+        assert reference["heat_after"] == 0.0
+
+
+def test_full_led_reduction_matches_reference(building, measures_df):
+    df = measures_df[measures_df["Code"].isin(CATALOG["code"])].copy()
+    df["Aktiv"] = df["Code"].eq(CODE_LED)
+    df.loc[df["Code"].eq(CODE_LED), ["Stromanteil für LED [% vom Strom]", "LED-Reduktion [% dieses Anteils]"]] = 100.0
+    reference = reference_simulate(building, df)
+    assert reference["el_after"] == 0.0
+    assert simulate(building, df)["el_after"] == pytest.approx(0.0)
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"benchmarks": {"a": {"median_ms": 10.0}, "b": {"median_ms": 0.01}, "c": {"median_ms": 5.0}}}
+    current = {"benchmarks": {"a": {"median_ms": 13.0}, "b": {"median_ms": 0.03}, "c": {"median_ms": 5.5},
+                              "new": {"median_ms": 1.0}}}
+    regressions = compare(current, baseline, threshold=1.25)
+    assert [r["name"] for r in regressions] == ["a"]  # b: below timer noise, c: within threshold
+    assert regressions[0]["ratio"] == pytest.approx(1.3)
+    assert np.isfinite(regressions[0]["baseline_ms"])
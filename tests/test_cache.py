@@ -0,0 +1,82 @@
+# test_cache.py
+# ------------------------------
+# Canonical keys, memoize (copies, counters), the byte-bounded LRU, the disk tier with its
+# pruning and counters under concurrent lookups
+# ------------------------------
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cache import CACHE, ResultCache, canonical_key, memoize
+
+
+def test_canonical_key():
+    a = {"x": 1.0, "y": np.arange(3)}
+    assert canonical_key(a) == canonical_key({"y": np.arange(3), "x": 1.0})
+    assert canonical_key(a) != canonical_key({"x": 1.0, "y": np.arange(3.0)})  # dtype counts
+    assert canonical_key(a) != canonical_key({"x": 1, "y": np.arange(3)})  # int vs float
+    df = pd.DataFrame({"Code": ["a", "b"], "Menge": [1.0, 2.0]})
+    assert canonical_key(df) != canonical_key(df.assign(Menge=[1.0, 3.0]))
+
+
+def test_memoize_returns_independent_copies():
+    calls = []
+
+    @memoize
+    def square(values):
+        calls.append(1)
+        return {"sq": values ** 2}
+
+    CACHE.clear()
+    before = dict(CACHE.counters)
+    first = square(np.arange(4.0))
+    first["sq"][0] = 99.0
+    second = square(np.arange(4.0))
+    assert len(calls) == 1
+    assert second["sq"][0] == 0.0
+    assert CACHE.counters["hits"] - before["hits"] == 1
+    assert CACHE.counters["misses"] - before["misses"] == 1
+
+
+def test_lru_is_bounded_in_bytes():
+    cache = ResultCache(memory_mb=1.0)
+    for i in range(5):
+        cache.put(str(i), np.zeros(40_000))  # 320 kB each
+    assert cache.stats()["memory_mb"] <= 1.0
+    assert cache.get("0") is None and cache.get("4") is not None
+    assert cache.counters["evictions"] == 2
+
+
+def test_disk_tier_and_pruning(tmp_path):
+    writer = ResultCache(disk_dir=str(tmp_path), disk_mb=0.5)
+    for i in range(10):
+        writer.put(str(i), np.full(10_000, float(i)))  # ~80 kB on disk each
+    size = sum(p.stat().st_size for p in tmp_path.glob("*.pkl"))
+    assert size <= 0.5 * 2 ** 20
+    reader = ResultCache(disk_dir=str(tmp_path))
+    assert reader.get("9")[0] == 9.0
+    assert reader.get("0") is None  # pruned oldest-first
+    assert (reader.counters["disk_hits"], reader.counters["misses"]) == (1, 1)
+    writer.clear(disk=True)
+    assert not list(tmp_path.glob("*.pkl"))
+
+
+def test_counters_under_concurrent_lookups(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put("known", 1.0)
+    cache.clear()  # memory only: lookups of "known" go to disk
+
+    def lookups():
+        for _ in range(200):
+            cache.get("missing")
+            cache.get("known")
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counted = cache.counters["hits"] + cache.counters["disk_hits"] + cache.counters["misses"]
+    assert counted == 8 * 400
+    assert cache.counters["misses"] == 8 * 200
@@ -0,0 +1,82 @@
+# test_catalog.py
+# ------------------------------
+# Catalog file <-> arrays round trip, kernels and parameters through the measures table,
+# validation errors
+# ------------------------------
+import json
+
+import numpy as np
+import pytest
+
+from catalog import catalog_entries, catalog_from_entries, load_catalog, save_catalog
+from engine import KERNEL_COLUMN, PARAM_COLUMNS, measures_to_arrays
+from model import CATALOG
+
+
+def _assert_same_catalog(a: dict, b: dict):
+    for field in ("code", "name", "category", "unit", "qty_from", "capex_unit_2021", "lifetime_y", "kernel"):
+        np.testing.assert_array_equal(a[field], b[field])
+    assert a["params"].keys() == b["params"].keys()
+    for key in a["params"]:
+        np.testing.assert_array_equal(a["params"][key], b["params"][key])
+
+
+@pytest.mark.parametrize("which", ["default", "extended"])
+def test_entries_round_trip(catalog, which):
+    catalog = CATALOG if which == "default" else catalog
+    _assert_same_catalog(catalog_from_entries(catalog_entries(catalog)), catalog)
+
+
+def test_file_round_trip(catalog, tmp_path):
+    path = tmp_path / "measures.json"
+    save_catalog(catalog, path)
+    assert json.loads(path.read_text(encoding="utf-8"))["measures"][-1]["kernel"] == "heat_network"
+    _assert_same_catalog(load_catalog(path), catalog)
+    with open(path, "rb") as f:  # uploaded file
+        _assert_same_catalog(load_catalog(f), catalog)
+
+
+def test_kernels_and_params_reach_the_engine(catalog, measures_df):
+    assert list(measures_df[KERNEL_COLUMN]) == list(catalog["kernel"])
+    arrays = measures_to_arrays(measures_df)
+    np.testing.assert_array_equal(arrays["kernel"], catalog["kernel"])
+    codes = list(arrays["code"])
+    facade = codes.index("pv_facade")
+    network = codes.index("heat_network")
+    assert arrays["pv_yield"][facade] == 650.0 and arrays["pv_sc"][facade] == pytest.approx(0.7)
+    assert arrays["net_price"][network] == 0.13 and arrays["net_ef"][network] == 0.12
+    assert arrays["heat_yield"][codes.index("solar_thermal")] == 400.0
+    assert {"net_price", "net_ef", "heat_yield"} <= set(PARAM_COLUMNS.values())
+
+
+def test_table_without_kernel_column_uses_built_in_kernels(measures_df):
+    default_rows = measures_df[measures_df["Code"].isin(CATALOG["code"])].drop(columns=KERNEL_COLUMN)
+    np.testing.assert_array_equal(measures_to_arrays(default_rows)["kernel"], CATALOG["kernel"])
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"kernel": "geothermal"}, "unbekannter Typ 'geothermal'"),
+    ({"qty_from": "floors"}, "qty_from"),
+    ({"params": {"net_price": 0.1}}, "net_price"),
+    ({"lifetime_y": "lang"}, "lifetime_y"),
+])
+def test_invalid_entries(change, message):
+    entries = catalog_entries(CATALOG)
+    entries[0] = {**entries[0], **change}
+    with pytest.raises(ValueError, match=message):
+        catalog_from_entries(entries)
+
+
+def test_missing_field_and_duplicate_code():
+    entries = catalog_entries(CATALOG)
+    with pytest.raises(ValueError, match="unit"):
+        catalog_from_entries([{k: v for k, v in entries[0].items() if k != "unit"}])
+    with pytest.raises(ValueError, match="mehrfach"):
+        catalog_from_entries(entries + [entries[0]])
+
+
+def test_unsupported_version(tmp_path):
+    path = tmp_path / "measures.json"
+    path.write_text(json.dumps({"version": 99, "measures": []}), encoding="utf-8")
+    with pytest.raises(ValueError, match="Katalogversion 99"):
+        load_catalog(path)
@@ -0,0 +1,137 @@
+# test_engine.py
+# ------------------------------
+# Vectorized engine against the original row-by-row simulate() (benchmark.reference_simulate):
+# single buildings, batches of selections, stacked buildings and broadcast case shapes, and
+# the kernels of the extended catalog (second PV row, solar thermal, heat network)
+# ------------------------------
+import numpy as np
+import pytest
+
+from benchmark import CO2_KEYS, EURO_KEYS, check_equivalence, reference_simulate
+from catalog import catalog_entries, catalog_from_entries
+from engine import CODE_HP, CODE_PV, RESULT_KEYS, kernels_of, measures_to_arrays, simulate_batch, stack_measures
+from model import CATALOG, build_measures_df, derive_quantities, evaluate_scenarios, simulate
+
+
+def _select(measures: dict, *codes) -> dict:
+    return {**measures, "active": np.isin(measures["code"], codes)}
+
+
+@pytest.fixture
+def default_df(measures_df):
+    return measures_df[measures_df["Code"].isin(CATALOG["code"])].reset_index(drop=True)
+
+
+def test_random_buildings_and_selections_match_reference():
+    report = check_equivalence(200, seed=3)
+    assert report["passed"], report["max_abs_diff"]
+
+
+@pytest.mark.parametrize("codes", [(), ("roof_ins",), (CODE_HP,), (CODE_PV, CODE_HP, "led_lighting", "vent_wrg"),
+                                   tuple(CATALOG["code"].tolist())])
+def test_simulate_matches_reference(building, default_df, codes):
+    df = default_df.assign(Aktiv=default_df["Code"].isin(codes))
+    reference = reference_simulate(building, df)
+    result = simulate(building, df)
+    for key in EURO_KEYS + CO2_KEYS:
+        assert result[key] == pytest.approx(reference[key], rel=1e-9, abs=1e-6), key
+
+
+def test_text_cells_and_blanks(building, default_df):
+    # cells as left by the editor: None and unparsable text count as 0
+    df = default_df.assign(Aktiv=True).astype({"Einsparung Heizung [%]": object})
+    df.loc[0, "Einsparung Heizung [%]"] = None
+    df.loc[1, "Einsparung Heizung [%]"] = "abc"
+    zeros = df.copy()
+    zeros.loc[[0, 1], "Einsparung Heizung [%]"] = 0.0
+    assert simulate(building, df)["cost_heat_after"] == pytest.approx(reference_simulate(building, zeros)["cost_heat_after"])
+
+
+def test_batch_matches_single_cases(building, measures):
+    rng = np.random.default_rng(0)
+    selections = rng.random((16, len(measures["code"]))) < 0.5
+    batch = simulate_batch(building, measures, selections)
+    assert batch["capex_total"].shape == (16,)
+    for i, row in enumerate(selections):
+        single = simulate_batch(building, measures, row)
+        for key in RESULT_KEYS:
+            assert batch[key][i] == pytest.approx(float(single[key]), rel=1e-12, abs=1e-9), key
+
+
+def test_stacked_buildings_match_single_cases(building, default_df):
+    frames = [measures_to_arrays(default_df.assign(Aktiv=default_df["Code"].isin(codes), Menge=default_df["Menge"] * scale))
+              for scale, codes in ((1.0, ("roof_ins",)), (2.0, (CODE_PV,)), (0.5, (CODE_HP, "windows_triple")))]
+    batch = simulate_batch(building, stack_measures(frames))
+    assert batch["capex_total"].shape == (3,)
+    for i, frame in enumerate(frames):
+        single = simulate_batch(building, frame)
+        for key in RESULT_KEYS:
+            assert batch[key][i] == pytest.approx(float(single[key])), key
+
+
+def test_case_shapes_broadcast(building, measures):
+    # (N,) buildings x (M, K) selections -> (N, M); scalar building, (K,) mask -> ()
+    prices = {**building, "p_heat": np.array([0.08, 0.12, 0.16])}
+    selections = np.stack([measures["active"], ~measures["active"]])
+    result = simulate_batch(prices, measures, selections)
+    assert result["cost_heat_after"].shape == (3, 2)
+    assert simulate_batch(building, measures)["cost_heat_after"].shape == ()
+    for i, p in enumerate(prices["p_heat"]):
+        single = simulate_batch({**building, "p_heat": p}, measures, selections)
+        np.testing.assert_allclose(result["cost_heat_after"][i], single["cost_heat_after"])
+
+
+def test_pv_rows_add_up(building, measures):
+    roof = simulate_batch(building, _select(measures, CODE_PV))
+    facade = simulate_batch(building, _select(measures, "pv_facade"))
+    both = simulate_batch(building, _select(measures, CODE_PV, "pv_facade"))
+    facade_kwp = measures["qty"][list(measures["code"]).index("pv_facade")]
+    assert float(facade["pv_feed_kwh"]) == pytest.approx(facade_kwp * 650.0 * (1.0 - 0.7))
+    for key in ("pv_self_kwh", "pv_feed_kwh", "capex_total"):
+        assert float(both[key]) == pytest.approx(float(roof[key]) + float(facade[key]))
+
+
+def test_solar_thermal_offsets_heat(building, measures):
+    result = simulate_batch(building, _select(measures, "solar_thermal"))
+    qty = measures["qty"][list(measures["code"]).index("solar_thermal")]
+    assert float(result["heat_after"]) == pytest.approx(building["e_heat_kwh"] - 400.0 * qty)
+
+
+def test_heat_network_supplies_remaining_heat(building, measures):
+    result = simulate_batch(building, _select(measures, "roof_ins", "heat_network"))
+    heat = building["e_heat_kwh"] * (1.0 - measures["heat_pct"][0])
+    assert float(result["heat_after"]) == pytest.approx(heat)
+    assert float(result["cost_heat_after"]) == pytest.approx(heat * 0.13)
+    assert float(result["co2_heat_after_t"]) == pytest.approx(heat * 0.12 / 1000.0)
+    # network CO2 is priced like fuel (apply_co2_heat), as in the lifecycle cash flows
+    assert float(result["co2_cost_after"]) == pytest.approx(heat * 0.12 / 1000.0 * building["co2_price"])
+    evaluated = evaluate_scenarios(building, _select(measures, "roof_ins", "heat_network"))
+    priced_t = evaluated["Emissionen Heizung [tCO2/a]"] - evaluated["co2_heat_after_t"]
+    assert float(evaluated["CO2-Kosten [€/a]"] - evaluated["co2_cost_after"]) == pytest.approx(float(priced_t) * 55.0)
+
+
+def test_heat_pump_before_heat_network(building, measures):
+    # the heat pump covers its share first, the network supplies the rest
+    result = simulate_batch(building, _select(measures, CODE_HP, "heat_network"))
+    coverage = measures["hp_coverage"][list(measures["code"]).index(CODE_HP)]
+    assert float(result["heat_after"]) == pytest.approx(building["e_heat_kwh"] * (1.0 - coverage))
+    assert float(result["hp_el_kwh"]) > 0.0
+
+
+def test_uploaded_catalog_kernels_stay_in_their_table(building):
+    # a catalog that turns a built-in code into another kernel must not change other tables
+    entries = catalog_entries(CATALOG)
+    entries[0] = dict(entries[0], kernel="solar_thermal", params={"heat_yield": 100.0})
+    derived = derive_quantities(2500.0, 40, 250.0, 0.25, 60.0, 950.0, 450000.0, 2000.0)
+    custom = build_measures_df(derived, 950.0, 0.6, 0.08, catalog_from_entries(entries))
+    default = build_measures_df(derived, 950.0, 0.6, 0.08)
+    assert measures_to_arrays(custom)["kernel"][0] == "solar_thermal"
+    assert measures_to_arrays(default)["kernel"][0] == "percent"
+    assert kernels_of({"code": CATALOG["code"]})[0] == "percent"
+
+
+def test_unknown_kernel_raises(building, measures):
+    kernel = measures["kernel"].astype(object)
+    kernel[0] = "does_not_exist"
+    with pytest.raises(ValueError, match="does_not_exist"):
+        simulate_batch(building, {**measures, "kernel": kernel})
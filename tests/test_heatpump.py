@@ -0,0 +1,73 @@
+# test_heatpump.py
+# ------------------------------
+# Heating curve and COP, the hourly heat pump (monovalent / bivalent, case broadcasting),
+# the engine bridge with_hourly_hp and reading DWD test reference years
+# ------------------------------
+import numpy as np
+import pytest
+
+from engine import CODE_HP, simulate_batch
+from heatpump import COP_MAX, cop, read_temperature, simulate_heat_pump, supply_temperature, synthetic_temperature, with_hourly_hp
+from hourly import HOURS
+
+
+def test_heating_curve_and_cop():
+    supply = supply_temperature(np.array([-20.0, -12.0, 15.0, 25.0]), 55.0, 30.0, 15.0, -12.0)
+    np.testing.assert_allclose(supply, [55.0, 55.0, 30.0, 30.0])
+    assert cop(5.0, 35.0, 0.45) == pytest.approx(0.45 * 308.15 / 30.0)
+    assert cop(34.0, 35.0, 0.45) == COP_MAX  # lift floored at 5 K, COP capped
+
+
+def test_monovalent_and_bivalent():
+    res = simulate_heat_pump.uncached(450_000.0, sizing_share=np.array([1.0, 0.5]))
+    assert res["coverage"][0] == pytest.approx(1.0)
+    assert res["backup_heat_kwh"][0] == pytest.approx(0.0, abs=1e-6)
+    assert np.isnan(res["bivalence_c"][0])
+    # half the design load still covers most of the annual heat (bivalent parallel)
+    assert 0.5 < res["coverage"][1] < 1.0
+    assert res["hp_heat_kwh"][1] + res["backup_heat_kwh"][1] == pytest.approx(450_000.0)
+    assert res["bivalence_c"][1] > -12.0
+    assert res["hp_kw"][1] == pytest.approx(0.5 * res["design_load_kw"][1])
+    assert 2.0 < res["scop"][0] < 5.0
+
+
+def test_warmer_climate_raises_the_scop():
+    cold = simulate_heat_pump.uncached(100_000.0, synthetic_temperature())
+    mild = simulate_heat_pump.uncached(100_000.0, synthetic_temperature() + 4.0)
+    assert mild["scop"] > cold["scop"]
+
+
+def test_cases_broadcast():
+    e_heat = np.array([100_000.0, 300_000.0, 600_000.0])
+    supply = np.array([[45.0], [60.0]])
+    res = simulate_heat_pump.uncached(e_heat, supply_design_c=supply)
+    assert res["scop"].shape == (2, 3)
+    for i, s in enumerate(supply[:, 0]):
+        for j, e in enumerate(e_heat):
+            assert res["hp_el_kwh"][i, j] == pytest.approx(float(simulate_heat_pump.uncached(e, supply_design_c=s)["hp_el_kwh"]))
+
+
+def test_engine_uses_the_hourly_heat_pump(building, measures):
+    active = np.isin(measures["code"], ("roof_ins", CODE_HP))
+    measures = {**measures, "active": active}
+    hourly = with_hourly_hp(building, measures, sizing_share=0.7)
+    hp_row = measures["code"] == CODE_HP
+    remaining = float(simulate_batch(building, measures, active & ~hp_row)["heat_after"])
+    res = simulate_heat_pump.uncached(remaining, sizing_share=0.7)
+    result = simulate_batch(building, hourly)
+    assert float(result["hp_el_kwh"]) == pytest.approx(float(res["hp_el_kwh"]), rel=1e-9)
+    assert float(result["heat_after"]) == pytest.approx(float(res["backup_heat_kwh"]), rel=1e-9)
+    assert hourly["qty"][hp_row][0] == pytest.approx(float(res["hp_kw"]))
+
+
+def test_read_dwd_test_reference_year(tmp_path):
+    temperature = synthetic_temperature()
+    lines = ["Koordinatensystem : Lambert konform konisch", "RW HW MM DD HH t p WG WR", "***"]
+    lines += [f"3900000 2800000 {1 + h // 744:2d} {1 + h // 24 % 31:2d} {h % 24 + 1:2d} {t:5.1f} 1000 3 180"
+              for h, t in enumerate(temperature)]
+    path = tmp_path / "TRY2015_Jahr.dat"
+    path.write_text("\n".join(lines), encoding="latin-1")
+    np.testing.assert_allclose(read_temperature(path), temperature.round(1))
+    path.write_text("\n".join(lines[:-1]), encoding="latin-1")
+    with pytest.raises(ValueError, match=f"erwartet {HOURS}"):
+        read_temperature(path)
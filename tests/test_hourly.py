@@ -0,0 +1,60 @@
+# test_hourly.py
+# ------------------------------
+# Hourly PV balance (energy conservation, battery losses), the engine bridge with_hourly_pv,
+# sizing curves and reading hourly / quarter-hourly series
+# ------------------------------
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import CODE_PV, simulate_batch
+from hourly import HOURS, read_series, simulate_hourly, sizing_curves, synthetic_load_profile, with_hourly_pv
+
+
+def test_balance_without_battery():
+    flat = np.ones(HOURS)
+    res = simulate_hourly.uncached(np.array([10_000.0, 10_000.0]), np.array([5_000.0, 20_000.0]), flat, flat)
+    np.testing.assert_allclose(res["pv_self_kwh"], [5_000.0, 10_000.0])
+    np.testing.assert_allclose(res["pv_feed_kwh"], [0.0, 10_000.0])
+    np.testing.assert_allclose(res["grid_kwh"], [5_000.0, 0.0])
+
+
+def test_battery_raises_self_consumption_and_loses_energy():
+    pv = 60_000.0
+    res = simulate_hourly.uncached(120_000.0, pv, battery_kwh=np.array([0.0, 50.0, 200.0]))
+    assert np.all(np.diff(res["self_share"]) > 0.0)
+    losses = pv - res["pv_self_kwh"] - res["pv_feed_kwh"]
+    assert losses[0] == pytest.approx(0.0, abs=1e-6)
+    assert np.all(losses[1:] > 0.0)
+    # round trip efficiency: stored energy comes back at 92 %
+    np.testing.assert_allclose(losses[1:], res["battery_discharge_kwh"][1:] * (1.0 / 0.92 - 1.0), rtol=0.05)
+
+
+def test_engine_feeds_in_only_what_the_battery_does_not_lose(building, measures):
+    active = measures["code"] == CODE_PV
+    measures = {**measures, "active": active}
+    hourly = with_hourly_pv(building, measures, battery_kwh=100.0)
+    pv_kwh = float(measures["qty"][active][0] * building["pv_yield"])
+    res = simulate_hourly.uncached(building["e_el_kwh"], pv_kwh, battery_kwh=100.0)
+    result = simulate_batch(building, hourly)
+    assert float(result["pv_self_kwh"]) == pytest.approx(float(res["pv_self_kwh"]))
+    assert float(result["pv_feed_kwh"]) == pytest.approx(float(res["pv_feed_kwh"]))
+    assert float(result["pv_self_kwh"] + result["pv_feed_kwh"]) < pv_kwh
+
+
+def test_sizing_curves():
+    curves = sizing_curves([80_000.0, 200_000.0], 950.0, kwp=[20.0, 60.0], battery_kwh=[0.0, 40.0])
+    assert len(curves) == 8
+    by_building = curves.set_index(["Gebäude", "PV [kWp]", "Speicher [kWh]"])
+    assert by_building.loc[(0, 60.0, 40.0), "Autarkiegrad [%]"] > by_building.loc[(0, 60.0, 0.0), "Autarkiegrad [%]"]
+    assert by_building.loc[(1, 20.0, 0.0), "Eigenverbrauchsanteil [%]"] > by_building.loc[(0, 20.0, 0.0), "Eigenverbrauchsanteil [%]"]
+
+
+def test_read_series_quarter_hours(tmp_path):
+    profile = synthetic_load_profile()
+    path = tmp_path / "load.csv"
+    pd.DataFrame({"Zeit": np.arange(4 * HOURS), "kW": np.repeat(profile / 4.0, 4)}).to_csv(path, index=False)
+    np.testing.assert_allclose(read_series(path, "kW"), profile)
+    pd.DataFrame({"kW": np.ones(100)}).to_csv(path, index=False)
+    with pytest.raises(ValueError, match="erwartet 8760"):
+        read_series(path)
@@ -0,0 +1,58 @@
+# test_lifecycle.py
+# ------------------------------
+# NPV, IRR and discounted payback on hand-made cash flows, the reinvestment schedule and
+# the lifecycle() wiring (CO2 price path, broadcast discount rates)
+# ------------------------------
+import numpy as np
+import pytest
+
+from lifecycle import discounted_payback, irr, lifecycle, npv, reinvestment_schedule
+
+ACTIVE = ("roof_ins", "heat_pump_aw", "pv_system", "led_lighting")
+
+
+def test_npv_and_irr():
+    flows = np.array([[-100.0, 110.0], [-100.0, 0.0], [-1000.0, 300.0]])
+    assert npv(flows[:1], 0.1)[0] == pytest.approx(0.0)
+    assert npv(flows[:1], 0.0)[0] == pytest.approx(10.0)
+    rates = irr(flows)
+    assert rates[0] == pytest.approx(0.1, abs=1e-9)
+    assert np.isnan(rates[1])
+    assert rates[2] == pytest.approx(-0.7, abs=1e-9)
+
+
+def test_discounted_payback():
+    flows = np.array([[-100.0, 50.0, 60.0], [-100.0, 10.0, 10.0], [0.0, 0.0, 0.0], [0.0, 20.0, 20.0]])
+    payback = discounted_payback(flows, 0.0)
+    assert payback[0] == pytest.approx(1.0 + 50.0 / 60.0)
+    assert np.isinf(payback[1])
+    assert np.isinf(payback[2])  # nothing invested, nothing saved
+    assert payback[3] == 0.0
+
+
+def test_reinvestment_schedule():
+    reinvest, last_install, residual_fraction = reinvestment_schedule(np.array([10.0, 40.0]), 25)
+    assert np.flatnonzero(reinvest[0]).tolist() == [10, 20]
+    assert not reinvest[1].any()
+    assert last_install.tolist() == [20.0, 0.0]
+    np.testing.assert_allclose(residual_fraction, [0.5, 15.0 / 40.0])
+
+
+def test_co2_price_path(building, measures):
+    active = np.isin(measures["code"], ACTIVE)
+    flat = lifecycle.uncached(building, measures, active, horizon=20)
+    path = lifecycle.uncached(building, measures, active, horizon=20, co2_price_path=[building["co2_price"]] * 25)
+    np.testing.assert_allclose(path["cash_flows"], flat["cash_flows"])
+    with pytest.raises(ValueError, match="CO2-Preispfad"):
+        lifecycle.uncached(building, measures, active, horizon=20, co2_price_path=[100.0] * 10)
+
+
+def test_discount_rates_broadcast(building, measures):
+    active = np.isin(measures["code"], ACTIVE)
+    rates = np.array([0.0, 0.03, 0.08])
+    result = lifecycle.uncached(building, measures, active, discount_rate=rates)
+    assert result["npv_eur"].shape == (3,)
+    for rate, value in zip(rates, result["npv_eur"]):
+        assert value == pytest.approx(float(lifecycle.uncached(building, measures, active, discount_rate=rate)["npv_eur"]))
+    assert result["npv_eur"][0] == pytest.approx(result["cash_flows"].sum())
+    assert np.all(np.diff(result["npv_eur"]) < 0)
@@ -0,0 +1,76 @@
+# test_metering.py
+# ------------------------------
+# Meter exports -> hourly bins: number formats (also when the first chunk only has thousands
+# groupings), partial hours and gaps, counters, UTC offsets and the on-disk cache
+# ------------------------------
+import numpy as np
+import pandas as pd
+import pytest
+
+from metering import decimal_mark, ingest_meter, load_meter, summarize_meter
+
+
+def _write(path, stamps, values, sep=";"):
+    path.write_text("Zeit" + sep + "Wert\n" + "".join(f"{t}{sep}{v}\n" for t, v in zip(stamps, values)), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("values, mark", [
+    (["1.234", "12.345", "2.000.000"], ","),
+    (["1.234", "0.25"], "."),
+    (["12.5", "3"], "."),
+    (["1.234,5", "7"], ","),
+    (["12", "7"], None),
+])
+def testdecimal_mark(values, mark):
+    assert decimal_mark(pd.Series(values)) == mark
+
+
+def test_thousands_in_the_first_chunk(tmp_path):
+    # the first chunk only has "1.234"-style values; the comma decimals come later
+    stamps = [f"01.01.2023 {h:02d}:00" for h in range(6)]
+    path = _write(tmp_path / "lastgang.csv", stamps, ["1.234", "2.000", "1.500", "0,5", "1,25", "3"])
+    meter = ingest_meter(path, chunksize=3)
+    np.testing.assert_allclose(meter["hourly_kwh"][0, :6], [1234.0, 2000.0, 1500.0, 0.5, 1.25, 3.0])
+    english = _write(tmp_path / "english.csv", stamps, ["1.234", "2.000", "1.500", "0.5", "1.25", "3"], sep=",")
+    assert ingest_meter(english, decimal=".")["hourly_kwh"][0, 0] == pytest.approx(1.234)
+    with pytest.raises(ValueError, match="Dezimaltrennzeichen"):
+        ingest_meter(english, decimal=";")
+
+
+def test_quarter_hours_partial_hours_and_gaps(tmp_path):
+    stamps = pd.date_range("2023-05-01", periods=16, freq="15min")
+    keep = np.ones(16, dtype=bool)
+    keep[3] = False       # hour 0: three of four quarter hours
+    keep[4:8] = False     # hour 1: missing
+    values = np.r_[[1.0] * 4, [2.0] * 4, [3.0] * 8]
+    path = _write(tmp_path / "qh.csv", stamps[keep].strftime("%Y-%m-%d %H:%M"), values[keep])
+    meter = ingest_meter(path, interval_min=15)
+    start = (pd.Timestamp("2023-05-01").dayofyear - 1) * 24
+    np.testing.assert_allclose(meter["hourly_kwh"][0, start:start + 4], [4.0, 8.0, 12.0, 12.0])
+    assert meter["filled_hours"][0] == 1 + 1  # the gap and the skipped March hour
+
+
+def test_counter_and_utc_offsets(tmp_path):
+    stamps = ["2023-07-01T00:00:00+02:00", "2023-07-01T01:00:00+02:00", "2023-06-30T23:00:00Z"]
+    path = _write(tmp_path / "zaehler.csv", stamps, ["100.5", "103", "110"])
+    meter = ingest_meter(path, kind="counter")
+    hour = (pd.Timestamp("2023-07-01").dayofyear - 1) * 24
+    # 23:00Z is 01:00 local time: both readings after the first fall into the second hour
+    np.testing.assert_allclose(meter["hourly_kwh"][0, hour:hour + 2], [0.0, 2.5 + 7.0])
+
+
+def test_summary_and_cache(tmp_path):
+    stamps = pd.date_range("2023-01-01", periods=8760, freq="h").strftime("%d.%m.%Y %H:%M")
+    values = np.where(np.arange(8760) == 100, 10.0, 1.0)
+    path = _write(tmp_path / "jahr.csv", stamps, [f"{v:.1f}".replace(".", ",") for v in values])
+    cache_dir = str(tmp_path / "cache")
+    meter = load_meter(path, cache_dir=cache_dir)
+    s = summarize_meter(meter)
+    assert s["annual_kwh"] == pytest.approx(8769.0)
+    assert s["full_load_hours"] == pytest.approx(876.9)
+    assert s["profile"].sum() == pytest.approx(1.0)
+    cached = load_meter(path, cache_dir=cache_dir)
+    np.testing.assert_array_equal(cached["hourly_kwh"], meter["hourly_kwh"])
+    with pytest.raises(ValueError, match="keine gültigen Messwerte"):  # other options: read again, not from the cache
+        load_meter(path, cache_dir=cache_dir, decimal=".")
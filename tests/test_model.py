@@ -0,0 +1,46 @@
+# test_model.py
+# ------------------------------
+# The pure model module: imports without Streamlit, Plotly or pandas; Baupreisindex,
+# baseline and Umlage formulas
+# ------------------------------
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from model import BAUPREISINDEX_INST, INDEX_BASE, baseline_kpis, get_index_value, index_for_year, umlage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_model_imports_without_ui_libraries():
+    code = ("import sys, model, engine\n"
+            "model.umlage(1000.0, 0.0, 100.0, 8.0, 3.0, 2.0, 0.5)\n"
+            "print(','.join(m for m in ('streamlit', 'plotly', 'pandas') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_index_values():
+    year = max(BAUPREISINDEX_INST)
+    quarter = list(BAUPREISINDEX_INST[year])[-1]
+    assert get_index_value(year, quarter) == BAUPREISINDEX_INST[year][quarter]
+    full = next(y for y in sorted(BAUPREISINDEX_INST) if len(BAUPREISINDEX_INST[y]) == 4)
+    assert index_for_year(int(full)) == pytest.approx(np.mean(list(BAUPREISINDEX_INST[full].values())))
+    assert index_for_year(int(year) + 5) > index_for_year(int(year) + 1) > INDEX_BASE
+
+
+def test_umlage_caps():
+    # 8 €/m² rent: 3 €/m² over 6 years; below 7 €/m²: 2 €/m²; §559e: 0.50 €/m²
+    res = umlage(np.array([1e6, 1e6, 100.0]), np.array([1e6, 0.0, 0.0]), 1000.0, np.array([8.0, 6.0, 8.0]), 3.0, 2.0, 0.5)
+    np.testing.assert_allclose(res["ann_umlage_general"], [500.0, 1000.0 / 3.0, 100.0])
+    np.testing.assert_allclose(res["ann_umlage_heating"], [1000.0 / 12.0, 0.0, 0.0])
+
+
+def test_baseline_co2_cost_only_where_applied():
+    base = baseline_kpis(100_000.0, 200_000.0, 0.3, 0.1, 0.4, 0.2, 50.0, np.array([False, True]), True)
+    np.testing.assert_allclose(base["Emissionen Strom [tCO2/a]"], 40.0)
+    extra = base["Gesamtkosten [€/a]"][1] - base["Gesamtkosten [€/a]"][0]
+    assert extra == pytest.approx(40.0 * 50.0)
@@ -0,0 +1,66 @@
+# test_montecarlo.py
+# ------------------------------
+# Distributions (lognormal keeps its mean, draws clipped to the physical range), the
+# percentile summary and what the result cache keeps
+# ------------------------------
+import numpy as np
+import pytest
+
+from cache import CACHE
+from model import evaluate_scenarios
+from montecarlo import physical_range, run_monte_carlo, sample, sample_outcomes, summarize, triangular_spreads
+
+
+def test_lognormal_keeps_the_mean():
+    draws = sample(("lognormal", 0.12, 0.3), 400_000, np.random.default_rng(0))
+    assert draws.mean() == pytest.approx(0.12, rel=5e-3)
+    assert np.median(draws) == pytest.approx(0.12 * np.exp(-0.5 * 0.3 ** 2), rel=5e-3)
+
+
+def test_physical_ranges():
+    assert physical_range("roof_ins.heat_pct") == (0.0, 1.0)
+    assert physical_range("heat_pump_aw.hp_scop")[0] == 1.0
+    assert physical_range("p_el") == (0.0, np.inf)
+    with pytest.raises(ValueError):
+        sample(("beta", 1.0, 2.0), 10, np.random.default_rng(0))
+
+
+def test_samples_are_clipped_and_fixed_inputs_reproduce_the_point_estimate(building, measures):
+    active = np.isin(measures["code"], ("roof_ins", "heat_pump_aw"))
+    dists = {"roof_ins.heat_pct": ("normal", 0.2, 0.5), "heat_pump_aw.hp_scop": ("normal", 1.5, 2.0),
+             "p_el": ("fixed", building["p_el"])}
+    samples = sample_outcomes(building, measures, dists, 5000, active, chunk=2000, workers=1)
+    assert len(samples["savings_eur_pa"]) == 5000 and np.isfinite(samples["savings_eur_pa"]).all()
+    fixed = sample_outcomes(building, measures, {"p_el": ("fixed", building["p_el"])}, 100, active, workers=1)
+    point = evaluate_scenarios(building, measures, active)
+    np.testing.assert_allclose(fixed["savings_eur_pa"], float(point["savings_eur_pa"]))
+
+
+def test_seeded_runs_repeat(building, measures):
+    dists = triangular_spreads(building, measures, measures["active"] | np.isin(measures["code"], ("roof_ins",)),
+                               {"p_heat": 0.2, "*.heat_pct": 0.25})
+    assert set(dists) == {"p_heat", "roof_ins.heat_pct"}
+    active = np.isin(measures["code"], ("roof_ins",))
+    a = sample_outcomes(building, measures, dists, 3000, active, chunk=1000, seed=4, workers=1)
+    b = sample_outcomes(building, measures, dists, 3000, active, chunk=1000, seed=4, workers=1)
+    np.testing.assert_array_equal(a["co2_savings_t"], b["co2_savings_t"])
+
+
+def test_summary_only_in_the_cache(building, measures):
+    active = np.isin(measures["code"], ("roof_ins", "windows_triple"))
+    dists = {"p_heat": ("triangular", 0.08, 0.1, 0.14)}
+    CACHE.clear()
+    result = run_monte_carlo(building, measures, dists, 20_000, active, workers=1)
+    assert set(result) == {"summary", "p_payback_exceeds_lifetime", "n_samples"}
+    assert result["n_samples"] == 20_000
+    assert CACHE.stats()["memory_mb"] < 0.1  # not the 20k x 4 sample vectors
+    p10, p50, p90 = result["summary"].loc[0, ["P10", "P50", "P90"]]
+    assert p10 <= p50 <= p90
+
+
+def test_summarize_exceedance():
+    samples = {"savings_eur_pa": np.arange(10.0), "co2_savings_t": np.ones(10),
+               "simple_payback_y": np.array([5.0] * 7 + [np.inf] * 3), "lifetime_y": np.full(10, 20.0)}
+    result = summarize(samples)
+    assert result["p_payback_exceeds_lifetime"] == pytest.approx(0.3)
+    assert result["summary"].loc[2, "Mittelwert"] == 5.0
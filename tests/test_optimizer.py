@@ -0,0 +1,90 @@
+# test_optimizer.py
+# ------------------------------
+# Pareto frontier, pruned expansion against full enumeration (incl. a measure that only
+# adds capex, i.e. only Umlage) and the best package per building
+# ------------------------------
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog import catalog_entries, catalog_from_entries
+from conftest import BUILDING, measures_table
+from engine import measures_to_arrays
+from model import CATALOG, evaluate_scenarios
+from optimizer import best_packages, enumerate_selections, pareto_mask, pareto_packages
+from portfolio import building_inputs
+
+# no energy effect: only raises capex and, below the cap, the Umlage
+STAIRWELL = {"code": "stairwell", "name": "Treppenhaus", "category": "Sonstiges", "unit": "pauschal", "qty_from": "units",
+             "capex_unit_2021": 2000.0, "lifetime_y": 30, "kernel": "percent", "params": {"heat_pct": 0.0, "el_pct": 0.0}}
+
+
+def _building(**columns) -> dict:
+    inputs = building_inputs(pd.DataFrame([dict(BUILDING, **columns)]))
+    return {key: value[0].item() if isinstance(value, np.ndarray) else value for key, value in inputs.items()}
+
+
+def test_pareto_mask():
+    points = np.array([[1.0, 5.0], [2.0, 2.0], [3.0, 3.0], [5.0, 1.0], [1.0, 5.0], [6.0, 6.0]])
+    np.testing.assert_array_equal(pareto_mask(points), [True, True, False, True, True, False])
+
+
+def test_enumerate_selections():
+    selections = enumerate_selections(3)
+    assert selections.shape == (8, 3)
+    assert len({tuple(row) for row in selections}) == 8
+
+
+@pytest.mark.parametrize("columns, extra", [
+    ({}, []),
+    ({"rentable_area_m2": 80000.0}, [STAIRWELL]),      # Umlage below the cap: capex pays off via the Umlage
+    ({"rentable_area_m2": 500.0}, [STAIRWELL]),        # capped Umlage
+    ({"umlage_pct_heating": 0.2, "rentable_area_m2": 20000.0}, []),
+])
+def test_pruned_expansion_keeps_the_front(columns, extra):
+    building = _building(**columns)
+    catalog = catalog_from_entries(catalog_entries(CATALOG) + extra)
+    measures = measures_to_arrays(measures_table(building, catalog))
+    full = pareto_packages.uncached(building, measures)
+    pruned = pareto_packages.uncached(building, measures, max_enumerate=3)
+    assert set(pruned["Maßnahmen"]) == set(full["Maßnahmen"])
+
+
+def test_pruned_expansion_with_budget(building, measures):
+    full = pareto_packages.uncached(building, measures, budget=400_000.0)
+    pruned = pareto_packages.uncached(building, measures, budget=400_000.0, max_enumerate=3)
+    assert (full["capex_total"] <= 400_000.0).all()
+    assert set(pruned["Maßnahmen"]) == set(full["Maßnahmen"])
+
+
+def test_front_is_not_dominated(building, measures):
+    front = pareto_packages.uncached(building, measures)
+    selections = enumerate_selections(len(measures["code"]))
+    evaluated = evaluate_scenarios(building, measures, selections)
+    for _, row in front.iterrows():
+        better = ((evaluated["capex_total"] <= row["capex_total"]) & (evaluated["savings_eur_pa"] >= row["savings_eur_pa"])
+                  & (evaluated["co2_savings_t"] >= row["co2_savings_t"])
+                  & (evaluated["simple_payback_y"] <= row["simple_payback_y"]))
+        strictly = ((evaluated["capex_total"] < row["capex_total"]) | (evaluated["savings_eur_pa"] > row["savings_eur_pa"])
+                    | (evaluated["co2_savings_t"] > row["co2_savings_t"])
+                    | (evaluated["simple_payback_y"] < row["simple_payback_y"]))
+        assert not (better & strictly).any()
+
+
+def test_best_packages_per_building():
+    inputs = building_inputs(pd.DataFrame([dict(BUILDING, e_heat_kwh=e) for e in (200000.0, 450000.0, 900000.0)]))
+    derived_measures = [measures_to_arrays(measures_table({key: value[i].item() if isinstance(value, np.ndarray) else value
+                                                           for key, value in inputs.items()})) for i in range(3)]
+    measures = {**derived_measures[0], "qty": np.stack([m["qty"] for m in derived_measures])}
+    candidates = np.isin(measures["code"], ("roof_ins", "wall_wdvs", "windows_triple", "heat_pump_aw", "pv_system"))
+    budget = np.array([150_000.0, 400_000.0, np.inf])
+    active, value = best_packages.uncached(inputs, measures, "co2_savings_t", budget, candidates)
+    assert active.shape == (3, len(measures["code"]))
+    assert not active[:, ~candidates].any()
+    selections = np.zeros((32, len(measures["code"])), dtype=bool)
+    selections[:, candidates] = enumerate_selections(5)
+    for i in range(3):
+        one = {key: (v[i] if np.ndim(v) else v) for key, v in inputs.items()}
+        evaluated = evaluate_scenarios(one, {**measures, "qty": measures["qty"][i]}, selections)
+        feasible = evaluated["capex_total"] <= budget[i]
+        assert value[i] == pytest.approx(evaluated["co2_savings_t"][feasible].max())
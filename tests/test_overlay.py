@@ -0,0 +1,76 @@
+# test_overlay.py
+# ------------------------------
+# Shared base tables with per-session overlays: uploaded catalogs in the result cache
+# (evicted catalogs raise), only changed cells in the overlay, edits surviving a rebuilt
+# base table
+# ------------------------------
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache import CACHE
+from model import CATALOG, derive_quantities
+from overlay import apply_overlay, base_table, catalog_for, overlay_cells, overlay_from_table, register_catalog
+
+
+def _derived(area: float = 2500.0) -> dict:
+    return derive_quantities(area, 40, 250.0, 0.25, 60.0, 950.0, 450000.0, 2000.0)
+
+
+def test_uploaded_catalog_is_shared_by_content(catalog):
+    key = register_catalog(catalog)
+    assert register_catalog({**catalog}) == key
+    np.testing.assert_array_equal(catalog_for(key)["code"], catalog["code"])
+    assert catalog_for(None) is CATALOG
+    _, table = base_table(_derived(), 950.0, 0.6, 0.08, key)
+    assert table["Code"].tolist() == list(catalog["code"])
+
+
+def test_evicted_catalog_raises(catalog):
+    key = register_catalog(catalog)
+    CACHE.clear()
+    with pytest.raises(ValueError, match="erneut hochladen"):
+        catalog_for(key)
+    with pytest.raises(ValueError):
+        base_table(_derived(), 950.0, 0.6, 0.08, key)
+
+
+def test_base_table_is_shared():
+    key, first = base_table(_derived(), 950.0, 0.6, 0.08)
+    again, second = base_table(_derived(), 950.0, 0.6, 0.08)
+    assert again == key
+    pd.testing.assert_frame_equal(first, second)
+    second.loc[0, "Menge"] = -1.0  # callers get copies
+    assert base_table(_derived(), 950.0, 0.6, 0.08)[1].loc[0, "Menge"] != -1.0
+    assert base_table(_derived(3000.0), 950.0, 0.6, 0.08)[0] != key
+
+
+def test_overlay_keeps_only_changed_cells():
+    _, base = base_table(_derived(), 950.0, 0.6, 0.08)
+    table = base.copy()
+    table.loc[0, "Aktiv"] = True
+    table.loc[1, "Einsparung Heizung [%]"] = np.nan
+    overlay = overlay_from_table(base, table)
+    code0, code1 = base["Code"].iloc[0], base["Code"].iloc[1]
+    assert overlay[code0] == {"Aktiv": True} and list(overlay[code1]) == ["Einsparung Heizung [%]"]
+    assert np.isnan(overlay[code1]["Einsparung Heizung [%]"])
+    assert overlay_cells(overlay) == 2
+    assert overlay_from_table(base, base.copy()) == {}
+    pd.testing.assert_frame_equal(apply_overlay(base, overlay), table)
+
+
+def test_edits_survive_a_rebuilt_base_table():
+    _, base = base_table(_derived(), 950.0, 0.6, 0.08)
+    code = base["Code"].iloc[0]
+    overlay = {code: {"Aktiv": True}, "unknown_code": {"Menge": 1.0}, base["Code"].iloc[1]: {"no_column": 1.0}}
+    _, larger = base_table(_derived(3000.0), 950.0, 0.6, 0.08)
+    table = apply_overlay(larger, overlay)
+    assert bool(table.loc[0, "Aktiv"]) and table["Menge"].tolist() == larger["Menge"].tolist()
+    assert table["Menge"].tolist() != base["Menge"].tolist()
+
+
+def test_text_cells_keep_their_value():
+    _, base = base_table(_derived(), 950.0, 0.6, 0.08)
+    table = apply_overlay(base, {base["Code"].iloc[0]: {"Menge": "abc"}})
+    assert table.loc[0, "Menge"] == "abc"
+    assert base["Menge"].dtype == float
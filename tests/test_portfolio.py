@@ -0,0 +1,124 @@
+# test_portfolio.py
+# ------------------------------
+# Portfolio runner: Baupreisindex factor per building from index_year / index_quarter as
+# they come out of a CSV (float years, blank cells, "Q2", 2, "II"), measure selection per
+# row, results written in chunks (CSV and Parquet with a fixed schema)
+# ------------------------------
+import io
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model import BAUPREISINDEX_INST, INDEX_BASE
+from portfolio import MEASURE_CODES, _active_mask, _index_factor, check_codes, run_portfolio
+
+LATEST_YEAR = max(BAUPREISINDEX_INST)
+LATEST = BAUPREISINDEX_INST[LATEST_YEAR][list(BAUPREISINDEX_INST[LATEST_YEAR])[-1]] / INDEX_BASE
+
+
+def _factor(year: str, quarter: str) -> float:
+    return BAUPREISINDEX_INST[year][quarter] / INDEX_BASE
+
+
+def test_csv_columns_with_blank_cells():
+    csv = "building_id,index_year,index_quarter\nA,2021,II\nB,,\nC,2022,Q3\nD,2023,4\nE,2022, i \n"
+    chunk = pd.read_csv(io.StringIO(csv))
+    assert chunk["index_year"].dtype == float  # 2021.0 because of the blank cell
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        factor = _index_factor(chunk)
+    expected = [_factor("2021", "II"), LATEST, _factor("2022", "III"), _factor("2023", "IV"), _factor("2022", "I")]
+    np.testing.assert_allclose(factor, expected)
+
+
+@pytest.mark.parametrize("quarter", ["III", "Q3", "q3", 3, 3.0, "3"])
+def test_quarter_spellings(quarter):
+    chunk = pd.DataFrame({"index_year": [2022.0], "index_quarter": pd.Series([quarter], dtype=object)})
+    assert _index_factor(chunk)[0] == pytest.approx(_factor("2022", "III"))
+
+
+def test_missing_columns_use_latest_quarter():
+    np.testing.assert_allclose(_index_factor(pd.DataFrame({"building_id": ["A", "B"]})), [LATEST, LATEST])
+
+
+def test_unknown_pair_warns_and_falls_back():
+    chunk = pd.DataFrame({"index_year": [1990, 1990, 2021], "index_quarter": ["I", "I", "I"]})
+    with pytest.warns(UserWarning, match="1990/I") as record:
+        factor = _index_factor(chunk)
+    assert len(record) == 1  # looked up once per distinct pair
+    np.testing.assert_allclose(factor, [LATEST, LATEST, _factor("2021", "I")])
+
+
+def test_measures_column():
+    chunk = pd.DataFrame({"building_id": ["A", "B", "C", "D"],
+                          "measures": ["roof_ins; heat_pump_aw", "ALL", None, "pv_system;;roof_ins"]})
+    active = _active_mask(chunk, None)
+    selected = [set(np.compress(row, MEASURE_CODES)) for row in active]
+    assert selected == [{"roof_ins", "heat_pump_aw"}, set(MEASURE_CODES), set(), {"pv_system", "roof_ins"}]
+
+
+def test_unknown_codes_are_an_error():
+    chunk = pd.DataFrame({"building_id": ["A", "B"], "measures": ["roof_ins", "roof_ins;heat_pmp"]})
+    with pytest.raises(ValueError, match="heat_pmp"):
+        _active_mask(chunk, None)
+    with pytest.raises(ValueError, match="Gebäude B"):
+        _active_mask(chunk, None)
+    with pytest.raises(ValueError, match="rof"):
+        check_codes(["roof_ins", "rof"])
+    # regex characters in codes are plain text
+    with pytest.raises(ValueError, match="unbekannte"):
+        _active_mask(pd.DataFrame({"measures": ["roof_.*"]}), None)
+
+
+@pytest.fixture
+def portfolio_csv(tmp_path):
+    # 3 chunks of 2: integer ids in the last chunk, p_heat blank in the second chunk only
+    df = pd.DataFrame({"building_id": ["A", "B", "C", "D", "7", "8"], "area_m2": [900.0, 1500.0, 2500.0, 600.0, 800.0, 1200.0],
+                       "e_heat_kwh": [150000.0] * 6, "p_heat": ["0.1", "0.12", "", "", "0.1", "0.1"],
+                       "measures": ["all", "roof_ins", "", "heat_pump_aw", "pv_system", "all"]})
+    path = tmp_path / "gebaeude.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_csv_and_parquet_output(portfolio_csv, tmp_path):
+    pytest.importorskip("pyarrow")
+    assert run_portfolio(str(portfolio_csv), str(tmp_path / "out.csv"), workers=1, chunksize=2) == 6
+    assert run_portfolio(str(portfolio_csv), str(tmp_path / "out.parquet"), workers=1, chunksize=2) == 6
+    csv = pd.read_csv(tmp_path / "out.csv", dtype={"building_id": str})
+    parquet = pd.read_parquet(tmp_path / "out.parquet")
+    assert parquet["building_id"].tolist() == ["A", "B", "C", "D", "7", "8"]
+    assert csv["measures"].fillna("").tolist() == parquet["measures"].tolist()
+    np.testing.assert_allclose(parquet["Gesamtkosten [€/a]"], csv["Gesamtkosten [€/a]"])
+    assert (parquet.drop(columns=["building_id", "measures"]).dtypes == float).all()
+
+
+def test_unknown_cli_codes_fail_before_writing(portfolio_csv, tmp_path):
+    with pytest.raises(ValueError, match="rof"):
+        run_portfolio(str(portfolio_csv), str(tmp_path / "out.csv"), workers=1, measures=["rof"])
+    assert not (tmp_path / "out.csv").exists()
+
+
+def test_buildings_are_cached_per_row():
+    from cache import CACHE
+    from portfolio import evaluate_chunk
+
+    chunk = pd.DataFrame({"building_id": ["A", "B", "C"], "area_m2": [1200.0, 2500.0, 800.0], "units": [12, 40, 9],
+                          "measures": ["all", "roof_ins;heat_pump_aw", ""]})
+    CACHE.clear()
+    first = evaluate_chunk(chunk, economics={"horizon": 20})
+    before = dict(CACHE.counters)
+    # same buildings under other ids, one changed row
+    changed = chunk.assign(building_id=["X", "Y", "Z"], area_m2=[1200.0, 2600.0, 800.0])
+    second = evaluate_chunk(changed, economics={"horizon": 20})
+    assert CACHE.counters["hits"] - before["hits"] == 2
+    assert CACHE.counters["misses"] - before["misses"] == 1
+    assert second["building_id"].tolist() == ["X", "Y", "Z"]
+    pd.testing.assert_frame_equal(second.drop(columns="building_id").iloc[[0, 2]],
+                                  first.drop(columns="building_id").iloc[[0, 2]])
+    assert second.loc[1, "capex_total"] != first.loc[1, "capex_total"]
+    # other run options are other keys
+    evaluate_chunk(chunk)
+    assert CACHE.counters["misses"] - before["misses"] == 4
@@ -0,0 +1,105 @@
+# test_profiling.py
+# ------------------------------
+# Spans, stages and @profiled into the thread's profiler (no-ops without one), memory
+# snapshots, Chrome trace export, worker events through the portfolio run and the
+# per-session footprint
+# ------------------------------
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from profiling import (Profiler, activate, deep_sizeof, profiled, record_session, run_profiled, sessions_summary, span,
+                       stage)
+
+
+@profiled("work")
+def _work(n):
+    with span("inner", n=n):
+        return sum(range(n))
+
+
+def test_hooks_are_no_ops_without_a_profiler():
+    assert activate(None) is None
+    assert _work(10) == 45
+    stage("ignored")
+
+
+def test_spans_stages_and_summary():
+    profiler = Profiler()
+    previous = activate(profiler)
+    try:
+        _work(1000)
+        _work(10)
+        stage("a")
+        stage("b")
+        stage(None)
+    finally:
+        activate(previous)
+    names = [event["name"] for event in profiler.events]
+    assert names == ["inner", "work", "inner", "work", "a", "b"]
+    assert profiler.events[0]["args"] == {"n": 1000}
+    rows = {row["name"]: row for row in profiler.summary()}
+    assert rows["work"]["calls"] == 2
+    assert rows["work"]["total_ms"] >= rows["inner"]["total_ms"]
+
+
+def test_profiler_is_per_thread():
+    profiler = Profiler()
+    activate(profiler)
+    try:
+        thread = threading.Thread(target=_work, args=(10,))
+        thread.start()
+        thread.join()
+    finally:
+        activate(None)
+    assert profiler.events == []
+
+
+def test_snapshot_and_chrome_trace(tmp_path):
+    profiler = Profiler("test")
+    sizes = profiler.snapshot("state", {"arr": np.zeros(1000), "df": pd.DataFrame({"a": ["x" * 100] * 10})})
+    assert sizes["arr"] >= 8000
+    assert sizes["df"] > 1000
+    result, events = run_profiled(_work, 5)
+    profiler.add_events(events)
+    assert result == 10
+    path = tmp_path / "trace.json"
+    profiler.export(str(path))
+    trace = json.loads(path.read_text())
+    phases = [event["ph"] for event in trace["traceEvents"]]
+    assert phases[0] == "M" and "C" in phases and phases.count("X") == 2
+
+
+def test_deep_sizeof_counts_shared_objects_once():
+    arr = np.zeros(10_000)
+    assert deep_sizeof([arr, arr]) < 1.5 * deep_sizeof([arr])
+
+
+def test_portfolio_workers_report_their_spans(tmp_path):
+    from portfolio import run_portfolio
+    path = tmp_path / "b.csv"
+    pd.DataFrame({"building_id": [f"B{i}" for i in range(6)], "area_m2": np.linspace(500, 3000, 6)}).to_csv(path, index=False)
+    profiler = Profiler()
+    activate(profiler)
+    try:
+        run_portfolio(str(path), str(tmp_path / "r.csv"), workers=2, chunksize=2)
+    finally:
+        activate(None)
+    chunks = [event for event in profiler.events if event["name"] == "evaluate_chunk"]
+    assert len(chunks) == 3
+    assert all(event["pid"] != os.getpid() for event in chunks)
+
+
+def test_sessions_summary():
+    profiling._sessions.clear()
+    record_session("s1", {"a": np.zeros(1000), "f": threading.Lock()})
+    row = record_session("s2", {"a": np.zeros(3000)})
+    assert row["unpicklable"] == 0
+    summary = sessions_summary()
+    assert summary["sessions"] == 2
+    assert summary["max_bytes"] >= 24000
+    profiling._sessions.clear()
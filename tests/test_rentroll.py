@@ -0,0 +1,100 @@
+# test_rentroll.py
+# ------------------------------
+# Kappungsgrenzen of rent_roll_umlage: rolling 6-year window over prior increases from the
+# rent roll and over the staged steps, low-rent cap, separate §559e pool
+# ------------------------------
+import numpy as np
+import pandas as pd
+import pytest
+
+from rentroll import rent_roll_from_frame, rent_roll_umlage
+
+AREA = 100.0  # one unit of 100 m²: 1 €/m² per month = 1200 €/a
+
+
+def _roll(rent=10.0, prior=()):
+    # prior: (date, eur_m2, kind) increases already in the rent roll
+    row = {"unit_id": "W1", "area_m2": AREA, "rent_eur_m2": rent}
+    for i, (date, eur_m2, kind) in enumerate(prior, start=1):
+        row.update({f"increase_{i}_date": date, f"increase_{i}_eur_m2": eur_m2, f"increase_{i}_kind": kind})
+    return rent_roll_from_frame(pd.DataFrame([row]))
+
+
+def _granted(roll, years, general, heating=0.0, **caps):
+    general = np.broadcast_to(np.asarray(general, dtype=float) * AREA * 12.0, np.shape(years))
+    heating = np.broadcast_to(np.asarray(heating, dtype=float) * AREA * 12.0, np.shape(years))
+    result = rent_roll_umlage(roll, years, general, heating, **caps)
+    return result["granted_general_eur_m2"][:, 0], result["granted_heating_eur_m2"][:, 0], result
+
+
+def test_cap_without_history():
+    general, _, result = _granted(_roll(), [2026.0], 5.0)
+    assert general[0] == pytest.approx(3.0)
+    assert result["ann_umlage_general"][0, 0] == pytest.approx(3.0 * AREA * 12.0)
+    assert result["capped_units"][0, 0] == 1.0
+
+
+@pytest.mark.parametrize("date, remaining", [
+    ("01.07.2021", 1.0),   # 5 years before: uses up 2 €/m² of the cap
+    ("2019-12-31", 3.0),   # more than 6 years before: outside the window
+    ("01.01.2030", 3.0),   # after the step: not counted
+])
+def test_prior_increase_window(date, remaining):
+    general, _, _ = _granted(_roll(prior=[(date, "2,0", "559")]), [2026.5], 5.0)
+    assert general[0] == pytest.approx(remaining)
+
+
+def test_prior_heating_increase_uses_the_heating_pool_only():
+    general, heating, _ = _granted(_roll(prior=[("2024", 0.4, "559e")]), [2026.0], 5.0, heating=1.0)
+    assert general[0] == pytest.approx(3.0)
+    assert heating[0] == pytest.approx(0.1)
+
+
+@pytest.mark.parametrize("gap, second", [(3.0, 1.0), (7.0, 2.0)])
+def test_steps_share_the_cap_within_the_window(gap, second):
+    # 2 €/m² per step: within 6 years the second step only gets the rest of the 3 €/m² cap
+    general, _, _ = _granted(_roll(), [2026.0, 2026.0 + gap], 2.0)
+    assert general == pytest.approx([2.0, second])
+
+
+def test_steps_are_processed_in_time_order():
+    general, _, result = _granted(_roll(), [2030.0, 2026.0], [1.0, 2.5])
+    np.testing.assert_array_equal(result["years"], [2026.0, 2030.0])
+    assert general == pytest.approx([2.5, 0.5])
+
+
+def test_low_rent_threshold_uses_rent_before_each_step():
+    # 6.50 €/m²: low-rent cap of 2 €/m²; after the first step the rent is above 7 €/m²
+    general, _, result = _granted(_roll(rent=6.5), [2026.0, 2028.0], 1.0)
+    np.testing.assert_array_equal(result["cap_general_eur_m2"][:, 0], [2.0, 3.0])
+    assert general == pytest.approx([1.0, 1.0])
+    assert result["rent_after_eur_m2"][0] == pytest.approx(8.5)
+    general, _, _ = _granted(_roll(rent=6.5), [2026.0], 5.0)
+    assert general[0] == pytest.approx(2.0)
+
+
+def test_heating_pool_is_separate():
+    general, heating, result = _granted(_roll(), [2026.0, 2027.0], 3.0, heating=0.4)
+    assert general == pytest.approx([3.0, 0.0])
+    assert heating == pytest.approx([0.4, 0.1])
+    assert result["ann_umlage_total"][:, 0] == pytest.approx([3.4 * AREA * 12.0, 0.1 * AREA * 12.0])
+
+
+def test_umlage_is_distributed_by_area_per_building():
+    roll = rent_roll_from_frame(pd.DataFrame({"building_id": ["A", "A", "B"], "area_m2": [50.0, 150.0, 100.0],
+                                              "rent_eur_m2": [10.0, 10.0, 10.0]}))
+    result = rent_roll_umlage(roll, [2026.0], [[2400.0, 1200.0]], [[0.0, 0.0]])
+    assert result["granted_general_eur_m2"][0] == pytest.approx([1.0, 1.0, 1.0])
+    assert result["ann_umlage_general"][0] == pytest.approx([2400.0, 1200.0])
+
+
+@pytest.mark.parametrize("areas, expected", [
+    (["1.250", "80"], [1250.0, 80.0]),          # thousands grouping only: German
+    (["1.250,5", "80,25"], [1250.5, 80.25]),
+    (["62.5", "80"], [62.5, 80.0]),              # not a grouping: decimal point
+    (["1250.000", "80"], [1250.0, 80.0]),
+])
+def test_number_formats(areas, expected):
+    roll = rent_roll_from_frame(pd.DataFrame({"area_m2": areas, "rent_eur_m2": ["8,5", "9,25"]}, dtype=str))
+    np.testing.assert_allclose(roll["area_m2"], expected)
+    np.testing.assert_allclose(roll["rent_eur_m2"], [8.5, 9.25])
@@ -0,0 +1,96 @@
+# test_report.py
+# ------------------------------
+# Portfolio reports: tab-3 tables from a result record, figure templates with swapped
+# values against plotly.express / go.Waterfall, unique file names over chunks, and a
+# report run from the buildings file with and without the portfolio results file
+# ------------------------------
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio import evaluate_chunk, run_portfolio
+from report import (_de, building_tables, energy_figure, energy_table, report_figures, run_reports, unique_names,
+                    waterfall_figure, waterfall_table)
+
+
+@pytest.fixture
+def buildings_csv(tmp_path):
+    df = pd.DataFrame({"building_id": ["A", "B 1", "B/1", "a"], "area_m2": [900.0, 1500.0, 2500.0, 600.0],
+                       "e_heat_kwh": [150000.0] * 4, "measures": ["all", "roof_ins", "", "heat_pump_aw"]})
+    path = tmp_path / "gebaeude.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def record() -> dict:
+    return evaluate_chunk(pd.DataFrame({"building_id": ["A"], "area_m2": [1200.0], "measures": ["all"]})).iloc[0].to_dict()
+
+
+def test_tables_add_up(record):
+    tables = building_tables(record, {"rentable_area_m2": 1000.0})
+    comparison = tables["Vorher-Nachher"].set_index("Kategorie")
+    assert comparison.loc["Gesamt", "Nachher [€/a]"] == pytest.approx(record["cost_after_total"])
+    waterfall = tables["Waterfall"]["Wert"].to_numpy()
+    assert waterfall[0] + waterfall[1] == pytest.approx(waterfall[3])  # energy/CO2 costs after; the Umlage is shown on top
+    umlage = tables["Umlage"].set_index("Komponente")
+    assert umlage.loc["Umlage gesamt", "€/m²·a"] == pytest.approx(record["ann_umlage_total"] / 1000.0)
+
+
+def test_figures_match_plotly(record):
+    pytest.importorskip("plotly")
+    df_energy, wf = energy_table(record), waterfall_table(record)
+    figures = report_figures(df_energy, wf)
+    reference = energy_figure(df_energy)
+    for trace, expected in zip(figures["energy"]["data"], reference.data):
+        assert trace["name"] == expected.name
+        np.testing.assert_allclose(trace["y"], expected.y)
+    np.testing.assert_allclose(figures["waterfall"]["data"][0]["y"], waterfall_figure(wf).data[0].y)
+    # the templates are shared: a second building does not change the first one's figure
+    report_figures(df_energy.assign(Vorher=0.0), wf)
+    np.testing.assert_allclose(figures["energy"]["data"][0]["y"], df_energy["Vorher"])
+
+
+def test_unique_names_across_chunks():
+    used = set()
+    assert unique_names(["A", "B 1", "B/1"], 0, used) == ["A", "B_1", "B_1_2"]
+    assert unique_names(["a", "", "A"], 3, used) == ["a_3", "gebaeude_4", "A_5"]
+
+
+def test_german_number_format():
+    assert [_de(1234.5, 2), _de(float("inf")), _de(np.nan), _de(None), _de("x")] == ["1.234,50", "∞", "–", "–", "x"]
+
+
+@pytest.mark.parametrize("with_results", [False, True])
+def test_run_reports(buildings_csv, tmp_path, with_results):
+    pytest.importorskip("plotly")
+    results = None
+    if with_results:
+        results = str(tmp_path / "ergebnisse.csv")
+        run_portfolio(str(buildings_csv), results, workers=1)
+    out = tmp_path / "reports"
+    assert run_reports(str(buildings_csv), str(out), results, workers=1, chunksize=2, formats=["html"]) == 4
+    assert sorted(p.name for p in (out / "html").iterdir()) == ["A.html", "B_1.html", "B_1_2.html", "a_3.html", "plotly.min.js"]
+    index = (out / "index.html").read_text(encoding="utf-8")
+    assert index.count("<tr><td>") == 4 and "html/B_1_2.html" in index
+    assert not (out / "index.rows.tmp").exists()
+
+
+def test_results_file_must_match(buildings_csv, tmp_path):
+    results = tmp_path / "ergebnisse.csv"
+    run_portfolio(str(buildings_csv), str(results), workers=1)
+    full = pd.read_csv(results)
+    full.iloc[:3].to_csv(results, index=False)
+    with pytest.raises(ValueError, match="weniger Zeilen"):
+        run_reports(str(buildings_csv), str(tmp_path / "reports"), str(results), workers=1, chunksize=3, formats=["html"])
+    full.iloc[[1, 0, 2, 3]].to_csv(results, index=False)
+    with pytest.raises(ValueError, match="Reihenfolge"):
+        run_reports(str(buildings_csv), str(tmp_path / "reports"), str(results), workers=1, chunksize=2, formats=["html"])
+
+
+def test_xlsx_reports(buildings_csv, tmp_path):
+    pytest.importorskip("xlsxwriter")
+    out = tmp_path / "reports"
+    assert run_reports(str(buildings_csv), str(out), workers=1, formats=["xlsx"]) == 4
+    assert (out / "portfolio.xlsx").stat().st_size > 0 and len(list((out / "xlsx").iterdir())) == 4
+    assert not (out / "html").exists()
@@ -0,0 +1,76 @@
+# test_roadmap.py
+# ------------------------------
+# Transition table, heat pump capex per added row, envelope-before-heat-pump sequencing and
+# the NPV objective (Umlage from the capex at the year's index)
+# ------------------------------
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import CODE_HP, KERNEL_COLUMN, measure_terms, measures_to_arrays
+from model import UMLAGE_KEYS, evaluate_scenarios, index_for_year, umlage
+from roadmap import _transitions, envelope_mask, plan_roadmap
+
+BIG = 1e9
+
+
+def test_transitions_are_all_subset_pairs_sorted_by_target():
+    s_idx, t_idx = _transitions(4)
+    assert len(s_idx) == 3 ** 4
+    assert np.all((s_idx & ~t_idx) == 0)
+    assert np.all(np.diff(t_idx) >= 0)
+    assert len(set(zip(s_idx.tolist(), t_idx.tolist()))) == 3 ** 4
+
+
+def test_single_year_installs_the_whole_set_at_that_years_index(building, measures):
+    # heat pump sized on the heat left after the envelope measures of the same set
+    envelope = np.isin(measures["code"], ("roof_ins", "windows_triple"))
+    candidates = envelope | (measures["code"] == CODE_HP)
+    result = plan_roadmap.uncached(building, measures, 2030, [BIG], candidates=candidates)
+    plan = result["plan"]
+    assert list(result["final_selection"]) == list(candidates)
+    at_index = {**building, "index_factor": index_for_year(2030) / 100.0}
+    without_hp = evaluate_scenarios(at_index, measures, envelope)
+    hp_capex = measure_terms(at_index, measures)["capex"][measures["code"] == CODE_HP][0]
+    sizing = float(without_hp["heat_after"]) / building["e_heat_kwh"]
+    assert plan.loc[0, "davon Heizung [€]"] == pytest.approx(sizing * hp_capex)
+    assert plan.loc[0, "CAPEX [€]"] == pytest.approx(float(without_hp["capex_total"]) + sizing * hp_capex)
+    selected = evaluate_scenarios(building, measures, candidates)
+    assert plan.loc[0, "CO₂-Einsparung [t/a]"] == pytest.approx(float(selected["co2_savings_t"]))
+
+
+def test_heat_pump_capex_counts_only_the_added_row(building, measures_df):
+    # second heat pump row at twice the price: the cheap one alone fits the budget
+    hp = measures_df[measures_df["Code"] == CODE_HP].assign(Code="heat_pump_b", **{KERNEL_COLUMN: "heat_pump"})
+    hp["Capex/Einheit @Index100 [€]"] *= 2.0
+    measures = measures_to_arrays(pd.concat([measures_df, hp], ignore_index=True))
+    candidates = np.isin(measures["code"], (CODE_HP, "heat_pump_b"))
+    index = index_for_year(2026) / 100.0
+    capex_a = float(measure_terms({**building, "index_factor": index}, measures)["capex"][measures["code"] == CODE_HP][0])
+    result = plan_roadmap.uncached(building, measures, 2026, [1.5 * capex_a], candidates=candidates)
+    assert result["plan"].loc[0, "Neue Maßnahmen"] == CODE_HP
+    assert result["plan"].loc[0, "davon Heizung [€]"] == pytest.approx(capex_a)
+
+
+def test_no_envelope_measure_after_the_heat_pump(building, measures):
+    envelope = envelope_mask(measures)
+    candidates = envelope | (measures["code"] == CODE_HP)
+    candidates &= np.isin(measures["code"], ("roof_ins", "wall_wdvs", "windows_triple", CODE_HP))
+    result = plan_roadmap.uncached(building, measures, 2026, [300_000.0, 700_000.0, 700_000.0, 700_000.0], candidates=candidates)
+    years = {code: year for year, new in zip(result["plan"]["Jahr"], result["plan"]["Neue Maßnahmen"])
+             for code in new.split(", ") if code}
+    assert CODE_HP in years
+    assert all(years[code] <= years[CODE_HP] for code in years if envelope[measures["code"] == code][0])
+
+
+def test_npv_objective_prices_the_umlage_at_the_years_index(building, measures):
+    candidates = measures["code"] == "led_lighting"  # Umlage below the cap
+    result = plan_roadmap.uncached(building, measures, 2031, [BIG], objective="npv", horizon=10, discount_rate=0.0,
+                                   candidates=candidates)
+    index = index_for_year(2031) / 100.0
+    terms = measure_terms({**building, "index_factor": index}, measures)
+    ann = umlage(terms["ann_capex_general"][candidates].sum(), terms["ann_capex_heating"][candidates].sum(),
+                 *(building[key] for key in UMLAGE_KEYS))["ann_umlage_total"]
+    savings = float(evaluate_scenarios(building, measures, candidates)["savings_eur_pa"])
+    assert result["plan"].loc[0, "Einsparung inkl. Umlage [€/a]"] == pytest.approx(savings + ann)
+    assert result["objective"] == pytest.approx(10 * (savings + ann) - terms["capex"][candidates].sum())
@@ -0,0 +1,112 @@
+# test_scenario_store.py
+# ------------------------------
+# Content hash, save/load round trip and result reuse of the scenario store, including
+# kernel parameters of the extended catalog and rows written with encoding 1
+# ------------------------------
+import numpy as np
+import pytest
+
+from engine import CODE_HP, PARAM_COLUMNS
+from model import evaluate_scenarios
+from scenario_store import INPUT_KEYS, MEASURE_KEYS, ScenarioStore, decode_payload, encode_scenarios, measures_table
+
+
+def _with(measures: dict, code: str, key: str, value: float) -> dict:
+    column = np.array(measures[key], dtype=float)
+    column[list(measures["code"]).index(code)] = value
+    return {**measures, key: column}
+
+
+@pytest.fixture
+def network(measures) -> dict:
+    # heat network on, heat pump off: the network supplies the heat
+    codes = list(measures["code"])
+    active = np.isin(measures["code"], ("roof_ins", "heat_network", "pv_facade"))
+    assert not active[codes.index(CODE_HP)]
+    return {**measures, "active": active}
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ScenarioStore(str(tmp_path / "scenarios.sqlite")) as store:
+        yield store
+
+
+def test_hash_covers_kernel_parameters(building, network):
+    base, _, layout = encode_scenarios(building, network)
+    assert layout.split("|")[0] == "2" and "heat_network" in layout.split("|")[2]
+    assert encode_scenarios(building, dict(network))[0] == base
+    for key, value in (("net_price", 0.39), ("net_ef", 0.0), ("pv_yield", 700.0)):
+        code = "pv_facade" if key == "pv_yield" else "heat_network"
+        assert encode_scenarios(building, _with(network, code, key, value))[0] != base, key
+    kernel = network["kernel"].astype(object)
+    kernel[list(network["code"]).index("pv_facade")] = "percent"
+    assert encode_scenarios(building, {**network, "kernel": kernel})[0] != base
+
+
+def test_missing_parameter_columns_hash_like_defaults(building, measures):
+    default_rows = {key: (value[:12] if np.ndim(value) else value) for key, value in measures.items()}
+    without = {key: value for key, value in default_rows.items() if key not in PARAM_COLUMNS.values()}
+    assert encode_scenarios(building, without)[0] == encode_scenarios(building, default_rows)[0]
+
+
+def test_save_and_load_round_trip(building, network, store):
+    (h,) = store.save("B1", building, network, tag="t")
+    inputs, loaded = store.load(h)
+    assert inputs == {key: pytest.approx(float(building[key])) for key in INPUT_KEYS}
+    np.testing.assert_array_equal(loaded["code"], network["code"])
+    np.testing.assert_array_equal(loaded["kernel"], network["kernel"])
+    np.testing.assert_array_equal(loaded["active"], network["active"])
+    for key in MEASURE_KEYS[1:] + tuple(PARAM_COLUMNS.values()):
+        np.testing.assert_array_equal(np.nan_to_num(loaded[key], nan=-1.0), np.nan_to_num(network[key], nan=-1.0), key)
+    stored = store.find(building="B1")
+    expected = evaluate_scenarios(building, network)
+    assert stored["Gesamtkosten [€/a]"][0] == pytest.approx(float(expected["Gesamtkosten [€/a]"]))
+    assert encode_scenarios(inputs, loaded)[0] == [h]
+
+
+def test_changed_parameter_is_evaluated_again(building, network, store):
+    store.save("B1", building, network, tag="a")
+    expensive = _with(network, "heat_network", "net_price", 0.39)
+    store.save("B1", building, expensive, tag="b")
+    frame = store.find(building="B1").set_index("tag")
+    assert frame.loc["b", "hash"] != frame.loc["a", "hash"]
+    assert frame.loc["b", "cost_after_total"] == pytest.approx(float(evaluate_scenarios(building, expensive)["cost_after_total"]))
+    assert frame.loc["b", "cost_after_total"] > frame.loc["a", "cost_after_total"]
+
+
+def test_batch_save_reuses_known_hashes(building, network, store):
+    active = np.stack([network["active"], network["active"], ~network["active"]])
+    hashes = store.save(["B1", "B2", "B3"], building, network, active=active)
+    assert hashes[0] == hashes[1] != hashes[2]
+    assert store.known(hashes) == set(hashes)
+    with pytest.raises(ValueError):
+        store.save(["B1"], building, network, active=active)
+
+
+def test_encoding_1_rows_stay_readable(building, measures, measures_df):
+    default_rows = {key: (value[:12] if np.ndim(value) else value) for key, value in measures.items()}
+    k = len(default_rows["code"])
+    _, payload, _ = encode_scenarios(building, default_rows)
+    legacy = payload[0, :len(INPUT_KEYS) + len(MEASURE_KEYS) * k]  # no parameter block
+    inputs, decoded = decode_payload(legacy.tobytes(), ";".join(default_rows["code"]))
+    np.testing.assert_array_equal(decoded["kernel"], default_rows["kernel"])
+    np.testing.assert_array_equal(decoded["hp_scop"], default_rows["hp_scop"])
+    assert inputs["e_heat_kwh"] == building["e_heat_kwh"]
+    table = measures_table(measures_df.iloc[:12].assign(Aktiv=True), decoded)
+    assert list(table["Aktiv"]) == list(default_rows["active"])
+
+
+def test_measures_table_restores_parameters_and_kernels(measures_df, network):
+    changed = _with(network, "heat_network", "net_price", 0.2)
+    table = measures_table(measures_df, changed)
+    row = table.set_index("Code").loc["heat_network"]
+    net_price_column = next(column for column, key in PARAM_COLUMNS.items() if key == "net_price")
+    assert row[net_price_column] == 0.2 and row["Typ"] == "heat_network" and bool(row["Aktiv"])
+
+
+def test_store_creates_its_folder(tmp_path, building, network):
+    path = tmp_path / "energyaudit" / "scenarios.sqlite"
+    with ScenarioStore(str(path)) as store:
+        store.save("B1", building, network)
+    assert path.exists()
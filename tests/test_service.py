@@ -0,0 +1,105 @@
+# test_service.py
+# ------------------------------
+# Calculation service: request validation, micro-batching of concurrent requests into one
+# chunk (same results as portfolio.evaluate_chunk), latency metrics and the HTTP endpoints
+# of an in-process server
+# ------------------------------
+import http.client
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+from portfolio import MEASURE_CODES, evaluate_chunk
+from service import Metrics, MicroBatcher, RequestError, make_server, parse_request
+
+BUILDING = {"building_id": "B1", "area_m2": 1800, "units": 24, "measures": ["roof_ins", "pv_system"]}
+
+
+@pytest.fixture
+def batcher():
+    batcher = MicroBatcher(workers=1, max_batch=64, max_wait_ms=50.0)
+    yield batcher
+    batcher.close()
+
+
+@pytest.fixture
+def server(batcher):
+    server = make_server("127.0.0.1", 0, batcher)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _call(server, method: str, path: str, body=None):
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=30)
+    conn.request(method, path, body if body is None or isinstance(body, bytes) else json.dumps(body))
+    response = conn.getresponse()
+    data = json.loads(response.read())
+    conn.close()
+    return response.status, data
+
+
+def test_parse_request_forms():
+    (row,) = parse_request(BUILDING)
+    assert row["measures"] == "roof_ins;pv_system" and row["area_m2"] == 1800.0
+    assert row["index_year"] and row["index_quarter"]
+    rows = parse_request({"buildings": [{"measures": "all"}, {"measures": "roof_ins; pv_system"}, {}]})
+    assert [r["building_id"] for r in rows] == ["0", "1", "2"]
+    assert [r["measures"] for r in rows] == ["all", "roof_ins;pv_system", "all"]
+
+
+@pytest.mark.parametrize("payload, message", [
+    ({"area": 1800}, "unbekannte Felder area"),
+    ({"area_m2": "1800"}, "'area_m2' muss eine Zahl sein"),
+    ({"area_m2": float("nan")}, "'area_m2' muss eine Zahl sein"),
+    ({"carrier": "coal"}, "'carrier'"),
+    ({"measures": ["roof_ins", "rof"]}, "unbekannte Maßnahmen rof"),
+    ({"measures": 3}, "'measures'"),
+    ({"buildings": []}, "nicht leere Liste"),
+    ({"buildings": [BUILDING, "B2"]}, "Gebäude 2"),
+])
+def test_invalid_requests(payload, message):
+    with pytest.raises(RequestError, match=message):
+        parse_request(payload)
+
+
+def test_concurrent_requests_share_a_batch(batcher):
+    rows = [parse_request({**BUILDING, "building_id": f"B{i}", "area_m2": 1000.0 + i})[0] for i in range(5)]
+    futures = [batcher.submit([row]) for row in rows]
+    results = [future.result(timeout=30) for future in futures]
+    expected = evaluate_chunk(pd.DataFrame.from_records(rows))
+    for i, (records, timing) in enumerate(results):
+        assert records[0]["building_id"] == f"B{i}"
+        assert records[0]["capex_total"] == pytest.approx(expected.loc[i, "capex_total"])
+        assert timing["batch_size"] == 5 and timing["total_ms"] >= timing["queue_ms"]
+    assert batcher.metrics.counts["batches"] == 1
+
+
+def test_metrics_snapshot():
+    metrics = Metrics()
+    assert metrics.snapshot()["window"] == 0
+    for ms in (1.0, 2.0, 3.0):
+        metrics.request(0.5, ms, ms + 0.5, buildings=2)
+    metrics.batch(6)
+    snapshot = metrics.snapshot()
+    assert snapshot["requests"] == 3 and snapshot["buildings"] == 6
+    assert snapshot["compute_ms"]["p50"] == pytest.approx(2.0) and snapshot["compute_ms"]["max"] == 3.0
+    assert snapshot["batch_size"] == {"mean": 6.0, "max": 6.0}
+
+
+def test_http_endpoints(server):
+    assert _call(server, "GET", "/health") == (200, {"status": "ok", "workers": 1})
+    status, body = _call(server, "GET", "/measures")
+    assert status == 200 and [m["code"] for m in body["measures"]] == list(MEASURE_CODES)
+    status, body = _call(server, "POST", "/simulate", {"buildings": [BUILDING, {**BUILDING, "building_id": "B2"}]})
+    assert status == 200 and [r["building_id"] for r in body["results"]] == ["B1", "B2"]
+    assert set(body["timing"]) == {"queue_ms", "compute_ms", "total_ms", "batch_size"}
+    assert _call(server, "POST", "/simulate", b"{")[0] == 400
+    status, body = _call(server, "POST", "/simulate", {"measures": ["rof"]})
+    assert status == 400 and "rof" in body["error"]
+    assert _call(server, "GET", "/unknown")[0] == 404
+    status, body = _call(server, "GET", "/metrics")
+    assert body["requests"] == 1 and body["buildings"] == 2 and body["errors"] == 2
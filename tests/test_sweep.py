@@ -0,0 +1,67 @@
+# test_sweep.py
+# ------------------------------
+# Break-even solver: the returned value reproduces the target, per point of the remaining
+# axes, and NaN where the metric does not cross the target; grid points of a sweep against
+# single evaluations
+# ------------------------------
+import numpy as np
+import pytest
+
+from sweep import break_even, evaluate_metrics, sweep
+
+
+@pytest.fixture
+def active(measures) -> np.ndarray:
+    return np.isin(measures["code"], ("roof_ins", "windows_triple", "heat_network"))
+
+
+def test_payback_break_even_reaches_target(building, measures, active):
+    price = break_even(building, measures, "p_heat", 0.05, 0.5, target=12.0, metric="simple_payback_y", active=active)
+    assert np.ndim(price) == 0 and 0.05 < price < 0.5
+    payback = evaluate_metrics(building, measures, {"p_heat": price}, active)["simple_payback_y"]
+    assert float(payback) == pytest.approx(12.0, rel=1e-4)
+
+
+def test_break_even_over_axes_matches_single_points(building, measures, active):
+    co2 = np.array([0.0, 100.0, 200.0])
+    prices = break_even(building, measures, "p_heat", 0.05, 0.5, target=12.0, metric="simple_payback_y",
+                        axes={"co2_price": co2}, active=active)
+    assert prices.shape == (3,)
+    for c, price in zip(co2, prices):
+        single = break_even({**building, "co2_price": c}, measures, "p_heat", 0.05, 0.5, target=12.0,
+                            metric="simple_payback_y", active=active)
+        assert price == pytest.approx(float(single), abs=1e-6)
+    assert np.all(np.diff(prices) < 0)  # a higher CO2 price needs a lower heat price
+
+
+def test_break_even_of_measure_parameter(building, measures, active):
+    # NPV over the lifetime as a function of the heat network price
+    price = break_even(building, measures, "heat_network.net_price", 0.0, 1.0, metric="npv_eur", active=active, xtol=1e-10)
+    npv = evaluate_metrics(building, measures, {"heat_network.net_price": price}, active, ("npv_eur",))["npv_eur"]
+    assert float(npv) == pytest.approx(0.0, abs=1.0)
+
+
+def test_no_crossing_is_nan(building, measures, active):
+    result = break_even(building, measures, "p_heat", 0.05, 0.5, target=-1.0, metric="simple_payback_y",
+                        axes={"co2_price": [0.0, 50.0]}, active=active)
+    assert result.shape == (2,) and np.isnan(result).all()
+
+
+def test_sweep_grid_shape(building, measures, active):
+    result = sweep(building, measures, {"p_heat": np.linspace(0.1, 0.2, 4), "*.heat_pct": [0.9, 1.0, 1.1]},
+                   active, ("simple_payback_y", "savings_eur_pa"))
+    assert result["savings_eur_pa"].shape == (4, 3)
+    assert np.all(np.diff(result["savings_eur_pa"], axis=0) > 0)
+
+
+def test_sweep_points_match_single_evaluations(building, measures, active):
+    axes = {"co2_price": [0.0, 150.0], "heat_pump_aw.hp_scop": [2.5, 3.5]}
+    both = active | np.isin(measures["code"], ("heat_pump_aw",))
+    result = sweep(building, measures, axes, both, ("npv_eur", "co2_savings_t"))
+    assert result["npv_eur"].shape == (2, 2)
+    for i, co2 in enumerate(axes["co2_price"]):
+        for j, scop in enumerate(axes["heat_pump_aw.hp_scop"]):
+            single = evaluate_metrics({**building, "co2_price": co2}, measures, {"heat_pump_aw.hp_scop": scop}, both,
+                                      ("npv_eur", "co2_savings_t"))
+            for key in single:
+                assert result[key][i, j] == pytest.approx(float(single[key])), key